@@ -1,9 +1,13 @@
 import cv2
 import os
+import sys
 import time
 import glob
 import numpy as np
-from ultralytics import YOLO
+
+# Share the inference engines with the Flask app in the parent directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from engines import load_engine
 
 def main():
     # =====================================
@@ -11,6 +15,9 @@ def main():
     # =====================================
     # 1) Path to the trained YOLO model (best.pt)
     model_path = r"Rubbish\runs\detect\train10\weights\best.pt"
+
+    # Inference backend: "torch", "onnx", "openvino" or "auto" (fastest exported model found)
+    backend = "auto"
     
     # 2) Camera index (Iriun) - usually 1 if 0 is occupied by the built-in camera
     camera_index = 0
@@ -30,7 +37,8 @@ def main():
     if not os.path.exists(model_path):
         print(f"Error: model file {model_path} not found")
         return
-    model = YOLO(model_path)
+    model = load_engine(model_path, backend)
+    print(f"Running {model_path} on {model.backend}")
     labels = model.names  # Dictionary or list {class_idx: class_name}
 
     # =====================================
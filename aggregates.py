@@ -0,0 +1,86 @@
+# aggregates.py
+from sqlalchemy import func
+
+from extensions import db
+from models import Detection, DetectionCount
+
+# Classes always present in /stats, even with a zero count
+STATS_CLASSES = ('plastic', 'metal', 'glass', 'paper', 'bottle',
+                 'float', 'rope', 'container', 'foam')
+
+
+def class_counts(session_id=None):
+    """{class_name: count} from the detection_counts rollup, optionally for one session."""
+    query = db.session.query(DetectionCount.class_name, func.sum(DetectionCount.count))
+    if session_id:
+        query = query.filter(DetectionCount.session_id == session_id)
+    return {name: int(total) for name, total in query.group_by(DetectionCount.class_name)}
+
+
+def dashboard_stats():
+    """Counts for the fixed dashboard classes, matched case-insensitively."""
+    stats = dict.fromkeys(STATS_CLASSES, 0)
+    name = func.lower(DetectionCount.class_name)
+    rows = (db.session.query(name, func.sum(DetectionCount.count))
+            .filter(name.in_(STATS_CLASSES))
+            .group_by(name))
+    for class_name, total in rows:
+        stats[class_name] = int(total)
+    return stats
+
+
+def detection_class_counts(session_id=None):
+    """Same as class_counts() but aggregated straight from the detection table."""
+    query = db.session.query(Detection.class_name, func.count(Detection.id))
+    if session_id:
+        query = query.filter(Detection.session_id == session_id)
+    return dict(query.group_by(Detection.class_name).all())
+
+
+def detection_clusters(filters, precision):
+    """
+    Detections grouped by geohash cell of the given length: one point per
+    cell at the mean position, with its total and per-class counts. Cells
+    holding a single detection carry that detection's id, image_path,
+    confidence and timestamp for the map popup.
+    """
+    cell = func.substr(Detection.geohash, 1, precision)
+    rows = (db.session.query(cell, Detection.class_name, func.count(Detection.id),
+                             func.sum(Detection.latitude), func.sum(Detection.longitude),
+                             func.min(Detection.id))
+            .filter(Detection.geohash.isnot(None), *filters)
+            .group_by(cell, Detection.class_name))
+
+    clusters = {}
+    for cell_id, class_name, count, lat_sum, lon_sum, first_id in rows:
+        c = clusters.setdefault(cell_id, {"cell": cell_id, "count": 0, "lat_sum": 0.0,
+                                          "lon_sum": 0.0, "classes": {}, "id": first_id})
+        c["count"] += count
+        c["lat_sum"] += lat_sum
+        c["lon_sum"] += lon_sum
+        c["classes"][class_name] = count
+
+    # One query for the details of every single-detection cell
+    single_ids = [c["id"] for c in clusters.values() if c["count"] == 1]
+    singles = {}
+    for i in range(0, len(single_ids), 500):
+        for row in (db.session.query(Detection.id, Detection.image_path, Detection.confidence,
+                                     Detection.timestamp)
+                    .filter(Detection.id.in_(single_ids[i:i + 500]))):
+            singles[row.id] = row
+
+    result = []
+    for c in clusters.values():
+        single = singles.get(c["id"]) if c["count"] == 1 else None
+        result.append({
+            "cell": c["cell"],
+            "latitude": c["lat_sum"] / c["count"],
+            "longitude": c["lon_sum"] / c["count"],
+            "count": c["count"],
+            "classes": c["classes"],
+            "id": single.id if single else None,
+            "image_path": single.image_path if single else None,
+            "confidence": single.confidence if single else None,
+            "timestamp": single.timestamp.isoformat() if single else None,
+        })
+    return result
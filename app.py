@@ -1,18 +1,18 @@
 # app.py
 import os
+import threading
+import time
+import click
+import json
 from dotenv import load_dotenv
 load_dotenv()  # Loads variables from .env
 
-import torch
-from flask import Flask, Response, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy
 from werkzeug.utils import secure_filename
-import cv2
-import numpy as np
-from ultralytics import YOLO
-from datetime import datetime
+from datetime import datetime, timedelta
 from sqlalchemy import and_
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity, get_jwt
 from flask_bcrypt import Bcrypt
@@ -20,7 +20,7 @@ import re
 from validate_email import validate_email
 
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=['X-Next-Cursor'])
 
 bcrypt = Bcrypt(app)
 
@@ -42,126 +42,159 @@ from extensions import db
 db.init_app(app)  # Register your app with SQLAlchemy
 migrate = Migrate(app, db)
 
+# Table versions are bumped on commit; read endpoints use them for ETags and caching
+from caching import cached, install as install_cache_tracking
+install_cache_tracking(db.session)
+
 # Import the Detection model after initializing db
-from models import Detection, UAVStatus, Notification, Report, User, Mission, Drone
+from models import Detection, UAVStatus, Notification, Report, User, Mission
+from postprocess import annotate, extract_detections, to_json, to_rows
+from inference import BatchInferenceServer, ProcessInferencePool
+from jobs import DetectionJobManager
+from persistence import save_detections
+from events import event_bus, format_sse
+from telemetry import (LatestTelemetryStore, TelemetryBuffer, TelemetryBufferFull, parse_batch,
+                       parse_sample, parse_timestamp, publish_latest, status_payload)
+import rollups
+import telemetry_history
+from aggregates import class_counts, dashboard_stats, detection_clusters
+from missions import completed_details, drone_summaries, mission_details
+from geo import cell_prefixes, geohash_encode, haversine_m, prefix_range, radius_bbox, zoom_precision
+import storage
+from storage import ImageStore, content_hash
+from caching import ResponseCache
+from cleanup import DeleteAllDetections, FileDeletionQueue, sweep_orphans
+from imaging import decode_for_inference, scale_boxes
+from metrics import Timings, server_timing
+from engines import BACKENDS, LazyEngine, export as export_engine, load_engine, parity_check
+from pagination import before_cursor, decode_cursor, encode_cursor, stream_json_array
 
 # Load models with custom names
-model = YOLO("Rubbish/runs/detect/train/weights/best1.pt")
+MODEL_PATH = os.getenv('MODEL_PATH', "Rubbish/runs/detect/train/weights/best1.pt")
+DETECT_IMGSZ = int(os.getenv('DETECT_IMGSZ', 512))  # Training imgsz, see Rubbish/runs/detect/train/args.yaml
 
 # Define custom class names - we'll keep the default model names
 
-# Check CUDA availability
-if torch.cuda.is_available():
-    model.to('cuda')
-    print("Using GPU for inference")
+# INFERENCE_BACKEND is torch, onnx, openvino, openvino-int8 or auto (best exported
+# model available). The model is loaded on first use or by the warm-up below, on
+# the GPU when the backend is torch and CUDA is available.
+#
+# With INFERENCE_WORKERS=N inference instead runs in N processes, each with its own
+# model and INFERENCE_WORKER_THREADS threads (default: an equal share of the cores),
+# and frames reach them through shared memory. A frame fails with TimeoutError after
+# INFERENCE_TIMEOUT seconds (default 60) instead of waiting on a stuck worker.
+INFERENCE_WORKERS = int(os.getenv('INFERENCE_WORKERS', 0))
+if INFERENCE_WORKERS:
+    model = ProcessInferencePool(
+        MODEL_PATH, os.getenv('INFERENCE_BACKEND', 'auto'), imgsz=DETECT_IMGSZ,
+        workers=INFERENCE_WORKERS,
+        threads_per_worker=int(os.getenv('INFERENCE_WORKER_THREADS', 0)) or None,
+        timeout=float(os.getenv('INFERENCE_TIMEOUT', 60)),
+    )
 else:
-    print("Using CPU for inference")
+    model = LazyEngine(MODEL_PATH, os.getenv('INFERENCE_BACKEND', 'auto'), imgsz=DETECT_IMGSZ)
+
+# Served workers warm the model up in the background from their first request
+# (normally the /ready probe); set MODEL_WARMUP=0 to load it on demand instead
+MODEL_WARMUP = os.getenv('MODEL_WARMUP', '1') != '0'
+
+@app.before_request
+def warm_up_model():
+    if MODEL_WARMUP:
+        model.start_warm_up()
+
+@app.route('/ready', methods=['GET'])
+def ready():
+    """Readiness probe: 200 once the model is loaded and warm, 503 until then."""
+    status = model.status()
+    return jsonify(status), 200 if status['state'] == 'ready' else 503
+
+# One shared capture/inference worker per camera, fanned out to every /stream client.
+# Created on the first /stream request since streaming imports cv2.
+camera_hub = None
+camera_hub_lock = threading.Lock()
+
+def get_camera_hub():
+    global camera_hub
+    with camera_hub_lock:
+        if camera_hub is None:
+            from streaming import CameraHub
+            # Stream frames share the /detect inference server, one forward pass at a time
+            camera_hub = CameraHub(model, inference=inference_server,
+                                   pipelined=os.getenv('STREAM_PIPELINED', '1') != '0')
+    return camera_hub
 
-# Update the detection function to use model.names correctly
-def get_class_name(model, cls_id):
-    try:
-        return model.names[cls_id]
-    except (IndexError, KeyError):
-        return f"class_{cls_id}"
-
-# Update the generate_frames_camera function
 def generate_frames_camera(index=0):
-    cap = cv2.VideoCapture(index)
-    if not cap.isOpened():
-        print(f"Error: Could not open video device at index {index}.")
-        return
+    return get_camera_hub().frames(index)
 
-    class_colors = {
-        "glass": (0, 255, 255),
-        "metal": (255, 0, 0),
-        "trash": (0, 128, 128),
-        "bottle": (0, 0, 255),
-        "float": (180, 105, 255),
-        "plastic": (255, 255, 0),
-        "rope": (192, 192, 192),
-        "container": (0, 255, 0),
-        "foam": (255, 0, 255)
-    }
+# Concurrent /detect uploads are batched into a single forward pass, or spread
+# over the worker processes
+if INFERENCE_WORKERS:
+    inference_server = model
+else:
+    inference_server = BatchInferenceServer(
+        model,
+        max_batch_size=int(os.getenv('INFER_MAX_BATCH', 8)),
+        max_wait_ms=float(os.getenv('INFER_MAX_WAIT_MS', 10)),
+    )
 
-    frame_count = 0
-    last_detections = None
-    detection_interval = 3  # Run detection every N frames
-    frame_width = 640  # Reduced frame size for faster processing
-    frame_height = 480
+DETECT_CONF_THRESHOLD = 0.7
 
-    try:
-        while True:
-            success, frame = cap.read()
-            if not success:
-                break
+# Per-stage /detect timings, served by /detect/metrics
+detect_timings = Timings()
 
-            # Resize frame for faster processing
-            frame = cv2.resize(frame, (frame_width, frame_height))
-            frame_count += 1
+# Uploads are stored once per distinct content, under sharded directories, by
+# background writer threads so the disk write is off the request path
+image_store = ImageStore(
+    app.config['UPLOAD_FOLDER'],
+    writer_threads=int(os.getenv('UPLOAD_WRITER_THREADS', 2)),
+    on_write=lambda ms: detect_timings.record('write', ms),
+)
 
-            # Run detection at intervals
-            if frame_count % detection_interval == 0:
-                try:
-                    results = model(frame, verbose=False)
-                    if len(results) > 0:
-                        last_detections = results[0].boxes
-                except Exception as e:
-                    print(f"Detection error: {e}")
-                    continue
-
-            # Draw cached detections
-            if last_detections is not None and len(last_detections) > 0:
-                try:
-                    for det in last_detections:
-                        xyxy = det.xyxy[0].cpu().numpy()
-                        conf = float(det.conf)
-                        cls_id = int(det.cls)
-                        class_name = get_class_name(model, cls_id)
-
-                        if conf >= 0.75:
-                            xmin, ymin, xmax, ymax = map(int, xyxy)
-                            color = class_colors.get(class_name.lower(), (0, 255, 0))
-                            
-                            # Draw detection box
-                            cv2.rectangle(frame, (xmin, ymin), (xmax, ymax), color, 2)
-                            
-                            # Draw label with confidence
-                            label = f"{class_name}: {conf:.2f}"
-                            (label_width, label_height), _ = cv2.getTextSize(
-                                label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 2)
-                            
-                            # Draw label background
-                            cv2.rectangle(frame, 
-                                        (xmin, ymin - label_height - 5),
-                                        (xmin + label_width, ymin),
-                                        color, -1)
-                            
-                            # Draw label text
-                            cv2.putText(frame, label,
-                                      (xmin, ymin - 5),
-                                      cv2.FONT_HERSHEY_SIMPLEX,
-                                      0.5, (255, 255, 255), 2)
-                except Exception as e:
-                    print(f"Drawing error: {e}")
-                    continue
-
-            # Encode frame with lower quality for faster transmission
-            ret, buffer = cv2.imencode('.jpg', frame, 
-                                     [cv2.IMWRITE_JPEG_QUALITY, 80])
-            if not ret:
-                continue
-
-            # Yield frame data
-            try:
-                yield (b'--frame\r\n'
-                      b'Content-Type: image/jpeg\r\n\r\n' + 
-                      buffer.tobytes() + b'\r\n')
-            except Exception as e:
-                print(f"Stream error: {e}")
-                break
+# Field retries often resend the same image; remember what was found in it
+result_cache = ResponseCache(
+    max_entries=int(os.getenv('DETECT_RESULT_CACHE_SIZE', 2048)),
+    ttl=int(os.getenv('DETECT_RESULT_CACHE_TTL', 24 * 3600)),
+)
 
-    finally:
-        cap.release()
+def detect_image(data, filename, timings=None):
+    """
+    Detections for an uploaded image plus its stored image_path (None when
+    nothing was found, in which case the image is not kept). Identical
+    content already seen by this model at this threshold skips decoding and
+    inference. Large images are decoded at reduced resolution and their
+    boxes scaled back. Stage times in ms are added to `timings` if given.
+    Raises ValueError if the image cannot be decoded.
+    """
+    timings = {} if timings is None else timings
+    digest = content_hash(data)
+    key = (digest, model.version, DETECT_CONF_THRESHOLD)
+    dets = result_cache.get(key)
+    if dets is None:
+        started = time.perf_counter()
+        img, scale = decode_for_inference(data, DETECT_IMGSZ)
+        if img is None:
+            raise ValueError("Image could not be decoded")
+        decoded = time.perf_counter()
+        result = inference_server.infer(img)
+        dets = scale_boxes(extract_detections(result, conf_threshold=DETECT_CONF_THRESHOLD), scale)
+        timings['decode'] = (decoded - started) * 1000
+        timings['infer'] = (time.perf_counter() - decoded) * 1000
+        result_cache.set(key, dets)
+
+    image_path = image_store.put(data, filename, digest) if len(dets) else None
+    for stage, ms in timings.items():
+        detect_timings.record(stage, ms)
+    return dets, image_path
+
+def build_detection_rows(dets, image_path, session_id, latitude, longitude):
+    """Turn extracted detections into Detection row dicts and the JSON payload."""
+    rows = to_rows(dets, model,
+                   image_path=image_path,
+                   session_id=session_id,
+                   latitude=latitude,
+                   longitude=longitude)
+    return rows, to_json(dets, model, image_path=image_path)
 
 @app.route('/detect', methods=['POST'])
 def detect():
@@ -169,98 +202,91 @@ def detect():
         return jsonify({"error": "No file provided"}), 400
 
     file = request.files['file']
-    import time
-    filename = secure_filename(f"{int(time.time())}_{file.filename}")
-    if '..' in filename or filename.startswith('/'):
-        return jsonify({"error": "Invalid filename"}), 400
-    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-    
-    # Read and decode the image
-    file_bytes = file.read()
-    npimg = np.frombuffer(file_bytes, np.uint8)
-    img = cv2.imdecode(npimg, cv2.IMREAD_COLOR)
-    
-    if img is None:
+    filename = secure_filename(file.filename or '')
+
+    # Without missionId the detections go to whichever mission is running
+    mission_id = request.form.get('missionId', type=int)
+    if mission_id is not None and db.session.get(Mission, mission_id) is None:
+        return jsonify({"error": "Mission not found"}), 400
+
+    timings = {}
+    try:
+        dets, image_path = detect_image(file.read(), filename, timings)
+    except ValueError:
         return jsonify({"error": "Image could not be decoded"}), 400
 
-    file.seek(0)
-    file.save(filepath)
-
-    results = model(img)
-    detections_data = []
-    notifications_to_create = []
-
-    # Process each detection
-    for det in results[0].boxes:
-        xyxy = det.xyxy.cpu().numpy().squeeze().tolist()
-        conf = float(det.conf.item())
-        cls_id = int(det.cls.item())
-        class_name = get_class_name(model, cls_id)
-
-        if conf < 0.7:
-            continue
-
-        session_id = request.form.get('sessionId', 'default')
-        detection = Detection(
-            class_name=class_name,
-            confidence=round(conf, 2),
-            x_min=round(xyxy[0], 2),
-            y_min=round(xyxy[1], 2),
-            x_max=round(xyxy[2], 2),
-            y_max=round(xyxy[3], 2),
-            image_path=filename,
-            session_id=session_id,
-            latitude=request.form.get('latitude'),
-            longitude=request.form.get('longitude')
-        )
-        db.session.add(detection)
-
-        # Add a notification for any detected object
-        notifications_to_create.append(Notification(
-            message=f"Object detected: {class_name}",
-            severity="info"
-        ))
-
-        detections_data.append({
-            "className": class_name,
-            "confidence": round(conf, 2),
-            "boundingBox": {
-                "xmin": round(xyxy[0], 2),
-                "ymin": round(xyxy[1], 2),
-                "xmax": round(xyxy[2], 2),
-                "ymax": round(xyxy[3], 2)
-            },
-            "image_path": filename
-        })
+    rows, detections_data = build_detection_rows(
+        dets, image_path,
+        request.form.get('sessionId', 'default'),
+        request.form.get('latitude', type=float),
+        request.form.get('longitude', type=float))
+    if mission_id is not None:
+        for row in rows:
+            row['mission_id'] = mission_id
 
-    # Add all notifications (if any) to the session
-    for note in notifications_to_create:
-        db.session.add(note)
-    db.session.commit()  # Commit all at once
+    # Detections and their notifications go in with one bulk INSERT each
+    save_detections(rows)
 
-    return jsonify({
+    response = jsonify({
         "numDetections": len(detections_data),
         "detections": detections_data
     })
+    if timings:
+        response.headers['Server-Timing'] = server_timing(timings)
+    return response
+
+@app.route('/detect/metrics', methods=['GET'])
+def detect_metrics():
+    """Recent decode/infer/write timings and cache/writer state for /detect."""
+    return jsonify({
+        "timings": detect_timings.summary(),
+        "resultCache": {"hits": result_cache.hits, "misses": result_cache.misses},
+        "pendingWrites": image_store.pending_writes,
+        "inference": {"batches": inference_server.batches, "images": inference_server.images},
+    })
+
+def process_job_image(name, data, latitude, longitude, session_id):
+    dets, image_path = detect_image(data, secure_filename(name))
+    return build_detection_rows(dets, image_path, session_id, latitude, longitude)
+
+detection_jobs = DetectionJobManager(
+    app, process_job_image,
+    max_workers=int(os.getenv('DETECT_JOB_WORKERS', 4)),
+)
+
+@app.route('/detect/jobs', methods=['POST'])
+def create_detection_job():
+    uploads = request.files.getlist('files') + request.files.getlist('file')
+    if not uploads:
+        return jsonify({"error": "No file provided"}), 400
+
+    latitude = request.form.get('latitude', type=float)
+    longitude = request.form.get('longitude', type=float)
+    try:
+        job = detection_jobs.submit(
+            uploads,
+            session_id=request.form.get('sessionId', 'default'),
+            latitude=latitude,
+            longitude=longitude)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return jsonify(job.to_dict(include_results=False)), 202
+
+@app.route('/detect/jobs/<job_id>', methods=['GET'])
+def get_detection_job(job_id):
+    job = detection_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    include_results = request.args.get('results', '1') != '0'
+    return jsonify(job.to_dict(include_results=include_results))
 
 def generate_frames():
+    import cv2
     cap = cv2.VideoCapture(0)
     if not cap.isOpened():
         print("Error: Could not open video device.")
         return
-
-    class_colors = {
-        "glass": (0, 255, 255),
-        "metal": (255, 0, 0),
-        "trash": (0, 128, 128),
-        "bottle": (128, 128, 0),
-        "bottle": (0, 0, 255),
-        "float": (180, 105, 255),
-        "plastic": (255, 255, 0),
-        "rope": (192, 192, 192),
-        "container": (0, 255, 0),
-        "foam": (255, 0, 255)
-    }
     
     frame_count = 0
     last_detections = None  # Cache detections
@@ -273,24 +299,13 @@ def generate_frames():
 
             frame_count += 1
 
-            # Run detection every 5th frame
+            # Run detection every 10th frame
             if frame_count % 10 == 0:
-                results = model(frame, verbose=False)
-                last_detections = results[0].boxes  # cache detections
+                result = inference_server.infer(frame)
+                last_detections = extract_detections(result, conf_threshold=0.7)
 
             if last_detections is not None:
-                for det in last_detections:
-                    xyxy = det.xyxy.cpu().numpy().squeeze()
-                    conf = det.conf.item()
-                    cls_id = int(det.cls.item())
-                    class_name = model.model.names.get(cls_id, f"cls_{cls_id}")
-                    if conf >= 0.7:
-                        xmin, ymin, xmax, ymax = map(int, xyxy)
-                        color = class_colors.get(class_name.lower(), (0, 255, 0))
-                        cv2.rectangle(frame, (xmin, ymin), (xmax, ymax), color, 2)
-                        cv2.putText(frame, f"{class_name}: {conf:.2f}",
-                                    (xmin, ymin - 5), cv2.FONT_HERSHEY_SIMPLEX,
-                                    0.5, color, 2)
+                annotate(frame, last_detections, model)
 
             ret, buffer = cv2.imencode('.jpg', frame)
             if not ret:
@@ -306,10 +321,15 @@ def generate_frames():
     finally:
         cap.release()
 
-@app.route('/detections', methods=['GET'])
-def get_detections():
-    detections = Detection.query.order_by(Detection.timestamp.desc()).all()
-    return jsonify([{
+DETECTION_COLUMNS = (
+    Detection.id, Detection.class_name, Detection.confidence,
+    Detection.x_min, Detection.y_min, Detection.x_max, Detection.y_max,
+    Detection.image_path, Detection.detection_type, Detection.session_id,
+    Detection.timestamp, Detection.latitude, Detection.longitude,
+)
+
+def serialize_detection(det):
+    return {
         "id": det.id,
         "class_name": det.class_name,
         "confidence": det.confidence,
@@ -323,7 +343,138 @@ def get_detections():
         "timestamp": det.timestamp.isoformat(),
         "latitude": det.latitude,
         "longitude": det.longitude
-    } for det in detections])
+    }
+
+def detection_filters(args):
+    """Build WHERE clauses from /detections query args. Raises ValueError on bad input."""
+    filters = []
+    if args.get('session_id'):
+        filters.append(Detection.session_id == args['session_id'])
+    if args.get('class_name'):
+        filters.append(Detection.class_name.in_(args['class_name'].split(',')))
+    if args.get('start'):
+        filters.append(Detection.timestamp >= datetime.fromisoformat(args['start']))
+    if args.get('end'):
+        filters.append(Detection.timestamp <= datetime.fromisoformat(args['end']))
+    if args.get('bbox'):
+        # bbox=min_lon,min_lat,max_lon,max_lat
+        min_lon, min_lat, max_lon, max_lat = map(float, args['bbox'].split(','))
+        if min_lon > max_lon or min_lat > max_lat:
+            raise ValueError("Invalid bbox")
+        filters.extend(bbox_filters(min_lon, min_lat, max_lon, max_lat))
+    return filters
+
+def bbox_filters(min_lon, min_lat, max_lon, max_lat):
+    """
+    Clauses selecting detections inside a bbox. The geohash ranges let the
+    database use idx_geohash; the coordinate checks trim the cells' edges.
+    """
+    filters = [Detection.longitude.between(min_lon, max_lon),
+               Detection.latitude.between(min_lat, max_lat)]
+    ranges = []
+    for prefix in cell_prefixes(min_lon, min_lat, max_lon, max_lat):
+        low, high = prefix_range(prefix)
+        ranges.append(and_(Detection.geohash >= low, Detection.geohash < high)
+                      if high else Detection.geohash >= low)
+    if ranges:
+        # Rows stored before the geohash column existed until backfill-geohash runs
+        filters.append(db.or_(*ranges, Detection.geohash.is_(None)))
+    return filters
+
+@app.route('/detections', methods=['GET'])
+@cached('detection')
+def get_detections():
+    """
+    Detections newest first. Supports session_id, class_name (comma
+    separated), start/end (ISO timestamps) and bbox filters.
+
+    Without ?limit the whole result is streamed as a JSON array. With ?limit
+    one page is returned and the cursor for the next page is sent in the
+    X-Next-Cursor header; pass it back as ?cursor=.
+    """
+    try:
+        filters = detection_filters(request.args)
+        cursor = request.args.get('cursor')
+        if cursor:
+            filters.append(before_cursor(Detection.timestamp, Detection.id,
+                                         decode_cursor(cursor)))
+    except ValueError:
+        return jsonify({"error": "Invalid filter or cursor"}), 400
+
+    query = (db.select(*DETECTION_COLUMNS)
+             .where(*filters)
+             .order_by(Detection.timestamp.desc(), Detection.id.desc()))
+
+    limit = request.args.get('limit', type=int)
+    if limit is not None:
+        limit = max(1, min(limit, 1000))
+        rows = db.session.execute(query.limit(limit + 1)).all()
+        response = jsonify([serialize_detection(row) for row in rows[:limit]])
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            response.headers['X-Next-Cursor'] = encode_cursor(last.timestamp, last.id)
+        return response
+
+    rows = db.session.execute(query.execution_options(yield_per=500))
+    return Response(stream_with_context(stream_json_array(rows, serialize_detection)),
+                    mimetype='application/json')
+
+@app.route('/detections/nearby', methods=['GET'])
+@cached('detection')
+def get_nearby_detections():
+    """
+    Detections within ?radius= metres (default 500, max 50 km) of ?lat=&lon=,
+    nearest first, with their distance. Accepts the /detections filters and
+    ?limit= (default 500).
+    """
+    try:
+        lat = float(request.args['lat'])
+        lon = float(request.args['lon'])
+        radius = float(request.args.get('radius', 500))
+        limit = max(1, min(request.args.get('limit', 500, type=int), 1000))
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180) or not 0 < radius <= 50000:
+            raise ValueError("Out of range")
+        filters = detection_filters(request.args)
+    except (KeyError, ValueError):
+        return jsonify({"error": "lat, lon and a radius up to 50000 m are required"}), 400
+
+    filters.extend(bbox_filters(*radius_bbox(lat, lon, radius)))
+    rows = db.session.execute(db.select(*DETECTION_COLUMNS).where(*filters))
+
+    nearby = []
+    for row in rows:
+        distance = haversine_m(lat, lon, row.latitude, row.longitude)
+        if distance <= radius:
+            nearby.append((distance, row))
+    nearby.sort(key=lambda item: item[0])
+
+    result = []
+    for distance, row in nearby[:limit]:
+        item = serialize_detection(row)
+        item["distance_m"] = round(distance, 1)
+        result.append(item)
+    return jsonify(result)
+
+@app.route('/detections/clusters', methods=['GET'])
+@cached('detection')
+def get_detection_clusters():
+    """
+    Detections aggregated for a map view: ?zoom= picks a geohash grid about
+    48px per cell, and each occupied cell comes back as one point with its
+    count. Accepts the /detections filters, usually ?bbox= for the viewport.
+    """
+    try:
+        zoom = max(0, min(request.args.get('zoom', 13, type=int), 22))
+        filters = detection_filters(request.args)
+    except ValueError:
+        return jsonify({"error": "Invalid filter"}), 400
+
+    precision = zoom_precision(zoom)
+    return jsonify({
+        "zoom": zoom,
+        "precision": precision,
+        "clusters": detection_clusters(filters, precision),
+    })
 
 @app.route('/detections/<int:detection_id>', methods=['DELETE'])
 def delete_detection(detection_id):
@@ -331,89 +482,162 @@ def delete_detection(detection_id):
     if not detection:
         return jsonify({"error": "Detection not found"}), 404
 
-    # Check if other detections exist for this image
-    image_path = detection.image_path
-    other_detections = Detection.query.filter(
-        Detection.image_path == image_path,
-        Detection.id != detection_id
-    ).count()
-
-    # Only delete image file if no other detections remain
-    if other_detections == 0:
-        full_path = os.path.join(app.config['UPLOAD_FOLDER'], image_path)
-        if os.path.exists(full_path):
-            os.remove(full_path)
-
+    # Images are shared by every detection made from the same content
+    unreferenced = storage.release([detection])
+    rollups.remove_detections([detection])
     db.session.delete(detection)
     db.session.commit()
+    completed_details.clear()  # Routes of finished missions may have lost a point
+    event_bus.publish('detections_deleted', {"ids": [detection_id]})
+    deletion_queue.add(unreferenced)
     
     return jsonify({"message": "Detection deleted successfully", "id": detection_id}), 200
 
-# Fix delete_all_detections route
+# Files freed by deletes are removed in batches by a background thread
+deletion_queue = FileDeletionQueue(app, app.config['UPLOAD_FOLDER'])
+
+delete_all_job = DeleteAllDetections(
+    app, deletion_queue,
+    chunk_size=int(os.getenv('DELETE_CHUNK_SIZE', 5000)),
+    on_finish=completed_details.clear,
+)
+
 @app.route('/detections', methods=['DELETE'])
 def delete_all_detections():
-    try:
-        # Get unique image paths first
-        unique_images = db.session.query(Detection.image_path).distinct().all()
-        unique_images = [img[0] for img in unique_images if img[0]]
-
-        # Delete all detections
-        num_deleted = Detection.query.delete()
-        db.session.commit()
+    """
+    Starts deleting every detection in the background and returns 202 with
+    the job status; poll GET /detections/deletion for progress.
+    """
+    started = delete_all_job.start()
+    status = delete_all_job.status()
+    if not started:
+        return jsonify({"error": "A delete is already running", **status}), 409
+    return jsonify(status), 202
 
-        # Delete all unique images
-        for img in unique_images:
-            full_path = os.path.join(app.config['UPLOAD_FOLDER'], img)
-            if os.path.exists(full_path):
-                os.remove(full_path)
+@app.route('/detections/deletion', methods=['GET'])
+def get_deletion_status():
+    return jsonify(delete_all_job.status())
 
-        return jsonify({"message": f"Deleted {num_deleted} detections and images"}), 200
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({"error": "Failed to delete detections"}), 500
-import random
+# Newest sample per drone, kept in memory so status polls never hit uav_status
+latest_telemetry = LatestTelemetryStore(app)
 
 @app.route('/uavstatus', methods=['GET'])
 def get_uav_status():
-    latest_status = {
-        "id": random.randint(1, 999),
-        "battery": round(random.uniform(10,100),1),
-        "latitude": 43.2565 + random.uniform(-0.001, 0.001),
-        "longitude": 76.9285 + random.uniform(-0.001, 0.001),
-        "speed": round(random.uniform(1,10),2),
-        "altitude": round(random.uniform(50,150),2),
-        "timestamp": datetime.utcnow().isoformat()
-    }
-    return jsonify(latest_status)
+    """
+    Latest telemetry. ?drone_ids=1,2 returns a list (null for unknown
+    drones), ?drone_id=1 one drone, and no argument the most recently heard
+    drone. Every sample carries age_seconds.
+    """
+    now = datetime.utcnow()
+    try:
+        if request.args.get('drone_ids'):
+            drone_ids = [int(d) for d in request.args['drone_ids'].split(',') if d.strip()]
+            latest = latest_telemetry.get_many(drone_ids)
+            return jsonify([status_payload(latest[d], now) if latest[d] else None
+                            for d in drone_ids])
+        if request.args.get('drone_id'):
+            row = latest_telemetry.get(int(request.args['drone_id']))
+        else:
+            row = latest_telemetry.most_recent()
+    except ValueError:
+        return jsonify({"error": "Invalid drone id"}), 400
+
+    if row is None:
+        return jsonify({"error": "No telemetry received"}), 404
+    return jsonify(status_payload(row, now))
 
 
 @app.route('/uavstatus', methods=['POST'])
 def create_uav_status():
-    data = request.json
+    try:
+        row = parse_sample(request.json)
+    except (TypeError, ValueError, OverflowError):
+        return jsonify({"error": "Invalid UAV status"}), 400
 
-    # Validate the data from the frontend or wherever it comes from
-    new_status = UAVStatus(
-        battery=data.get("battery", 100),
-        latitude=data.get("latitude"),
-        longitude=data.get("longitude"),
-        speed=data.get("speed"),
-        altitude=data.get("altitude"),
-    )
+    new_status = UAVStatus(**row)
     db.session.add(new_status)
     db.session.commit()
+    row['id'] = new_status.id
+    latest_telemetry.update([row])
+    event_bus.publish('uav_status', status_payload(row))
 
     return jsonify({"message": "UAV status created successfully"}), 201
 
-@app.route('/notifications', methods=['GET'])
-def get_notifications():
-    notifications = Notification.query.order_by(Notification.timestamp.desc()).all()
-    return jsonify([{
+# High-rate telemetry is buffered and written in bulk by a background thread
+telemetry_buffer = TelemetryBuffer(
+    app,
+    max_pending=int(os.getenv('TELEMETRY_MAX_PENDING', 50000)),
+    flush_size=int(os.getenv('TELEMETRY_FLUSH_SIZE', 2000)),
+    flush_interval=float(os.getenv('TELEMETRY_FLUSH_INTERVAL', 0.5)),
+    on_flush=publish_latest,
+)
+
+@app.route('/uavstatus/batch', methods=['POST'])
+def ingest_uav_status_batch():
+    """
+    Accepts a JSON array (or {"samples": [...]}) or NDJSON body of UAV status
+    samples. Returns 202 once they are queued, or 503 with Retry-After when
+    the write buffer is full.
+    """
+    try:
+        rows = parse_batch(request.get_data(as_text=True), request.content_type)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        telemetry_buffer.add(rows)
+    except TelemetryBufferFull:
+        response = jsonify({"error": "Telemetry buffer full, retry later"})
+        response.headers['Retry-After'] = '1'
+        return response, 503
+    latest_telemetry.update(rows)
+
+    return jsonify({"accepted": len(rows), "pending": telemetry_buffer.pending}), 202
+
+@app.route('/uavstatus/batch/stats', methods=['GET'])
+def uav_status_ingest_stats():
+    return jsonify(telemetry_buffer.stats())
+
+@app.route('/uavstatus/history', methods=['GET'])
+def get_uav_status_history():
+    """
+    Track history for one drone between ?start= and ?end= (ISO, default the
+    last hour). Long windows are served from the downsampled rollups so at
+    most ?max_points= points (default 2000) come back.
+    """
+    try:
+        drone_id = int(request.args['drone_id'])
+        end = parse_timestamp(request.args.get('end'))
+        start = (parse_timestamp(request.args['start']) if request.args.get('start')
+                 else end - timedelta(hours=1))
+        max_points = min(int(request.args.get('max_points', 2000)), 10000)
+    except (KeyError, ValueError):
+        return jsonify({"error": "drone_id is required; start/end must be ISO timestamps"}), 400
+    if start >= end or max_points < 1:
+        return jsonify({"error": "Invalid time range"}), 400
+
+    resolution, points = telemetry_history.history(drone_id, start, end, max_points)
+    return jsonify({
+        "drone_id": drone_id,
+        "resolution": telemetry_history.resolution_label(resolution),
+        "resolutionSeconds": resolution,
+        "points": points,
+    })
+
+def serialize_notification(note):
+    return {
         'id': note.id,
         'message': note.message,
         'severity': note.severity,
         'timestamp': note.timestamp.isoformat(),
         'seen': note.seen
-    } for note in notifications])
+    }
+
+@app.route('/notifications', methods=['GET'])
+@cached('notification')
+def get_notifications():
+    notifications = Notification.query.order_by(Notification.timestamp.desc()).all()
+    return jsonify([serialize_notification(note) for note in notifications])
 
 @app.route('/notifications', methods=['POST'])
 def create_notification():
@@ -424,6 +648,7 @@ def create_notification():
     )
     db.session.add(new_note)
     db.session.commit()
+    event_bus.publish('notification', serialize_notification(new_note))
     return jsonify({"message": "Notification created"}), 201
 
 @app.route('/notifications/<int:note_id>', methods=['PATCH'])
@@ -433,9 +658,11 @@ def update_notification(note_id):
     if 'seen' in data:
         note.seen = data['seen']
     db.session.commit()
+    event_bus.publish('notification_updated', serialize_notification(note))
     return jsonify({"message": "Notification updated"})
 
 @app.route('/reports', methods=['GET'])
+@cached('report')
 def get_reports():
     session_id = request.args.get('session_id')
     # optionally filter by session, date range, etc.
@@ -461,24 +688,15 @@ def generate_report():
     data = request.json
     session_id = data.get('session_id', '').strip()  # Get session_id or empty string
     
-    # If session_id is provided, filter by it; otherwise use all detections
-    if session_id:
-        detections = Detection.query.filter_by(session_id=session_id).all()
-    else:
-        detections = Detection.query.all()
-
-    total = len(detections)
-    
-    # Tally object classes
-    class_counts = {}
-    for d in detections:
-        class_counts[d.class_name] = class_counts.get(d.class_name, 0) + 1
+    # Tally object classes in the database; without a session, use all detections
+    counts = class_counts(session_id or None)
+    total = sum(counts.values())
 
     # If no session was provided, you can store a default value (e.g., "all")
     new_report = Report(
         session_id = session_id if session_id else "all",
         total_detections = total,
-        detected_objects = class_counts,  # store as JSON
+        detected_objects = counts,  # store as JSON
     )
     db.session.add(new_report)
     db.session.commit()
@@ -497,6 +715,29 @@ def stream():
     return Response(generate_frames_camera(cam_index),
                     mimetype='multipart/x-mixed-replace; boundary=frame')
 
+@app.route('/events')
+def events():
+    """
+    Server-Sent Events stream of detections, notifications and UAV status.
+    ?types= limits it to a comma separated list of event types; reconnecting
+    clients resume from the Last-Event-ID header (or ?lastEventId=).
+    """
+    last_id = request.headers.get('Last-Event-ID') or request.args.get('lastEventId')
+    try:
+        last_id = int(last_id) if last_id else None
+    except ValueError:
+        last_id = None
+    types = request.args.get('types')
+    types = set(types.split(',')) if types else None
+
+    def stream_events():
+        yield 'retry: 3000\n\n'
+        for event in event_bus.subscribe(last_id, types):
+            yield format_sse(event)
+
+    return Response(stream_events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/api/login', methods=['POST'])
 def login():
     data = request.get_json()
@@ -710,13 +951,7 @@ def update_user(user_id):
 @jwt_required()
 def get_drones():
     try:
-        drones = Drone.query.all()
-        return jsonify([{
-            'id': drone.id,
-            'name': drone.name,
-            'status': drone.status,
-            'lastMission': Mission.query.get(drone.last_mission_id).start_time.isoformat() if drone.last_mission_id else None
-        } for drone in drones])
+        return jsonify(drone_summaries())
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -736,28 +971,12 @@ def delete_user(user_id):
     return jsonify({"msg": "User deleted successfully"})
 
 @app.route('/stats', methods=['GET'])
+@cached('detection_counts')
 def get_stats():
-    detections = Detection.query.all()
-    stats = {
-        'plastic': 0,
-        'metal': 0,
-        'glass': 0,
-        'paper': 0,
-        'bottle': 0,
-        'float': 0,
-        'rope': 0,
-        'container': 0,
-        'foam': 0
-    }
-    
-    for detection in detections:
-        class_name = detection.class_name.lower()
-        if class_name in stats:
-            stats[class_name] += 1
-    
-    return jsonify(stats)
+    return jsonify(dashboard_stats())
 
 @app.route('/missions', methods=['GET'])
+@cached('mission')
 def get_missions():
     missions = Mission.query.order_by(Mission.start_time.desc()).all()
     return jsonify([{
@@ -770,31 +989,144 @@ def get_missions():
     } for mission in missions])
 
 @app.route('/missions/<int:mission_id>/details', methods=['GET'])
+@cached('mission', 'detection')
 def get_mission_details(mission_id):
-    mission = Mission.query.get_or_404(mission_id)
-    
-    # Get detections during mission timeframe
-    detections = Detection.query.filter(
-        Detection.timestamp.between(mission.start_time, mission.end_time)
-    ).order_by(Detection.timestamp).all()
-    
-    start_location = None
-    end_location = None
-    route = []
-    
-    if detections:
-        start = detections[0]
-        end = detections[-1]
-        start_location = f"{start.latitude}, {start.longitude}"
-        end_location = f"{end.latitude}, {end.longitude}"
-        route = [f"{d.latitude}, {d.longitude}" for d in detections if d.latitude and d.longitude]
-    
-    return jsonify({
-        'startLocation': start_location,
-        'endLocation': end_location,
-        'objectTypes': mission.detected_objects,
-        'route': route
-    })
+    """
+    Route flown during a mission. ?tolerance= (metres, default 5, 0 for
+    every point) controls how aggressively long routes are simplified.
+    """
+    tolerance = request.args.get('tolerance', 5.0, type=float)
+    details = mission_details(mission_id, max(tolerance, 0.0))
+    if details is None:
+        return jsonify({"error": "Mission not found"}), 404
+    return jsonify(details)
+
+@app.cli.command('rebuild-detection-counts')
+def rebuild_detection_counts():
+    """Recompute the detection_counts rollup from the detection table."""
+    rows = rollups.rebuild()
+    print(f"Rebuilt detection_counts: {rows} rows")
+
+@app.cli.command('rebuild-mission-rollups')
+@click.option('--chunk-size', type=int, default=50, help='Missions per transaction.')
+def rebuild_mission_rollups(chunk_size):
+    """Attach historical detections to missions and recompute detected_objects."""
+    missions = rollups.rebuild_missions(chunk_size)
+    print(f"Rebuilt detected_objects for {missions} missions")
+
+@app.cli.command('backfill-geohash')
+@click.option('--batch-size', type=int, default=5000)
+def backfill_geohash(batch_size):
+    """Fill detection.geohash for rows stored before it existed."""
+    total = 0
+    while True:
+        rows = (db.session.query(Detection.id, Detection.latitude, Detection.longitude)
+                .filter(Detection.geohash.is_(None),
+                        Detection.latitude.isnot(None), Detection.longitude.isnot(None))
+                .order_by(Detection.id)
+                .limit(batch_size)
+                .all())
+        if not rows:
+            break
+        db.session.execute(db.update(Detection), [
+            {"id": row.id, "geohash": geohash_encode(row.latitude, row.longitude)} for row in rows])
+        db.session.commit()
+        total += len(rows)
+    print(f"Backfilled geohash for {total} detections")
+
+@app.cli.command('sweep-uploads')
+@click.option('--grace', type=int, default=600, help='Leave files younger than this many seconds.')
+@click.option('--dry-run', is_flag=True, help='Only report what would be deleted.')
+def sweep_uploads(grace, dry_run):
+    """Delete upload files no detection references."""
+    result = sweep_orphans(app.config['UPLOAD_FOLDER'], deletion_queue, grace, dry_run)
+    deletion_queue.flush()
+    print(f"Swept uploads: {result}, files: {deletion_queue.stats()}")
+
+@app.cli.command('export-model')
+@click.option('--backend', type=click.Choice(['onnx', 'openvino']), default='onnx')
+@click.option('--weights', default=None, help='Defaults to MODEL_PATH.')
+def export_model(backend, weights):
+    """Export the .pt weights for ONNX Runtime or OpenVINO."""
+    path = export_engine(weights or MODEL_PATH, backend, imgsz=DETECT_IMGSZ)
+    print(f"Exported {weights or MODEL_PATH} -> {path}; serve it with INFERENCE_BACKEND={backend}")
+
+@app.cli.command('check-parity')
+@click.option('--backend', type=click.Choice(BACKENDS), required=True)
+@click.option('--images', 'image_dir', required=True, type=click.Path(exists=True, file_okay=False))
+@click.option('--weights', default=None, help='Defaults to MODEL_PATH.')
+@click.option('--limit', type=int, default=200)
+@click.option('--conf', type=float, default=0.25, help='Confidence threshold for both engines.')
+@click.option('--min-iou', type=float, default=0.9)
+@click.option('--conf-tolerance', type=float, default=0.05)
+def check_parity(backend, image_dir, weights, limit, conf, min_iou, conf_tolerance):
+    """Compare a backend's boxes with PyTorch on a folder of images."""
+    import cv2
+    weights = weights or MODEL_PATH
+    names = sorted(f for f in os.listdir(image_dir)
+                   if os.path.splitext(f)[1].lower() in storage.IMAGE_EXTENSIONS)[:limit]
+    images = ((name, cv2.imread(os.path.join(image_dir, name))) for name in names)
+    images = [(name, img) for name, img in images if img is not None]
+
+    reference = load_engine(weights, 'torch', imgsz=DETECT_IMGSZ)
+    candidate = load_engine(weights, backend, imgsz=DETECT_IMGSZ)
+    report = parity_check(reference, candidate, images, conf, min_iou, conf_tolerance)
+    print(json.dumps(report, indent=2))
+    if not report['passed']:
+        raise SystemExit(1)
+
+@app.cli.command('quantize-model')
+@click.option('--data', required=True, type=click.Path(exists=True, dir_okay=False),
+              help='Dataset yaml the model was trained on (train split calibrates, val split scores).')
+@click.option('--weights', default=None, help='Defaults to MODEL_PATH.')
+@click.option('--calibration-size', type=int, default=300, help='Training images used to calibrate.')
+@click.option('--runs', type=int, default=200, help='Timed single-frame inferences per variant.')
+@click.option('--output', default='Rubbish/runs/detect/int8', help='Directory for the report.')
+@click.option('--skip-export', is_flag=True, help='Only report on models already exported.')
+def quantize_model(data, weights, calibration_size, runs, output, skip_export):
+    """Export an INT8 OpenVINO model and compare mAP and CPU latency with FP32."""
+    import quantization
+    weights = weights or MODEL_PATH
+    report = {"weights": weights, "data": data, "imgsz": DETECT_IMGSZ}
+    if not skip_export:
+        path, count = quantization.quantize(weights, data, output, DETECT_IMGSZ, calibration_size)
+        report["calibrationImages"] = count
+        print(f"Exported {weights} -> {path}")
+
+    engines = {backend: load_engine(weights, backend, imgsz=DETECT_IMGSZ)
+               for backend in quantization.available_variants(weights)}
+    frames = quantization.sample_frames(data)
+    report.update(quantization.variant_report(engines, data, frames, runs=runs))
+
+    os.makedirs(output, exist_ok=True)
+    with open(os.path.join(output, 'report.json'), 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"{'variant':<15}{'mAP50':>9}{'mAP50-95':>10}{'p50 ms':>9}{'p99 ms':>9}{'MB':>8}")
+    for name, result in report['variants'].items():
+        print(f"{name:<15}{result['map50']:>9.4f}{result['map50_95']:>10.4f}"
+              f"{result['p50Ms']:>9.1f}{result['p99Ms']:>9.1f}{result['sizeMb']:>8.1f}")
+    print(f"Report written to {os.path.join(output, 'report.json')}; "
+          f"pick a variant with INFERENCE_BACKEND")
+
+@app.cli.command('downsample-telemetry')
+@click.option('--interval', type=float, default=0,
+              help='Keep running, every INTERVAL seconds (default: run once).')
+@click.option('--no-retention', is_flag=True, help='Only downsample, do not delete old data.')
+def downsample_telemetry(interval, no_retention):
+    """Roll uav_status up into 1s/10s/1min buckets and apply retention."""
+    while True:
+        written = telemetry_history.downsample()
+        print(f"Downsampled telemetry: {written}")
+        if not no_retention:
+            deleted = telemetry_history.apply_retention()
+            print(f"Retention deleted: {deleted}")
+        db.session.remove()
+        if not interval:
+            break
+        time.sleep(interval)
 
 if __name__ == '__main__':
+    # With the debug reloader only the child process serves requests
+    if MODEL_WARMUP and os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        model.start_warm_up()
     app.run(debug=True)
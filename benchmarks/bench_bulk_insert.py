@@ -0,0 +1,104 @@
+# benchmarks/bench_bulk_insert.py
+"""
+Compare the old per-object ORM path of detect() against persistence.save_detections.
+
+    python benchmarks/bench_bulk_insert.py --images 200 --boxes 30
+    DATABASE_URI=postgresql://... python benchmarks/bench_bulk_insert.py
+
+Uses a throwaway SQLite database unless DATABASE_URI is set. Tables are
+created if missing and the benchmark rows are deleted afterwards, so do not
+point it at a database that is receiving real detections.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+
+from extensions import db
+from models import Detection, Notification
+from persistence import save_detections
+
+CLASSES = ['plastic', 'metal', 'glass', 'bottle', 'float', 'rope', 'container', 'foam']
+SESSION = 'bench-bulk-insert'
+
+
+def make_rows(boxes):
+    rows = []
+    for _ in range(boxes):
+        x, y = random.uniform(0, 400), random.uniform(0, 400)
+        rows.append({
+            "class_name": random.choice(CLASSES),
+            "confidence": round(random.uniform(0.7, 1.0), 2),
+            "x_min": round(x, 2),
+            "y_min": round(y, 2),
+            "x_max": round(x + 50, 2),
+            "y_max": round(y + 50, 2),
+            "image_path": "bench.jpg",
+            "session_id": SESSION,
+            "latitude": 43.25,
+            "longitude": 76.92,
+        })
+    return rows
+
+
+def per_object(rows):
+    # What detect() did before: one ORM object (and notification) per box
+    for row in rows:
+        db.session.add(Detection(**row))
+        db.session.add(Notification(message=f"Object detected: {row['class_name']}",
+                                    severity="info"))
+    db.session.commit()
+
+
+def bulk(rows):
+    save_detections(rows)
+
+
+def cleanup(first_note_id):
+    Detection.query.filter_by(session_id=SESSION).delete()
+    Notification.query.filter(Notification.id > first_note_id).delete(
+        synchronize_session=False)
+    db.session.commit()
+
+
+def run(name, fn, images, boxes):
+    batches = [make_rows(boxes) for _ in range(images)]
+    first_note_id = db.session.query(db.func.max(Notification.id)).scalar() or 0
+    start = time.perf_counter()
+    for rows in batches:
+        fn(rows)
+    elapsed = time.perf_counter() - start
+    cleanup(first_note_id)
+    per_request = elapsed / images * 1000
+    print(f"{name:<12} {elapsed:8.3f}s total  {per_request:8.2f} ms/image  "
+          f"{images * boxes / elapsed:10.0f} rows/s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--images', type=int, default=200)
+    parser.add_argument('--boxes', type=int, default=30)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    uri = os.getenv('DATABASE_URI')
+    if not uri:
+        uri = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+    app.config['SQLALCHEMY_DATABASE_URI'] = uri
+    db.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+        print(f"{args.images} images x {args.boxes} boxes on {db.engine.url.get_backend_name()}")
+        run("per-object", per_object, args.images, args.boxes)
+        run("bulk", bulk, args.images, args.boxes)
+
+
+if __name__ == '__main__':
+    main()
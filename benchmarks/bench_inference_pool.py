@@ -0,0 +1,91 @@
+# benchmarks/bench_inference_pool.py
+"""
+Throughput of in-process inference against ProcessInferencePool with 1..N
+worker processes, under concurrent callers like parallel /detect requests.
+
+    python benchmarks/bench_inference_pool.py --max-workers 4 --frames 400
+    python benchmarks/bench_inference_pool.py --images path/to/val/images --backend onnx
+
+Uses random 640x480 frames (the camera stream size) unless --images is
+given. Each pool configuration is warmed up before timing. Threads per
+worker default to an equal share of the cores, as in app.py.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from engines import LazyEngine
+from inference import BatchInferenceServer, ProcessInferencePool
+
+DEFAULT_WEIGHTS = "Rubbish/runs/detect/train/weights/best1.pt"
+
+
+def load_frames(image_dir, count):
+    if not image_dir:
+        rng = np.random.default_rng(0)
+        return [rng.integers(0, 255, (480, 640, 3), dtype=np.uint8) for _ in range(count)]
+    import cv2
+    names = sorted(os.listdir(image_dir))[:count]
+    frames = (cv2.imread(os.path.join(image_dir, name)) for name in names)
+    return [frame for frame in frames if frame is not None]
+
+
+def run(label, infer, frames, total, clients):
+    latencies = []
+
+    def one(i):
+        started = time.perf_counter()
+        infer(frames[i % len(frames)])
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(clients) as executor:
+        list(executor.map(one, range(total)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    fps = total / elapsed
+    print(f"{label:<22}{fps:>9.1f} fps{statistics.median(latencies):>10.1f} ms p50"
+          f"{latencies[int(len(latencies) * 0.99) - 1]:>10.1f} ms p99")
+    return fps
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--weights', default=DEFAULT_WEIGHTS)
+    parser.add_argument('--backend', default='auto')
+    parser.add_argument('--imgsz', type=int, default=512)
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count())
+    parser.add_argument('--threads', type=int, default=None, help='Threads per worker.')
+    parser.add_argument('--frames', type=int, default=400, help='Frames per configuration.')
+    parser.add_argument('--clients', type=int, default=16, help='Concurrent callers.')
+    parser.add_argument('--images', default=None, help='Directory of images to use as frames.')
+    args = parser.parse_args()
+
+    frames = load_frames(args.images, 50)
+    print(f"{args.frames} frames, {args.clients} concurrent callers, {os.cpu_count()} cores")
+
+    engine = LazyEngine(args.weights, args.backend, imgsz=args.imgsz)
+    engine.warm_up()
+    server = BatchInferenceServer(engine)
+    baseline = run("in-process batched", server.infer, frames, args.frames, args.clients)
+    server.stop()
+
+    for workers in range(1, args.max_workers + 1):
+        pool = ProcessInferencePool(args.weights, args.backend, imgsz=args.imgsz,
+                                    workers=workers, threads_per_worker=args.threads)
+        pool.warm_up()
+        fps = run(f"{workers} worker(s) x {pool.threads_per_worker} thr",
+                  pool.infer, frames, args.frames, args.clients)
+        print(f"{'':<22}{fps / baseline:>9.2f}x in-process")
+        pool.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+# benchmarks/bench_startup.py
+"""
+Time `import app` in fresh interpreters, then loading and warming up the
+model, and list which heavy modules the import pulled in.
+
+    python benchmarks/bench_startup.py --runs 5
+
+Each import runs in a new process, since a module is only imported once
+per interpreter. Uses a throwaway SQLite database unless DATABASE_URI is
+set; nothing is written to it.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ('torch', 'ultralytics', 'cv2', 'onnxruntime', 'openvino')
+
+IMPORT_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import app
+result = {"importMs": (time.perf_counter() - started) * 1000,
+          "heavy": [m for m in %r if m in sys.modules]}
+if %r:
+    started = time.perf_counter()
+    app.model.warm_up()
+    result["warmUpMs"] = (time.perf_counter() - started) * 1000
+    result["model"] = app.model.status()
+print(json.dumps(result))
+"""
+
+
+def run_once(warm_up, env):
+    script = IMPORT_SCRIPT % (HEAVY_MODULES, warm_up)
+    out = subprocess.run([sys.executable, '-c', script], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--no-warm-up', action='store_true')
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault('DATABASE_URI', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db'))
+
+    imports = [run_once(False, env) for _ in range(args.runs)]
+    times = sorted(r["importMs"] for r in imports)
+    print(f"import app: median {statistics.median(times):.0f} ms, "
+          f"min {times[0]:.0f} ms, max {times[-1]:.0f} ms over {args.runs} runs")
+    print(f"heavy modules imported: {', '.join(imports[0]['heavy']) or 'none'}")
+
+    if not args.no_warm_up:
+        result = run_once(True, env)
+        model = result["model"]
+        print(f"model load {model['loadMs']} ms, warm-up {model['warmUpMs']} ms "
+              f"({model['backend']} on {model['device']}), {result['warmUpMs']:.0f} ms total")
+
+
+if __name__ == '__main__':
+    main()
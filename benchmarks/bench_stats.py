@@ -0,0 +1,106 @@
+# benchmarks/bench_stats.py
+"""
+Compare the old Python-side tallies behind /stats and POST /reports with a
+GROUP BY over the detection table and with the detection_counts rollup.
+
+    python benchmarks/bench_stats.py --rows 1000000
+
+Builds a throwaway SQLite database with synthetic detections unless
+DATABASE_URI is set (in which case the synthetic rows are added to that
+database and removed afterwards).
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+
+import rollups
+from aggregates import class_counts, dashboard_stats, detection_class_counts, STATS_CLASSES
+from extensions import db
+from models import Detection
+
+CLASSES = ['Plastic', 'metal', 'glass', 'bottle', 'float', 'rope', 'container', 'foam', 'trash']
+SESSIONS = [f"bench-{i}" for i in range(50)]
+
+
+def populate(rows, chunk=50000):
+    now = datetime.utcnow()
+    for start in range(0, rows, chunk):
+        db.session.execute(Detection.__table__.insert(), [{
+            "class_name": random.choice(CLASSES),
+            "confidence": 0.9,
+            "x_min": 0.0, "y_min": 0.0, "x_max": 10.0, "y_max": 10.0,
+            "image_path": "bench.jpg",
+            "detection_type": "uploaded",
+            "session_id": random.choice(SESSIONS),
+            "timestamp": now,
+        } for _ in range(min(chunk, rows - start))])
+        db.session.commit()
+
+
+def old_stats():
+    stats = dict.fromkeys(STATS_CLASSES, 0)
+    for detection in Detection.query.all():
+        class_name = detection.class_name.lower()
+        if class_name in stats:
+            stats[class_name] += 1
+    return stats
+
+
+def old_report(session_id):
+    counts = {}
+    for d in Detection.query.filter_by(session_id=session_id).all():
+        counts[d.class_name] = counts.get(d.class_name, 0) + 1
+    return counts
+
+
+def timed(label, fn, *args):
+    db.session.expunge_all()
+    start = time.perf_counter()
+    result = fn(*args)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed * 1000:10.1f} ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000000)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    uri = os.getenv('DATABASE_URI')
+    if not uri:
+        uri = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+    app.config['SQLALCHEMY_DATABASE_URI'] = uri
+    db.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+        print(f"Inserting {args.rows} synthetic detections...")
+        populate(args.rows)
+        timed("rollup rebuild", rollups.rebuild)
+
+        try:
+            assert timed("stats: python tally", old_stats) == timed("stats: rollup", dashboard_stats)
+            session_id = SESSIONS[0]
+            expected = timed("report: python tally", old_report, session_id)
+            assert expected == timed("report: GROUP BY", detection_class_counts, session_id)
+            assert expected == timed("report: rollup", class_counts, session_id)
+            assert timed("report (all): GROUP BY", detection_class_counts) == \
+                timed("report (all): rollup", class_counts)
+        finally:
+            Detection.query.filter(Detection.session_id.in_(SESSIONS)).delete(
+                synchronize_session=False)
+            rollups.rebuild()
+
+
+if __name__ == '__main__':
+    main()
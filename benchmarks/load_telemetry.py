@@ -0,0 +1,116 @@
+# benchmarks/load_telemetry.py
+"""
+Load test for POST /uavstatus/batch.
+
+    python benchmarks/load_telemetry.py --url http://localhost:5000 \
+        --drones 200 --rate 5000 --batch 100 --duration 30
+
+Simulates --drones drones emitting telemetry at a combined --rate samples
+per second, posted as NDJSON batches of --batch samples from --threads
+concurrent senders. 503 responses (buffer full) are counted and retried
+after the server's Retry-After.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from datetime import datetime
+
+import requests
+
+
+def make_batch(drone_ids, size):
+    now = datetime.utcnow().isoformat()
+    lines = []
+    for _ in range(size):
+        lines.append(json.dumps({
+            "drone_id": random.choice(drone_ids),
+            "battery": round(random.uniform(10, 100), 1),
+            "latitude": 43.2565 + random.uniform(-0.01, 0.01),
+            "longitude": 76.9285 + random.uniform(-0.01, 0.01),
+            "speed": round(random.uniform(1, 15), 2),
+            "altitude": round(random.uniform(50, 150), 2),
+            "timestamp": now,
+        }))
+    return "\n".join(lines)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--drones', type=int, default=200)
+    parser.add_argument('--rate', type=float, default=5000, help="target samples per second")
+    parser.add_argument('--batch', type=int, default=100)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=30)
+    args = parser.parse_args()
+
+    endpoint = f"{args.url.rstrip('/')}/uavstatus/batch"
+    drone_ids = list(range(1, args.drones + 1))
+    # Each sender paces itself so the combined rate matches --rate
+    interval = args.batch * args.threads / args.rate
+
+    lock = threading.Lock()
+    totals = {"sent": 0, "rejected": 0, "errors": 0}
+    latencies = []
+    stop_at = time.monotonic() + args.duration
+
+    def sender():
+        session = requests.Session()
+        next_send = time.monotonic()
+        while time.monotonic() < stop_at:
+            body = make_batch(drone_ids, args.batch)
+            start = time.perf_counter()
+            try:
+                response = session.post(endpoint, data=body,
+                                        headers={'Content-Type': 'application/x-ndjson'})
+            except requests.RequestException:
+                with lock:
+                    totals["errors"] += 1
+                continue
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                if response.status_code == 202:
+                    totals["sent"] += args.batch
+                elif response.status_code == 503:
+                    totals["rejected"] += args.batch
+                else:
+                    totals["errors"] += 1
+            if response.status_code == 503:
+                time.sleep(float(response.headers.get('Retry-After', 1)))
+                continue
+            next_send += interval
+            delay = next_send - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=sender) for _ in range(args.threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - started
+
+    print(f"accepted  {totals['sent']} samples in {elapsed:.1f}s "
+          f"({totals['sent'] / elapsed:.0f} samples/s, target {args.rate:.0f})")
+    print(f"rejected  {totals['rejected']} samples (503 backpressure), {totals['errors']} errors")
+    print(f"latency   p50 {percentile(latencies, 50) * 1000:.1f} ms  "
+          f"p99 {percentile(latencies, 99) * 1000:.1f} ms")
+    try:
+        print("server   ", requests.get(f"{endpoint}/stats").json())
+    except (requests.RequestException, ValueError):
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+# caching.py
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from functools import wraps
+
+from flask import make_response, request
+from sqlalchemy import event
+
+
+class TableVersions:
+    """
+    Per-table write counters. A table's version is bumped after every commit
+    that touched it, so anything derived from a set of tables can be keyed on
+    their versions instead of re-querying to find out whether it changed.
+
+    Counters live in this process only; a process-unique epoch is mixed into
+    every key so ETags never survive a restart. Writes from other workers,
+    CLI commands or plain SQL are not counted here, which is why ETags also
+    expire with the TTL (see cached()).
+    """
+
+    def __init__(self):
+        self.epoch = uuid.uuid4().hex[:8]
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def bump(self, *tables):
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+
+    def get(self, tables):
+        with self._lock:
+            return tuple(self._versions.get(table, 0) for table in tables)
+
+
+class ResponseCache:
+    """Small in-process LRU of rendered responses with a per-entry TTL."""
+
+    def __init__(self, max_entries=256, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, ttl=None):
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, tables):
+        """Drop entries that depend on any of tables; they can never be hit again anyway."""
+        tables = set(tables)
+        self.discard(lambda key: tables.intersection(key[2]))
+
+    def discard(self, match):
+        """Drop every entry whose key match(key) is true for."""
+        with self._lock:
+            for key in [k for k in self._entries if match(k)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+table_versions = TableVersions()
+response_cache = ResponseCache()
+
+
+def _written_tables(session):
+    return session.info.setdefault('written_tables', set())
+
+
+def install(session):
+    """Bump table versions after each commit of the given (scoped) session."""
+
+    @event.listens_for(session, 'after_flush')
+    def track_flush(sess, flush_context):
+        tables = _written_tables(sess)
+        for obj in list(sess.new) + list(sess.dirty) + list(sess.deleted):
+            table = getattr(obj, '__tablename__', None)
+            if table:
+                tables.add(table)
+
+    @event.listens_for(session, 'do_orm_execute')
+    def track_statement(state):
+        # Core/bulk INSERT, UPDATE and DELETE issued through session.execute()
+        if state.is_insert or state.is_update or state.is_delete:
+            table = getattr(state.statement, 'table', None)
+            name = getattr(table, 'name', None)
+            if name:
+                _written_tables(state.session).add(name)
+
+    @event.listens_for(session, 'after_commit')
+    def bump_versions(sess):
+        tables = sess.info.pop('written_tables', None)
+        if tables:
+            table_versions.bump(*tables)
+            response_cache.invalidate(tables)
+
+    @event.listens_for(session, 'after_rollback')
+    def discard(sess):
+        sess.info.pop('written_tables', None)
+
+
+def cached(*tables, ttl=None):
+    """
+    Conditional GET + response caching for a read-only view that depends
+    only on the given tables and on the request's path and query string.
+
+    The ETag is derived from the tables' versions, so a matching
+    If-None-Match gets a 304 without running the view at all. Otherwise a
+    cached copy of the rendered response is served until one of the tables
+    is written or the TTL expires. Streamed responses get an ETag but are
+    not stored.
+
+    The versions only see writes made through this process's session, so
+    the ETag also includes the current TTL-sized time window: a 304 can be
+    stale for at most the TTL, like the cached body.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = (request.path, request.query_string, tables, table_versions.get(tables))
+            window = int(time.time() // max(response_cache.ttl if ttl is None else ttl, 1))
+            etag = hashlib.sha1(f"{table_versions.epoch}{window}{key}".encode()).hexdigest()[:20]
+
+            if etag in request.if_none_match:
+                response = make_response('', 304)
+            else:
+                entry = response_cache.get(key)
+                if entry is not None:
+                    body, status, headers = entry
+                    response = make_response(body, status, headers)
+                else:
+                    response = make_response(view(*args, **kwargs))
+                    if response.status_code == 200 and not response.is_streamed:
+                        headers = [(k, v) for k, v in response.headers
+                                   if k not in ('Content-Length', 'ETag')]
+                        response_cache.set(key, (response.get_data(), 200, headers), ttl)
+
+            response.set_etag(etag)
+            # Let browsers keep the body but always revalidate with If-None-Match
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator
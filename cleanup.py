@@ -0,0 +1,287 @@
+# cleanup.py
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import rollups
+import storage
+from events import event_bus
+from extensions import db
+from models import Detection
+
+
+class FileDeletionQueue:
+    """
+    Removes files under root on a background thread, batch_size at a time,
+    so requests that free thousands of images return immediately. Before a
+    stored image is removed its image_blob row is locked and re-checked, so
+    content uploaded again since it was queued is kept. Shard directories
+    left empty are removed too.
+    """
+
+    def __init__(self, app, root, batch_size=500):
+        self.app = app
+        self.root = root
+        self.batch_size = batch_size
+        self._paths = deque()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._busy = False
+
+        self.queued = 0
+        self.deleted = 0
+        self.missing = 0
+        self.failed = 0
+        self.kept = 0
+
+    def add(self, image_paths):
+        image_paths = [p for p in image_paths if p]
+        if not image_paths:
+            return
+        with self._cond:
+            self._paths.extend(image_paths)
+            self.queued += len(image_paths)
+            self._cond.notify_all()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="file-deleter", daemon=True)
+                self._thread.start()
+
+    @property
+    def pending(self):
+        with self._cond:
+            return len(self._paths)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "pending": len(self._paths),
+                "queued": self.queued,
+                "deleted": self.deleted,
+                "missing": self.missing,
+                "failed": self.failed,
+                "kept": self.kept,
+            }
+
+    def flush(self, timeout=None):
+        """Wait until the queue is empty (for tests and the CLI)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._paths or self._busy:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._paths:
+                    self._busy = False
+                    self._cond.notify_all()
+                    self._cond.wait()
+                batch = [self._paths.popleft()
+                         for _ in range(min(self.batch_size, len(self._paths)))]
+                self._busy = True
+
+            with self.app.app_context():
+                try:
+                    deleted, missing, failed, kept = self._delete(batch)
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Failed to delete {len(batch)} files: {e}")
+                    deleted, missing, failed, kept = 0, 0, len(batch), 0
+                finally:
+                    db.session.remove()
+
+            with self._cond:
+                self.deleted += deleted
+                self.missing += missing
+                self.failed += failed
+                self.kept += kept
+
+    def _delete(self, batch):
+        # The blob rows stay locked until the files are gone
+        reused = storage.claim_unreferenced(batch)
+        deleted = missing = failed = 0
+        directories = set()
+        for image_path in batch:
+            if image_path in reused:
+                continue
+            full_path = os.path.join(self.root, image_path)
+            try:
+                os.remove(full_path)
+                deleted += 1
+            except FileNotFoundError:
+                missing += 1
+            except OSError as e:
+                failed += 1
+                print(f"Failed to delete {image_path}: {e}")
+            directories.add(os.path.dirname(full_path))
+        db.session.commit()
+
+        for directory in sorted(directories, key=len, reverse=True):
+            self._prune(directory)
+        return deleted, missing, failed, len(reused)
+
+    def _prune(self, directory):
+        """Remove directory and its parents up to root while they are empty."""
+        root = os.path.abspath(self.root)
+        directory = os.path.abspath(directory)
+        while directory.startswith(root + os.sep):
+            try:
+                os.rmdir(directory)
+            except OSError:
+                break  # Not empty, or already gone
+            directory = os.path.dirname(directory)
+
+
+class DeleteAllDetections:
+    """
+    Background DELETE of every detection that existed when it started, in
+    chunks of chunk_size rows with a commit after each, so no statement
+    holds the table for long and uploads keep working meanwhile. Rollups
+    and image refcounts are adjusted per chunk, and images that end up
+    unreferenced are handed to the deletion queue.
+    """
+
+    def __init__(self, app, deletion_queue, chunk_size=5000, on_finish=None):
+        self.app = app
+        self.deletion_queue = deletion_queue
+        self.chunk_size = chunk_size
+        self.on_finish = on_finish
+        self._lock = threading.Lock()
+        self._thread = None
+        self.state = 'idle'
+        self.total = 0
+        self.deleted = 0
+        self.files_queued = 0
+        self.started_at = None
+        self.finished_at = None
+        self.error = None
+
+    def start(self):
+        """Start a run unless one is in progress. Returns False if already running."""
+        with self._lock:
+            if self.state == 'running':
+                return False
+            self.state = 'running'
+            self.total = self.deleted = self.files_queued = 0
+            self.started_at, self.finished_at, self.error = datetime.utcnow(), None, None
+            self._thread = threading.Thread(target=self._run, name="delete-detections", daemon=True)
+            self._thread.start()
+            return True
+
+    def status(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "total": self.total,
+                "deleted": self.deleted,
+                "filesQueued": self.files_queued,
+                "startedAt": self.started_at.isoformat() if self.started_at else None,
+                "finishedAt": self.finished_at.isoformat() if self.finished_at else None,
+                "error": self.error,
+                "files": self.deletion_queue.stats(),
+            }
+
+    def join(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        with self.app.app_context():
+            try:
+                max_id = db.session.query(db.func.max(Detection.id)).scalar() or 0
+                total = db.session.query(db.func.count(Detection.id)).filter(Detection.id <= max_id).scalar()
+                with self._lock:
+                    self.total = total
+
+                while True:
+                    rows = (db.session.query(Detection.id, Detection.image_path, Detection.session_id,
+                                             Detection.class_name, Detection.timestamp,
+                                             Detection.mission_id)
+                            .filter(Detection.id <= max_id)
+                            .order_by(Detection.id)
+                            .limit(self.chunk_size)
+                            .all())
+                    if not rows:
+                        break
+                    unreferenced = storage.release(rows)
+                    rollups.remove_detections(rows)
+                    ids = [row.id for row in rows]
+                    db.session.execute(db.delete(Detection).where(Detection.id.in_(ids))
+                                       .execution_options(synchronize_session=False))
+                    db.session.commit()
+
+                    self.deletion_queue.add(unreferenced)
+                    with self._lock:
+                        self.deleted += len(ids)
+                        self.files_queued += len(unreferenced)
+                state, error = 'done', None
+                event_bus.publish('detections_deleted', {"all": True})
+            except Exception as e:
+                db.session.rollback()
+                print(f"Deleting detections failed: {e}")
+                state, error = 'failed', str(e)
+            finally:
+                db.session.remove()
+
+        with self._lock:
+            self.state, self.error = state, error
+            self.finished_at = datetime.utcnow()
+        if self.on_finish is not None:
+            self.on_finish()
+
+
+def sweep_orphans(root, deletion_queue, grace_seconds=600, dry_run=False):
+    """
+    Reconcile root against Detection.image_path: files no detection points
+    at are queued for deletion. Files younger than grace_seconds are left
+    alone since their rows may not be committed yet. Returns counts,
+    including referenced paths whose file is missing.
+    """
+    referenced = set()
+    query = (db.session.query(Detection.image_path)
+             .filter(Detection.image_path.isnot(None))
+             .distinct()
+             .execution_options(yield_per=10000))
+    for (image_path,) in query:
+        referenced.add(image_path)
+
+    cutoff = time.time() - grace_seconds
+    orphans, seen = [], set()
+    for directory, _, files in os.walk(root):
+        for name in files:
+            full_path = os.path.join(directory, name)
+            image_path = os.path.relpath(full_path, root).replace(os.sep, '/')
+            seen.add(image_path)
+            if image_path in referenced:
+                continue
+            try:
+                if os.path.getmtime(full_path) > cutoff:
+                    continue
+            except OSError:
+                continue
+            orphans.append(image_path)
+
+    # Blob rows for content no detection uses any more
+    stale_blobs = db.session.execute(
+        storage.blobs.delete().where(storage.blobs.c.path.notin_(
+            db.select(Detection.image_path).where(Detection.image_path.isnot(None)))))
+    if dry_run:
+        db.session.rollback()
+    else:
+        db.session.commit()
+        deletion_queue.add(orphans)
+
+    return {
+        "referenced": len(referenced),
+        "files": len(seen),
+        "orphans": len(orphans),
+        "missing": len(referenced - seen),
+        "staleBlobs": stale_blobs.rowcount,
+    }
@@ -0,0 +1,320 @@
+# engines.py
+import importlib.util
+import os
+import threading
+import time
+
+import numpy as np
+
+from postprocess import extract_detections
+
+BACKENDS = ('torch', 'onnx', 'openvino', 'openvino-int8')
+
+# Python module each exported backend runs on
+RUNTIMES = {'onnx': 'onnxruntime', 'openvino': 'openvino', 'openvino-int8': 'openvino'}
+
+
+def backend_available(backend):
+    return backend == 'torch' or importlib.util.find_spec(RUNTIMES[backend]) is not None
+
+
+def export_path(weights, backend):
+    """Where ultralytics puts the exported model for weights (best1.pt -> best1.onnx)."""
+    stem = os.path.splitext(weights)[0]
+    if backend == 'onnx':
+        return stem + '.onnx'
+    if backend == 'openvino':
+        return stem + '_openvino_model'
+    if backend == 'openvino-int8':
+        return stem + '_int8_openvino_model'
+    return weights
+
+
+class InferenceEngine:
+    """
+    A YOLO detector behind one interface whichever runtime executes it.
+    ultralytics loads .pt weights with PyTorch, .onnx with onnxruntime and
+    *_openvino_model directories with OpenVINO, and returns the same
+    Results objects from all of them, so callers can keep using
+    engine(images) and engine.names exactly as they used the YOLO model.
+    """
+
+    def __init__(self, weights, backend='torch', imgsz=512, device=None):
+        from ultralytics import YOLO  # pulls in torch, so only once a model is needed
+        self.weights = weights
+        self.backend = backend
+        self.imgsz = imgsz
+        self.path = export_path(weights, backend)
+        self.model = YOLO(self.path, task='detect')
+        self.device = None
+        if device and backend == 'torch':
+            self.to(device)
+
+    @property
+    def names(self):
+        return self.model.names
+
+    def to(self, device):
+        self.model.to(device)
+        self.device = device
+        return self
+
+    def __call__(self, source, **kwargs):
+        kwargs.setdefault('imgsz', self.imgsz)
+        kwargs.setdefault('verbose', False)
+        return self.model(source, **kwargs)
+
+    def detect(self, images, conf_threshold=0.0):
+        """DETECTION_DTYPE arrays, one per image."""
+        return [extract_detections(result, conf_threshold) for result in self(list(images))]
+
+    def __repr__(self):
+        return f"InferenceEngine({self.path!r}, backend={self.backend!r})"
+
+
+def resolve_backend(weights, backend='auto'):
+    """
+    The backend load_engine would use for weights. 'auto' picks the first of
+    OpenVINO, ONNX Runtime and PyTorch whose runtime is installed and whose
+    exported model exists next to weights; the INT8 model changes accuracy
+    and is only used when asked for. Asking for a specific backend that
+    cannot be used raises instead of silently falling back.
+    """
+    backend = (backend or 'auto').lower()
+    if backend == 'auto':
+        for candidate in ('openvino', 'onnx'):
+            if backend_available(candidate) and os.path.exists(export_path(weights, candidate)):
+                return candidate
+        return 'torch'
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend {backend!r}, expected one of {BACKENDS}")
+    if not backend_available(backend):
+        raise RuntimeError(f"{backend} backend needs the {RUNTIMES[backend]} package")
+    if not os.path.exists(export_path(weights, backend)):
+        raise FileNotFoundError(
+            f"{export_path(weights, backend)} not found; run `flask export-model --backend {backend}`")
+    return backend
+
+
+def load_engine(weights, backend='auto', imgsz=512, device=None):
+    """Load weights on the backend chosen by resolve_backend."""
+    return InferenceEngine(weights, resolve_backend(weights, backend), imgsz, device)
+
+
+class LazyEngine:
+    """
+    Stands in for an InferenceEngine that is only loaded on first use, so
+    importing the app (migrations, CLI commands) doesn't pay for torch and
+    ultralytics. get() loads it once from whichever thread asks first;
+    calling the LazyEngine or reading .names does the same, so it can be
+    handed to the batch server and camera hub like the engine itself.
+
+    warm_up() loads the model and runs dummy inferences at imgsz so graph
+    setup is not paid by the first real request; start_warm_up() does that
+    on a background thread and status() reports progress for /ready.
+    """
+
+    def __init__(self, weights, backend='auto', imgsz=512, use_cuda=True):
+        self.weights = weights
+        self.requested_backend = backend
+        self.imgsz = imgsz
+        self.use_cuda = use_cuda
+        self._engine = None
+        self._version = None
+        self._lock = threading.Lock()
+        self._warm_up_thread = None
+
+        self.warm = False
+        self.error = None
+        self.load_ms = None
+        self.warm_up_ms = None
+
+    @property
+    def loaded(self):
+        return self._engine is not None
+
+    @property
+    def backend(self):
+        if self._engine is not None:
+            return self._engine.backend
+        return resolve_backend(self.weights, self.requested_backend)
+
+    @property
+    def version(self):
+        """Identifies the weights and backend in result cache keys."""
+        if self._version is None:
+            from storage import file_hash
+            self._version = f"{file_hash(self.weights)[:16]}-{self.backend}"
+        return self._version
+
+    def get(self):
+        if self._engine is None:
+            with self._lock:
+                if self._engine is None:
+                    started = time.perf_counter()
+                    engine = load_engine(self.weights, self.requested_backend, self.imgsz)
+                    if engine.backend == 'torch' and self.use_cuda:
+                        import torch
+                        if torch.cuda.is_available():
+                            engine.to('cuda')
+                    self.load_ms = round((time.perf_counter() - started) * 1000, 1)
+                    print(f"Loaded {engine!r} on {engine.device or 'cpu'} in {self.load_ms} ms")
+                    self._engine = engine
+        return self._engine
+
+    @property
+    def names(self):
+        return self.get().names
+
+    def __call__(self, source, **kwargs):
+        return self.get()(source, **kwargs)
+
+    def detect(self, images, conf_threshold=0.0):
+        return self.get().detect(images, conf_threshold)
+
+    def warm_up(self, runs=2):
+        """Load the model and run `runs` dummy frames through it. Returns True once warm."""
+        try:
+            engine = self.get()
+            started = time.perf_counter()
+            frame = np.zeros((self.imgsz, self.imgsz, 3), dtype=np.uint8)
+            for _ in range(runs):
+                engine(frame)
+            self.warm_up_ms = round((time.perf_counter() - started) * 1000, 1)
+            self.warm = True
+        except Exception as e:
+            print(f"Model warm-up failed: {e}")
+            self.error = str(e)
+        return self.warm
+
+    def start_warm_up(self):
+        """Warm up on a background thread unless already started."""
+        if self._warm_up_thread is not None:
+            return
+        with self._lock:
+            if self._warm_up_thread is not None:
+                return
+            self._warm_up_thread = threading.Thread(target=self.warm_up, name="model-warm-up", daemon=True)
+            self._warm_up_thread.start()
+
+    def status(self):
+        if self.warm:
+            state = 'ready'
+        elif self.error:
+            state = 'failed'
+        elif self._warm_up_thread is not None:
+            state = 'warming'
+        else:
+            state = 'cold'
+        return {
+            "state": state,
+            "weights": self.weights,
+            "backend": self._engine.backend if self._engine else None,
+            "device": (self._engine.device or 'cpu') if self._engine else None,
+            "loadMs": self.load_ms,
+            "warmUpMs": self.warm_up_ms,
+            "error": self.error,
+        }
+
+    def __repr__(self):
+        return f"LazyEngine({self.weights!r}, backend={self.requested_backend!r}, loaded={self.loaded})"
+
+
+def export(weights, backend, imgsz=512, **kwargs):
+    """
+    Export .pt weights for backend with a dynamic batch dimension, so the
+    batch inference server can keep sending lists. Returns the output path.
+
+    'openvino-int8' is post-training quantized with NNCF and needs
+    data=<dataset yaml> whose images calibrate the activation ranges
+    (see quantization.calibration_dataset).
+    """
+    if backend not in RUNTIMES:
+        raise ValueError(f"Can only export to {tuple(RUNTIMES)}")
+    from ultralytics import YOLO
+    kwargs.setdefault('dynamic', True)
+    if backend == 'openvino-int8':
+        if not kwargs.get('data'):
+            raise ValueError("INT8 export needs calibration data")
+        return YOLO(weights).export(format='openvino', int8=True, imgsz=imgsz, **kwargs)
+    return YOLO(weights).export(format=backend, imgsz=imgsz, **kwargs)
+
+
+def box_iou(a, b):
+    """IoU matrix between two (N, 4) / (M, 4) xyxy arrays."""
+    tl = np.maximum(a[:, None, :2], b[None, :, :2])
+    br = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(br - tl, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+def compare_detections(reference, candidate, min_iou=0.9, conf_tolerance=0.05):
+    """
+    Greedily match candidate boxes to reference boxes of the same class.
+    Returns (matched, missing, extra, worst_iou, max_conf_delta), where
+    missing and extra are the indices of the unmatched reference and
+    candidate boxes; a box only counts as matched if IoU >= min_iou and
+    the confidences differ by at most conf_tolerance.
+    """
+    matched, worst_iou, max_conf_delta = 0, 1.0, 0.0
+    used_ref, used = set(), set()
+    if len(reference) and len(candidate):
+        ious = box_iou(reference['box'], candidate['box'])
+        ious[reference['cls'][:, None] != candidate['cls'][None, :]] = 0
+        for i in np.argsort(-reference['conf']):
+            for j in np.argsort(-ious[i]):
+                if j in used:
+                    continue
+                if ious[i, j] < min_iou:
+                    break
+                delta = abs(float(reference['conf'][i]) - float(candidate['conf'][j]))
+                if delta > conf_tolerance:
+                    break
+                used_ref.add(i)
+                used.add(j)
+                matched += 1
+                worst_iou = min(worst_iou, float(ious[i, j]))
+                max_conf_delta = max(max_conf_delta, delta)
+                break
+    missing = np.array([i for i in range(len(reference)) if i not in used_ref], dtype=int)
+    extra = np.array([j for j in range(len(candidate)) if j not in used], dtype=int)
+    return matched, missing, extra, worst_iou, max_conf_delta
+
+
+def parity_check(reference, candidate, images, conf_threshold=0.25, min_iou=0.9,
+                 conf_tolerance=0.05, batch_size=8):
+    """
+    Run both engines over images and check that every box matches. Boxes
+    close to conf_threshold can legitimately appear on one side only, so
+    unmatched boxes within conf_tolerance of it are reported but tolerated.
+    """
+    report = {"images": 0, "boxes": 0, "matched": 0, "missing": 0, "extra": 0,
+              "borderline": 0, "worstIou": 1.0, "maxConfDelta": 0.0, "failures": []}
+    images = list(images)
+    for start in range(0, len(images), batch_size):
+        batch = images[start:start + batch_size]
+        names = [name for name, _ in batch]
+        frames = [frame for _, frame in batch]
+        for name, ref, cand in zip(names, reference.detect(frames, conf_threshold),
+                                   candidate.detect(frames, conf_threshold)):
+            matched, missing, extra, worst_iou, conf_delta = compare_detections(
+                ref, cand, min_iou, conf_tolerance)
+            # Unmatched boxes that only just made the threshold on one side
+            near = conf_threshold + conf_tolerance
+            borderline = int((ref['conf'][missing] < near).sum() + (cand['conf'][extra] < near).sum())
+            missing, extra = len(missing), len(extra)
+            report["images"] += 1
+            report["boxes"] += len(ref)
+            report["matched"] += matched
+            report["missing"] += missing
+            report["extra"] += extra
+            report["worstIou"] = min(report["worstIou"], worst_iou)
+            report["maxConfDelta"] = max(report["maxConfDelta"], conf_delta)
+            if missing + extra > borderline:
+                report["failures"].append({"image": name, "missing": missing, "extra": extra})
+            else:
+                report["borderline"] += missing + extra
+    report["passed"] = not report["failures"]
+    return report
@@ -0,0 +1,77 @@
+# events.py
+import json
+import threading
+import time
+from collections import deque
+
+
+class EventBus:
+    """
+    In-process publish/subscribe bus behind the /events SSE endpoint.
+
+    Every event gets an increasing id and the most recent `history` events
+    are kept, so a client reconnecting with Last-Event-ID receives what it
+    missed. If it fell further behind than the history goes, it gets a
+    "reset" event and should refetch its data.
+    """
+
+    def __init__(self, history=1000):
+        self._events = deque(maxlen=history)
+        self._cond = threading.Condition()
+        self._last_id = 0
+
+    @property
+    def last_id(self):
+        with self._cond:
+            return self._last_id
+
+    def publish(self, event_type, data):
+        with self._cond:
+            self._last_id += 1
+            self._events.append((self._last_id, event_type, data))
+            self._cond.notify_all()
+            return self._last_id
+
+    def _since(self, last_id):
+        """Events after last_id, or None if some of them were already dropped."""
+        if self._events and last_id < self._events[0][0] - 1:
+            return None
+        return [e for e in self._events if e[0] > last_id]
+
+    def subscribe(self, last_id=None, types=None, keepalive=15.0):
+        """
+        Generator of (id, type, data) tuples, or None every `keepalive`
+        seconds when nothing happened so the caller can keep the connection
+        alive. Starts after last_id, or at the next new event when None.
+        """
+        with self._cond:
+            if last_id is None or last_id > self._last_id:
+                last_id = self._last_id
+
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._last_id > last_id, keepalive)
+                pending = self._since(last_id)
+                if pending is None:
+                    last_id = self._last_id
+                    pending = [(last_id, 'reset', {})]
+
+            if not pending:
+                yield None
+                continue
+
+            for event in pending:
+                last_id = event[0]
+                if types is None or event[1] in types or event[1] == 'reset':
+                    yield event
+
+
+def format_sse(event):
+    """Render one event (or a keepalive when None) in text/event-stream format."""
+    if event is None:
+        return f": keepalive {int(time.time())}\n\n"
+    event_id, event_type, data = event
+    return f"id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data)}\n\n"
+
+
+event_bus = EventBus()
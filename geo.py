@@ -0,0 +1,116 @@
+# geo.py
+import math
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+DECODE = {c: i for i, c in enumerate(BASE32)}
+
+# Stored precision; 9 characters is a cell of roughly 5 x 5 m
+GEOHASH_PRECISION = 9
+
+EARTH_RADIUS_M = 6371000.0
+
+
+def geohash_encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Geohash of a point, or None when either coordinate is missing."""
+    if latitude is None or longitude is None:
+        return None
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    chars = []
+    bits, value, even = 0, 0, True
+    while len(chars) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            if longitude >= mid:
+                value, lon_lo = value * 2 + 1, mid
+            else:
+                value, lon_hi = value * 2, mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if latitude >= mid:
+                value, lat_lo = value * 2 + 1, mid
+            else:
+                value, lat_hi = value * 2, mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits, value = 0, 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """(height, width) in degrees of a geohash cell of the given length."""
+    lon_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+
+def _cell_range(lo, hi, origin, size, count):
+    first = min(int((lo - origin) // size), count - 1)
+    last = min(int((hi - origin) // size), count - 1)
+    return range(max(first, 0), max(last, 0) + 1)
+
+
+def cell_prefixes(min_lon, min_lat, max_lon, max_lat, max_cells=32):
+    """
+    Geohash prefixes whose cells together cover the bbox, using the longest
+    prefix length that needs at most max_cells cells. Returns [] for boxes
+    so large that an index lookup would not narrow anything down.
+    """
+    for precision in range(GEOHASH_PRECISION, 1, -1):
+        height, width = cell_size(precision)
+        lat_cells = _cell_range(min_lat, max_lat, -90.0, height, round(180.0 / height))
+        lon_cells = _cell_range(min_lon, max_lon, -180.0, width, round(360.0 / width))
+        if len(lat_cells) * len(lon_cells) <= max_cells:
+            break
+    else:
+        return []
+
+    # Encode the centre of every grid cell the box touches
+    return sorted({geohash_encode(-90.0 + (i + 0.5) * height, -180.0 + (j + 0.5) * width, precision)
+                   for i in lat_cells for j in lon_cells})
+
+
+def radius_bbox(latitude, longitude, radius_m):
+    """(min_lon, min_lat, max_lon, max_lat) enclosing a circle."""
+    dlat = math.degrees(radius_m / EARTH_RADIUS_M)
+    coslat = max(math.cos(math.radians(latitude)), 1e-6)
+    dlon = min(math.degrees(radius_m / (EARTH_RADIUS_M * coslat)), 180.0)
+    return (max(longitude - dlon, -180.0), max(latitude - dlat, -90.0),
+            min(longitude + dlon, 180.0), min(latitude + dlat, 90.0))
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def zoom_precision(zoom, cell_px=48):
+    """
+    Geohash length whose cells are about cell_px wide on a web-mercator map
+    at the given zoom level; used to pick the clustering grid.
+    """
+    world_px = 256 * 2 ** zoom
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        if world_px * cell_size(precision)[1] / 360.0 >= cell_px:
+            return precision
+    return 1
+
+
+def prefix_range(prefix):
+    """
+    (low, high) such that low <= geohash < high matches every geohash
+    starting with prefix; high is None past the last cell. Unlike LIKE
+    'prefix%' this can use a plain b-tree index under any collation.
+    """
+    chars = list(prefix)
+    while chars:
+        i = DECODE[chars[-1]]
+        if i + 1 < len(BASE32):
+            chars[-1] = BASE32[i + 1]
+            return prefix, ''.join(chars)
+        chars.pop()
+    return prefix, None
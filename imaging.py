@@ -0,0 +1,56 @@
+# imaging.py
+import io
+
+import numpy as np
+from PIL import Image
+
+# cv2 can let libjpeg decode straight to 1/2 or 1/4 size, skipping most of the work
+REDUCED_FLAGS = ((4, 'IMREAD_REDUCED_COLOR_4'), (2, 'IMREAD_REDUCED_COLOR_2'))
+
+
+def image_size(data):
+    """(width, height) from the image header without decoding pixels, or None."""
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            return img.size
+    except Exception:
+        return None
+
+
+def decode_for_inference(data, imgsz=512):
+    """
+    Decode an upload for a model that letterboxes to imgsz. Images at least
+    twice that size are decoded at 1/2 or 1/4 resolution as long as the
+    longest side stays >= imgsz, so the model sees the same detail.
+
+    Returns (image, (scale_x, scale_y)) where the scales map boxes found on
+    the decoded image back to original pixel coordinates, or (None, None)
+    if the data is not a decodable image.
+    """
+    import cv2  # imported on first use to keep app startup fast
+    buffer = np.frombuffer(data, np.uint8)
+    size = image_size(data)
+    if size is not None:
+        for factor, flag in REDUCED_FLAGS:
+            if max(size) // factor >= imgsz:
+                img = cv2.imdecode(buffer, getattr(cv2, flag))
+                if img is None:
+                    break
+                width, height = size
+                if (img.shape[1] > img.shape[0]) != (width > height):
+                    # cv2 applied an EXIF rotation the header size doesn't reflect
+                    width, height = height, width
+                return img, (width / img.shape[1], height / img.shape[0])
+
+    img = cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+    if img is None:
+        return None, None
+    return img, (1.0, 1.0)
+
+
+def scale_boxes(dets, scale):
+    """Rescale DETECTION_DTYPE boxes in place from decoded to original pixels."""
+    if len(dets) and scale != (1.0, 1.0):
+        dets['box'][:, [0, 2]] *= scale[0]
+        dets['box'][:, [1, 3]] *= scale[1]
+    return dets
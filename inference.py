@@ -0,0 +1,573 @@
+# inference.py
+import atexit
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+class BatchInferenceServer:
+    """
+    Collects images submitted from concurrent request threads into batches
+    and runs one model([...]) call per batch on a single worker thread.
+
+    A batch is dispatched as soon as it holds max_batch_size images or the
+    oldest queued image has waited max_wait_ms, whichever comes first. The
+    model itself is only ever called from the worker thread.
+    """
+
+    def __init__(self, model, max_batch_size=8, max_wait_ms=10, **predict_kwargs):
+        self.model = model
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0, max_wait_ms) / 1000.0
+        self.predict_kwargs = predict_kwargs
+        self.predict_kwargs.setdefault('verbose', False)
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+        # Simple counters, handy for checking that batching actually happens
+        self.batches = 0
+        self.images = 0
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="batch-inference", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout=5.0):
+        self._queue.put(None)
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def submit(self, image):
+        """Queue one image and return a Future resolving to its Results object."""
+        self.start()
+        future = Future()
+        self._queue.put((image, future))
+        return future
+
+    def infer(self, image, timeout=None):
+        return self.submit(image).result(timeout)
+
+    def _collect(self):
+        item = self._queue.get()
+        if item is None:
+            return None
+        batch = [item]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                # Finish the current batch, then let _run see the sentinel
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                break
+
+            # Drop requests whose caller already gave up
+            batch = [(img, fut) for img, fut in batch if fut.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            images = [img for img, _ in batch]
+            try:
+                results = self.model(images, **self.predict_kwargs)
+            except Exception as e:
+                print(f"Batch inference error: {e}")
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.images += len(batch)
+            for (_, fut), result in zip(batch, results):
+                fut.set_result(result)
+
+
+def _limit_threads(threads, cores):
+    """Pin this process to cores and cap the math libraries at `threads` threads."""
+    for var in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS'):
+        os.environ[var] = str(threads)
+    if cores and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cores)
+
+
+def _pool_worker(weights, backend, imgsz, threads, cores, slot_names, conn, loader=None):
+    """
+    Inference process: loads its own engine (with loader, load_engine by
+    default), warms it up, then runs frames that the parent placed in
+    shared memory slots and sends back only the detections. It talks to the
+    parent over its end of a pipe: (task_id, slot, shape) or None in,
+    tuples tagged 'ready', 'failed', 'done' or 'error' out.
+    """
+    _limit_threads(threads, cores)
+    slots = [shared_memory.SharedMemory(name=name) for name in slot_names]
+    try:
+        started = time.perf_counter()
+        from engines import load_engine
+        from postprocess import extract_detections
+        engine = (loader or load_engine)(weights, backend, imgsz)
+        if engine.backend == 'torch':
+            import torch
+            torch.set_num_threads(threads)
+        load_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        for _ in range(2):
+            engine(np.zeros((imgsz, imgsz, 3), dtype=np.uint8))
+        warm_up_ms = (time.perf_counter() - started) * 1000
+    except Exception as e:
+        conn.send(('failed', str(e)))
+        return
+    conn.send(('ready', dict(engine.names), engine.backend, os.getpid(),
+               round(load_ms, 1), round(warm_up_ms, 1)))
+
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            break  # The parent went away
+        if task is None:
+            break
+        task_id, slot, shape = task
+        # A view onto the parent's copy, nothing is unpickled
+        frame = np.ndarray(shape, dtype=np.uint8, buffer=slots[slot].buf)
+        try:
+            dets = extract_detections(engine(frame)[0])
+            conn.send(('done', task_id, dets))
+        except Exception as e:
+            conn.send(('error', task_id, str(e)))
+        finally:
+            del frame
+
+    for slot in slots:
+        slot.close()
+
+
+class ProcessInferencePool:
+    """
+    Runs the model in `workers` separate processes, each with its own copy
+    of the engine pinned to its share of the CPU cores, so concurrent
+    /detect requests and camera streams are not serialized by the GIL or
+    fighting over one torch thread pool.
+
+    Frames are copied into preallocated shared memory slots, two owned by
+    each worker, and only (task id, slot, shape) goes down that worker's
+    pipe; the workers send back DETECTION_DTYPE arrays. Frames whose
+    longest side exceeds max_side are shrunk to fit the slot first, which
+    costs nothing since the model letterboxes to imgsz anyway, and their
+    boxes are scaled back.
+
+    A worker that dies fails the frames it held and is replaced; while it
+    is down its slots are kept out of use, and a replacement that fails to
+    load is retried with exponential backoff. submit() waits at most
+    `timeout` seconds for a free slot and infer() and .names as long for
+    their result, raising TimeoutError rather than hanging if workers are
+    stuck.
+
+    It offers the interface app.py uses on both LazyEngine and
+    BatchInferenceServer: submit/infer, calling it with frames, .names,
+    .version, warm-up and status().
+    """
+
+    SLOTS_PER_WORKER = 2
+
+    # How often the collector checks that every worker is still alive, in seconds
+    LIVENESS_INTERVAL = 0.5
+
+    # Delay before retrying a replacement worker that failed to load, doubling per failure
+    RESTART_BACKOFF = 1.0
+    MAX_RESTART_BACKOFF = 60.0
+
+    def __init__(self, weights, backend='auto', imgsz=512, workers=2, threads_per_worker=None,
+                 max_side=None, pin_cores=True, timeout=60.0, loader=None):
+        self.weights = weights
+        self.requested_backend = backend
+        self.imgsz = imgsz
+        self.workers = max(1, workers)
+        self.max_side = max_side or 2 * imgsz
+        self.timeout = timeout
+        # Picklable (weights, backend, imgsz) -> engine, run in each worker
+        self.loader = loader
+
+        cores = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else []
+        cpu_count = len(cores) or os.cpu_count() or 1
+        self.threads_per_worker = threads_per_worker or max(1, cpu_count // self.workers)
+        self._cores = []
+        for i in range(self.workers):
+            share = cores[i * self.threads_per_worker:(i + 1) * self.threads_per_worker]
+            # Only pin when every worker gets cores of its own
+            enough = pin_cores and len(cores) >= self.workers * self.threads_per_worker
+            self._cores.append(share if enough else None)
+
+        self._ctx = multiprocessing.get_context('spawn')
+        self._lock = threading.Lock()
+        self._started = False
+        self._ready = threading.Event()
+        self._processes = [None] * self.workers
+        self._conns = [None] * self.workers
+        self._worker_info = [None] * self.workers
+        # A worker that was ready once is restarted when it dies instead of failing the pool
+        self._was_ready = [False] * self.workers
+        self._restart_failures = [0] * self.workers
+        self._restart_at = [0.0] * self.workers
+        self._slots = []
+        self._free_slots = queue.Queue()
+        self._collector = None
+        # task_id -> (future, slot, scale); also guards _conns, _down and respawns
+        self._pending = {}
+        # Workers being replaced, and the slots they own that were freed meanwhile
+        self._down = set()
+        self._parked = {}
+        self._pending_lock = threading.Lock()
+        self._task_ids = itertools.count()
+        self._version = None
+        self._names = None
+
+        self.error = None
+        self.batches = 0
+        self.images = 0
+        self.restarts = 0
+
+    @property
+    def backend(self):
+        from engines import resolve_backend
+        return resolve_backend(self.weights, self.requested_backend)
+
+    @property
+    def version(self):
+        if self._version is None:
+            from storage import file_hash
+            self._version = f"{file_hash(self.weights)[:16]}-{self.backend}"
+        return self._version
+
+    @property
+    def names(self):
+        if self._names is None:
+            self.warm_up(self.timeout)
+            if self._names is None:
+                raise TimeoutError(f"Inference workers not ready within {self.timeout:g}s")
+        return self._names
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            # Fail fast on a misconfigured backend instead of in every worker
+            backend = self.backend
+            slot_size = self.max_side * self.max_side * 3
+            self._free_slots = queue.Queue()
+            for i in range(self.SLOTS_PER_WORKER * self.workers):
+                self._slots.append(shared_memory.SharedMemory(create=True, size=slot_size))
+                self._free_slots.put(i)
+            for index in range(self.workers):
+                self._spawn(index, backend)
+            self._collector = threading.Thread(
+                target=self._collect, name="inference-pool-results", daemon=True)
+            self._collector.start()
+            atexit.register(self.stop)
+
+    def _spawn(self, index, backend):
+        conn, child_conn = self._ctx.Pipe()
+        process = self._ctx.Process(
+            target=_pool_worker, name=f"inference-{index}", daemon=True,
+            args=(self.weights, backend, self.imgsz, self.threads_per_worker,
+                  self._cores[index], [slot.name for slot in self._slots],
+                  child_conn, self.loader))
+        process.start()
+        # Only the worker holds the other end now, so its death reads as EOF here
+        child_conn.close()
+        self._processes[index] = process
+        self._conns[index] = conn
+
+    def stop(self, timeout=5.0):
+        with self._lock:
+            if not self._started:
+                return
+            with self._pending_lock:
+                self._started = False
+                for conn in self._conns:
+                    try:
+                        if conn is not None:
+                            conn.send(None)
+                    except OSError:
+                        pass
+                pending, self._pending = self._pending, {}
+            for future, _, _ in pending.values():
+                future.set_exception(RuntimeError("Inference pool stopped"))
+            for process in self._processes:
+                if process is None:
+                    continue
+                process.join(timeout)
+                if process.is_alive():
+                    process.terminate()
+            self._collector.join(timeout)
+            for conn in self._conns:
+                if conn is not None:
+                    conn.close()
+            for slot in self._slots:
+                slot.close()
+                slot.unlink()
+            self._slots = []
+            self._processes = [None] * self.workers
+            self._conns = [None] * self.workers
+            self._worker_info = [None] * self.workers
+            self._down, self._parked = set(), {}
+            self._ready.clear()
+
+    def start_warm_up(self):
+        self.start()
+
+    def warm_up(self, timeout=None):
+        """Start the workers and wait until they have all loaded and warmed up."""
+        self.start()
+        self._ready.wait(timeout)
+        if self.error:
+            raise RuntimeError(self.error)
+        return self._ready.is_set()
+
+    @property
+    def warm(self):
+        return self._ready.is_set()
+
+    def submit(self, image, timeout=None):
+        """
+        Queue one BGR uint8 frame; the Future resolves to its DETECTION_DTYPE
+        array. Raises TimeoutError if no slot frees up within timeout seconds
+        (the pool's timeout by default).
+        """
+        self.start()
+        if self.error:
+            raise RuntimeError(self.error)
+        timeout = self.timeout if timeout is None else timeout
+        future = Future()
+        scale = (1.0, 1.0)
+        height, width = image.shape[:2]
+        if max(height, width) > self.max_side:
+            import cv2
+            factor = self.max_side / max(height, width)
+            image = cv2.resize(image, (max(1, round(width * factor)), max(1, round(height * factor))),
+                               interpolation=cv2.INTER_AREA)
+            scale = (width / image.shape[1], height / image.shape[0])
+
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                slot = self._free_slots.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                raise TimeoutError(f"No free inference slot within {timeout:g}s; "
+                                   f"workers are stuck or overloaded ({self.status()['pending']} pending)")
+            index = slot // self.SLOTS_PER_WORKER
+            with self._pending_lock:
+                if index not in self._down:
+                    break
+                # Its worker is being replaced; the slot comes back when it is ready
+                self._parked.setdefault(index, []).append(slot)
+        view = np.ndarray(image.shape, dtype=np.uint8, buffer=self._slots[slot].buf)
+        view[...] = image
+        del view
+        with self._pending_lock:
+            if self.error or not self._started:
+                self._free_slots.put(slot)
+                raise RuntimeError(self.error or "Inference pool stopped")
+            if index in self._down:
+                self._parked.setdefault(index, []).append(slot)
+                raise RuntimeError(f"Inference worker {index} died")
+            task_id = next(self._task_ids)
+            self._pending[task_id] = (future, slot, scale)
+            try:
+                self._conns[index].send((task_id, slot, image.shape))
+            except OSError:
+                pass  # The worker just died; the collector fails this frame with its others
+        return future
+
+    def infer(self, image, timeout=None):
+        """Detections for one frame, waiting at most timeout seconds (the pool's timeout by default)."""
+        timeout = self.timeout if timeout is None else timeout
+        return self._result(self.submit(image, timeout), timeout)
+
+    def __call__(self, source, **kwargs):
+        """Run frames like an engine call; returns one DETECTION_DTYPE array per frame."""
+        images = source if isinstance(source, list) else [source]
+        futures = [self.submit(image) for image in images]
+        return [self._result(future, self.timeout) for future in futures]
+
+    @staticmethod
+    def _result(future, timeout):
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            raise TimeoutError(f"Inference did not finish within {timeout:g}s") from None
+
+    def _collect(self):
+        from imaging import scale_boxes
+        from multiprocessing.connection import wait
+        next_check = time.monotonic() + self.LIVENESS_INTERVAL
+        while self._started:
+            conns = {conn: index for index, conn in enumerate(self._conns) if conn is not None}
+            dead = set()
+            for conn in wait(list(conns), timeout=self.LIVENESS_INTERVAL):
+                index = conns[conn]
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError):
+                    dead.add(index)
+                    continue
+                kind = message[0]
+                if kind in ('done', 'error'):
+                    with self._pending_lock:
+                        entry = self._pending.pop(message[1], None)
+                    if entry is None:
+                        continue
+                    future, slot, scale = entry
+                    self._free_slot(slot)
+                    self.batches += 1
+                    self.images += 1
+                    if kind == 'done':
+                        future.set_result(scale_boxes(message[2], scale))
+                    else:
+                        future.set_exception(RuntimeError(message[2]))
+                elif kind == 'ready':
+                    _, names, backend, pid, load_ms, warm_up_ms = message
+                    self._names = names
+                    self._worker_info[index] = {"pid": pid, "backend": backend,
+                                                "loadMs": load_ms, "warmUpMs": warm_up_ms}
+                    self._was_ready[index] = True
+                    self._restart_failures[index] = 0
+                    with self._pending_lock:
+                        self._down.discard(index)
+                        for slot in self._parked.pop(index, []):
+                            self._free_slots.put(slot)
+                    if all(self._worker_info):
+                        self._ready.set()
+                elif kind == 'failed':
+                    if self._was_ready[index]:
+                        # A replacement that could not load; retried like any other death
+                        print(f"Inference worker {index} failed to restart: {message[1]}")
+                        dead.add(index)
+                    else:
+                        self._fail(f"Inference worker {index} failed to start: {message[1]}")
+
+            # On a timer rather than only when idle, so a death is noticed under load too
+            if dead or time.monotonic() >= next_check:
+                self._check_workers(dead)
+                next_check = time.monotonic() + self.LIVENESS_INTERVAL
+
+    def _fail(self, error):
+        """Put the pool in the failed state and fail every waiting frame."""
+        with self._pending_lock:
+            self.error = error
+            pending, self._pending = self._pending, {}
+        print(error)
+        for future, slot, _ in pending.values():
+            self._free_slots.put(slot)
+            future.set_exception(RuntimeError(error))
+        self._ready.set()
+
+    def _free_slot(self, slot):
+        index = slot // self.SLOTS_PER_WORKER
+        with self._pending_lock:
+            if index in self._down:
+                self._parked.setdefault(index, []).append(slot)
+                return
+        self._free_slots.put(slot)
+
+    def _check_workers(self, dead=()):
+        """
+        Fail the frames a dead worker held and start a replacement. Only a
+        worker that never got ready puts the pool in the failed state; a
+        replacement that fails to load is retried after a growing delay.
+        """
+        for index, process in enumerate(self._processes):
+            if not self._started:
+                return  # Workers exit on their own when the pool stops
+            if self.error:
+                return
+            if process is not None and (index in dead or not process.is_alive()):
+                process.join(1.0)
+                if process.is_alive():
+                    process.terminate()  # Closed its pipe but kept running
+                    process.join(1.0)
+                if not self._was_ready[index]:
+                    # Died before it was ever ready; restarting would only fail the same way
+                    self._fail(f"Inference worker {index} exited with code {process.exitcode} during startup")
+                    return
+                self._worker_down(index, process.exitcode)
+            if self._processes[index] is None and time.monotonic() >= self._restart_at[index]:
+                with self._pending_lock:
+                    if not self._started:
+                        return
+                    self._spawn(index, self.backend)
+                    self.restarts += 1
+
+    def _worker_down(self, index, exitcode):
+        if self._worker_info[index] is not None:
+            delay = 0.0
+            print(f"Inference worker {index} exited with code {exitcode}, restarting")
+        else:
+            self._restart_failures[index] += 1
+            delay = min(self.RESTART_BACKOFF * 2 ** (self._restart_failures[index] - 1),
+                        self.MAX_RESTART_BACKOFF)
+            print(f"Inference worker {index} failed to restart (exit code {exitcode}), "
+                  f"retrying in {delay:g}s")
+        with self._pending_lock:
+            lost = {task_id: entry for task_id, entry in self._pending.items()
+                    if entry[1] // self.SLOTS_PER_WORKER == index}
+            for task_id in lost:
+                del self._pending[task_id]
+            self._down.add(index)
+            self._parked.setdefault(index, []).extend(slot for _, slot, _ in lost.values())
+            self._conns[index].close()
+            self._conns[index] = None
+            self._processes[index] = None
+            self._worker_info[index] = None
+            self._restart_at[index] = time.monotonic() + delay
+        for future, _, _ in lost.values():
+            future.set_exception(RuntimeError(f"Inference worker {index} died"))
+
+    def status(self):
+        if self.error:
+            state = 'failed'
+        elif self._ready.is_set():
+            state = 'ready'
+        elif self._started:
+            state = 'warming'
+        else:
+            state = 'cold'
+        with self._pending_lock:
+            pending = len(self._pending)
+        return {
+            "state": state,
+            "weights": self.weights,
+            "backend": self.backend if self._started else None,
+            "workers": self.workers,
+            "threadsPerWorker": self.threads_per_worker,
+            "processes": [info for info in self._worker_info if info],
+            "down": sorted(self._down),
+            "pending": pending,
+            "restarts": self.restarts,
+            "error": self.error,
+        }
@@ -0,0 +1,220 @@
+# jobs.py
+import io
+import os
+import tempfile
+import threading
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from PIL import Image
+
+from extensions import db
+from persistence import save_detections
+from storage import content_hash, lock_blobs
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff', '.webp')
+
+
+def read_gps(data):
+    """Return (latitude, longitude) from a photo's EXIF GPS block, or None."""
+    try:
+        exif = Image.open(io.BytesIO(data)).getexif()
+        gps = exif.get_ifd(0x8825)  # GPSInfo
+    except Exception:
+        return None
+    if not gps or 2 not in gps or 4 not in gps:
+        return None
+
+    def to_degrees(dms, ref):
+        degrees = float(dms[0]) + float(dms[1]) / 60 + float(dms[2]) / 3600
+        return -degrees if ref in ('S', 'W') else degrees
+
+    try:
+        return (to_degrees(gps[2], gps.get(1, 'N')),
+                to_degrees(gps[4], gps.get(3, 'E')))
+    except (TypeError, ValueError, ZeroDivisionError, IndexError):
+        return None
+
+
+class DetectionJob:
+    def __init__(self, source, names, session_id, latitude, longitude):
+        self.id = uuid.uuid4().hex
+        self.source = source  # list of (name, bytes) or path to a zip file
+        self.names = names
+        self.session_id = session_id
+        self.latitude = latitude
+        self.longitude = longitude
+        self.status = 'queued'
+        self.created_at = datetime.utcnow()
+        self.finished_at = None
+        self.processed = 0
+        self.failed = 0
+        self.num_detections = 0
+        self.results = []
+        self.pending_chunks = 0
+        self.lock = threading.Lock()
+
+    @property
+    def total(self):
+        return len(self.names)
+
+    def to_dict(self, include_results=True):
+        with self.lock:
+            data = {
+                "jobId": self.id,
+                "status": self.status,
+                "total": self.total,
+                "processed": self.processed,
+                "failed": self.failed,
+                "numDetections": self.num_detections,
+                "createdAt": self.created_at.isoformat(),
+                "finishedAt": self.finished_at.isoformat() if self.finished_at else None,
+            }
+            if include_results:
+                data["results"] = list(self.results)
+            return data
+
+
+class DetectionJobManager:
+    """
+    Runs bulk /detect jobs on a thread pool. Each job is split into chunks of
+    images; a chunk is decoded, inferred and committed in one transaction.
+
+    process_image(name, data, latitude, longitude, session_id) must return
+    (detection_rows, detections_data) like detect() builds them.
+    Job state is kept in memory, so it is lost when the process restarts.
+    """
+
+    def __init__(self, app, process_image, max_workers=4, chunk_size=16,
+                 max_jobs=100):
+        self.app = app
+        self.process_image = process_image
+        self.chunk_size = chunk_size
+        self.max_jobs = max_jobs
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix="detect-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, uploads, session_id='default', latitude=None, longitude=None):
+        """Create a job from werkzeug FileStorage objects (images and/or zips)."""
+        files = []
+        zip_path = None
+        for upload in uploads:
+            data = upload.read()
+            if zipfile.is_zipfile(io.BytesIO(data)):
+                if zip_path is not None or len(uploads) > 1:
+                    raise ValueError("Upload a single zip archive or a set of images")
+                zip_path = self._spool(data)
+            elif upload.filename:
+                files.append((upload.filename, data))
+
+        if zip_path is not None:
+            with zipfile.ZipFile(zip_path) as archive:
+                names = [n for n in archive.namelist()
+                         if n.lower().endswith(IMAGE_EXTENSIONS) and not n.endswith('/')]
+            source = zip_path
+        else:
+            names = [name for name, _ in files]
+            source = files
+
+        if not names:
+            if zip_path is not None:
+                os.remove(zip_path)
+            raise ValueError("No images found in upload")
+
+        job = DetectionJob(source, names, session_id, latitude, longitude)
+        indexes = list(range(len(names)))
+        chunks = [indexes[i:i + self.chunk_size]
+                  for i in range(0, len(indexes), self.chunk_size)]
+        job.pending_chunks = len(chunks)
+
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        for chunk in chunks:
+            self._executor.submit(self._run_chunk, job, chunk)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _spool(self, data):
+        fd, path = tempfile.mkstemp(suffix='.zip', prefix='detect-job-')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        return path
+
+    def _prune(self):
+        # Forget the oldest finished jobs once we hold more than max_jobs
+        finished = [j for j in self._jobs.values() if j.status in ('done', 'failed')]
+        finished.sort(key=lambda j: j.created_at)
+        while len(self._jobs) > self.max_jobs and finished:
+            del self._jobs[finished.pop(0).id]
+
+    def _iter_images(self, job, chunk):
+        if isinstance(job.source, str):
+            with zipfile.ZipFile(job.source) as archive:
+                for i in chunk:
+                    name = job.names[i]
+                    yield os.path.basename(name), archive.read(name)
+        else:
+            for i in chunk:
+                yield job.source[i]
+
+    def _run_chunk(self, job, chunk):
+        with job.lock:
+            job.status = 'running'
+
+        results = []
+        rows = []
+        failed = 0
+        with self.app.app_context():
+            try:
+                images = list(self._iter_images(job, chunk))
+                # Take the chunk's blob locks up front in a fixed order, so
+                # chunks of concurrent jobs sharing images can't deadlock
+                lock_blobs(content_hash(data) for _, data in images)
+                for name, data in images:
+                    latitude, longitude = job.latitude, job.longitude
+                    if latitude is None or longitude is None:
+                        latitude, longitude = read_gps(data) or (latitude, longitude)
+                    try:
+                        detection_rows, detections_data = self.process_image(
+                            name, data, latitude, longitude, job.session_id)
+                    except Exception as e:
+                        failed += 1
+                        results.append({"file": name, "error": str(e)})
+                        continue
+                    rows.extend(detection_rows)
+                    results.append({
+                        "file": name,
+                        "numDetections": len(detections_data),
+                        "detections": detections_data,
+                    })
+
+                # One bulk insert and commit per chunk instead of one per image
+                save_detections(rows)
+            except Exception as e:
+                db.session.rollback()
+                print(f"Detection job {job.id} chunk failed: {e}")
+                failed = len(chunk)
+                results = [{"file": os.path.basename(job.names[i]), "error": "Failed to save detections"}
+                           for i in chunk]
+            finally:
+                db.session.remove()
+
+        with job.lock:
+            job.results.extend(results)
+            job.processed += len(chunk)
+            job.failed += failed
+            job.num_detections += sum(r.get("numDetections", 0) for r in results)
+            job.pending_chunks -= 1
+            if job.pending_chunks == 0:
+                job.status = 'failed' if job.failed == job.total else 'done'
+                job.finished_at = datetime.utcnow()
+                if isinstance(job.source, str) and os.path.exists(job.source):
+                    os.remove(job.source)
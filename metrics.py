@@ -0,0 +1,46 @@
+# metrics.py
+import threading
+from collections import deque
+
+
+class Timings:
+    """
+    Rolling per-stage timings in milliseconds. Keeps the last `window`
+    samples of each stage for percentiles plus all-time counts and totals.
+    """
+
+    def __init__(self, window=1000):
+        self.window = window
+        self._samples = {}
+        self._totals = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, ms):
+        with self._lock:
+            samples = self._samples.get(stage)
+            if samples is None:
+                samples = self._samples[stage] = deque(maxlen=self.window)
+                self._totals[stage] = [0, 0.0]
+            samples.append(ms)
+            self._totals[stage][0] += 1
+            self._totals[stage][1] += ms
+
+    def summary(self):
+        with self._lock:
+            stages = {stage: (sorted(samples), self._totals[stage])
+                      for stage, samples in self._samples.items()}
+        result = {}
+        for stage, (samples, (count, total)) in stages.items():
+            result[stage] = {
+                "count": count,
+                "meanMs": round(total / count, 3),
+                "p50Ms": round(samples[len(samples) // 2], 3),
+                "p95Ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+                "maxMs": round(samples[-1], 3),
+            }
+        return result
+
+
+def server_timing(stages):
+    """Server-Timing header value for {stage: ms}, readable in browser dev tools."""
+    return ', '.join(f"{stage};dur={ms:.1f}" for stage, ms in stages.items())
@@ -0,0 +1,32 @@
+"""Add mission_id to detection
+
+Revision ID: 0c6e4b9f2a13
+Revises: f5a2d8c1e4b7
+Create Date: 2026-10-18 15:04:39.227816
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0c6e4b9f2a13'
+down_revision = 'f5a2d8c1e4b7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('detection', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('mission_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_detection_mission_id', 'mission', ['mission_id'], ['id'])
+        batch_op.create_index('idx_mission_time', ['mission_id', 'timestamp'], unique=False)
+
+    # Historical detections are attached with `flask rebuild-mission-rollups`
+
+
+def downgrade():
+    with op.batch_alter_table('detection', schema=None) as batch_op:
+        batch_op.drop_index('idx_mission_time')
+        batch_op.drop_constraint('fk_detection_mission_id', type_='foreignkey')
+        batch_op.drop_column('mission_id')
@@ -0,0 +1,30 @@
+"""Add image_blob table for content-addressed uploads
+
+Revision ID: 3b7d1f6a9e52
+Revises: 0c6e4b9f2a13
+Create Date: 2026-10-18 15:48:12.904133
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b7d1f6a9e52'
+down_revision = '0c6e4b9f2a13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('image_blob',
+    sa.Column('hash', sa.String(length=64), nullable=False),
+    sa.Column('path', sa.String(length=255), nullable=False),
+    sa.Column('refcount', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('hash')
+    )
+
+
+def downgrade():
+    op.drop_table('image_blob')
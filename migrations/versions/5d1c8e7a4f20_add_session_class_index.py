@@ -0,0 +1,25 @@
+"""Add (session_id, class_name) index to detection
+
+Revision ID: 5d1c8e7a4f20
+Revises: b2e6149455bc
+Create Date: 2026-10-18 09:12:40.118203
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '5d1c8e7a4f20'
+down_revision = 'b2e6149455bc'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('detection', schema=None) as batch_op:
+        batch_op.create_index('idx_session_class', ['session_id', 'class_name'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('detection', schema=None) as batch_op:
+        batch_op.drop_index('idx_session_class')
@@ -0,0 +1,60 @@
+"""Track which uav_status samples have been rolled up
+
+Revision ID: 7e4c2a9b5d18
+Revises: 3b7d1f6a9e52
+Create Date: 2026-10-18 17:21:40.518206
+
+"""
+from datetime import timedelta
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7e4c2a9b5d18'
+down_revision = '3b7d1f6a9e52'
+branch_labels = None
+depends_on = None
+
+RESOLUTIONS = (1, 10, 60)
+
+uav_status = sa.table('uav_status',
+    sa.column('timestamp', sa.DateTime),
+    sa.column('rolled_up', sa.Boolean),
+)
+uav_status_rollup = sa.table('uav_status_rollup',
+    sa.column('resolution', sa.Integer),
+    sa.column('bucket_start', sa.DateTime),
+)
+
+
+def upgrade():
+    with op.batch_alter_table('uav_status', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('rolled_up', sa.Boolean(), nullable=False, server_default=sa.false()))
+        batch_op.create_index('idx_uav_status_pending', ['rolled_up', 'id'], unique=False)
+
+    # Rollups used to be built up to a per-resolution watermark. Keep everything
+    # below the lowest one, mark the raw samples there as rolled up and let the
+    # next downsample run rebuild the rest from raw samples.
+    bind = op.get_bind()
+    ends = []
+    for resolution in RESOLUTIONS:
+        last = bind.execute(sa.select(sa.func.max(uav_status_rollup.c.bucket_start))
+                            .where(uav_status_rollup.c.resolution == resolution)).scalar()
+        ends.append(last + timedelta(seconds=resolution) if last else None)
+    rolled_until = None if None in ends else min(ends)
+
+    delete = uav_status_rollup.delete()
+    if rolled_until is not None:
+        delete = delete.where(uav_status_rollup.c.bucket_start >= rolled_until)
+        bind.execute(uav_status.update()
+                     .where(uav_status.c.timestamp < rolled_until)
+                     .values(rolled_up=True))
+    bind.execute(delete)
+
+
+def downgrade():
+    with op.batch_alter_table('uav_status', schema=None) as batch_op:
+        batch_op.drop_index('idx_uav_status_pending')
+        batch_op.drop_column('rolled_up')
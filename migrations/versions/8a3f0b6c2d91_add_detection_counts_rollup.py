@@ -0,0 +1,38 @@
+"""Add detection_counts rollup table
+
+Revision ID: 8a3f0b6c2d91
+Revises: 5d1c8e7a4f20
+Create Date: 2026-10-18 10:05:12.904417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8a3f0b6c2d91'
+down_revision = '5d1c8e7a4f20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('detection_counts',
+    sa.Column('session_id', sa.String(length=50), nullable=False),
+    sa.Column('class_name', sa.String(length=50), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('session_id', 'class_name', 'day')
+    )
+
+    # Backfill from existing detections (same query as `flask rebuild-detection-counts`)
+    op.execute(
+        "INSERT INTO detection_counts (session_id, class_name, day, count) "
+        "SELECT COALESCE(session_id, ''), class_name, DATE(timestamp), COUNT(id) "
+        "FROM detection WHERE timestamp IS NOT NULL "
+        "GROUP BY COALESCE(session_id, ''), class_name, DATE(timestamp)"
+    )
+
+
+def downgrade():
+    op.drop_table('detection_counts')
@@ -0,0 +1,28 @@
+"""Add drone_id to uav_status
+
+Revision ID: c47e2a9d1b35
+Revises: 8a3f0b6c2d91
+Create Date: 2026-10-18 11:40:27.551902
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c47e2a9d1b35'
+down_revision = '8a3f0b6c2d91'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('uav_status', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('drone_id', sa.Integer(), nullable=True))
+        batch_op.create_index('idx_uav_status_drone_time', ['drone_id', 'timestamp'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('uav_status', schema=None) as batch_op:
+        batch_op.drop_index('idx_uav_status_drone_time')
+        batch_op.drop_column('drone_id')
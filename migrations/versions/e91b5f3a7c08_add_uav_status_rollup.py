@@ -0,0 +1,45 @@
+"""Add uav_status time index and uav_status_rollup table
+
+Revision ID: e91b5f3a7c08
+Revises: c47e2a9d1b35
+Create Date: 2026-10-18 13:02:51.337690
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e91b5f3a7c08'
+down_revision = 'c47e2a9d1b35'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('uav_status', schema=None) as batch_op:
+        batch_op.create_index('idx_uav_status_timestamp', ['timestamp'], unique=False)
+
+    op.create_table('uav_status_rollup',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('resolution', sa.Integer(), nullable=False),
+    sa.Column('drone_id', sa.Integer(), nullable=True),
+    sa.Column('bucket_start', sa.DateTime(), nullable=False),
+    sa.Column('sample_count', sa.Integer(), nullable=False),
+    sa.Column('avg_speed', sa.Float(), nullable=True),
+    sa.Column('avg_altitude', sa.Float(), nullable=True),
+    sa.Column('min_battery', sa.Float(), nullable=True),
+    sa.Column('last_latitude', sa.Float(), nullable=True),
+    sa.Column('last_longitude', sa.Float(), nullable=True),
+    sa.Column('last_timestamp', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('uav_status_rollup', schema=None) as batch_op:
+        batch_op.create_index('idx_uav_rollup_lookup', ['resolution', 'drone_id', 'bucket_start'], unique=False)
+        batch_op.create_index('idx_uav_rollup_bucket', ['resolution', 'bucket_start'], unique=False)
+
+
+def downgrade():
+    op.drop_table('uav_status_rollup')
+    with op.batch_alter_table('uav_status', schema=None) as batch_op:
+        batch_op.drop_index('idx_uav_status_timestamp')
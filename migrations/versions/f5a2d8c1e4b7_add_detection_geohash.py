@@ -0,0 +1,30 @@
+"""Add geohash column and index to detection
+
+Revision ID: f5a2d8c1e4b7
+Revises: e91b5f3a7c08
+Create Date: 2026-10-18 14:21:07.518204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f5a2d8c1e4b7'
+down_revision = 'e91b5f3a7c08'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('detection', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('geohash', sa.String(length=12), nullable=True))
+        batch_op.create_index('idx_geohash', ['geohash'], unique=False)
+
+    # Existing rows are filled in with `flask backfill-geohash`
+
+
+def downgrade():
+    with op.batch_alter_table('detection', schema=None) as batch_op:
+        batch_op.drop_index('idx_geohash')
+        batch_op.drop_column('geohash')
@@ -0,0 +1,127 @@
+# missions.py
+import math
+from datetime import datetime, timedelta
+
+from caching import ResponseCache
+from extensions import db
+from models import Detection, Drone, Mission
+
+# Detections can still trickle in for a short while after a mission ends
+SETTLE_TIME = timedelta(minutes=5)
+
+# Details of finished missions, keyed by (mission_id, tolerance)
+completed_details = ResponseCache(max_entries=512, ttl=24 * 3600)
+
+
+def forget_missions(mission_ids):
+    """Drop the cached details of missions that just got new detections."""
+    mission_ids = set(mission_ids)
+    completed_details.discard(lambda key: key[0] in mission_ids)
+
+
+def drone_summaries():
+    """Every drone with its last mission's start time, in one LEFT JOIN."""
+    rows = (db.session.query(Drone.id, Drone.name, Drone.status, Mission.start_time)
+            .outerjoin(Mission, Mission.id == Drone.last_mission_id)
+            .order_by(Drone.id))
+    return [{
+        'id': drone_id,
+        'name': name,
+        'status': status,
+        'lastMission': start_time.isoformat() if start_time else None
+    } for drone_id, name, status, start_time in rows]
+
+
+def simplify_route(points, tolerance_m):
+    """
+    Douglas-Peucker simplification of [(lat, lon), ...], dropping points
+    that lie within tolerance_m metres of the simplified line. Distances
+    use a local equirectangular projection, which is plenty for the few
+    kilometres a mission covers.
+    """
+    if tolerance_m <= 0 or len(points) < 3:
+        return list(points)
+
+    lat0 = math.radians(sum(p[0] for p in points) / len(points))
+    scale_y = 111320.0
+    scale_x = 111320.0 * math.cos(lat0)
+    xy = [(p[1] * scale_x, p[0] * scale_y) for p in points]
+
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        (x1, y1), (x2, y2) = xy[first], xy[last]
+        dx, dy = x2 - x1, y2 - y1
+        length = math.hypot(dx, dy)
+        worst, worst_dist = None, tolerance_m
+        for i in range(first + 1, last):
+            x, y = xy[i]
+            if length:
+                dist = abs(dy * x - dx * y + x2 * y1 - y2 * x1) / length
+            else:
+                dist = math.hypot(x - x1, y - y1)
+            if dist > worst_dist:
+                worst, worst_dist = i, dist
+        if worst is not None:
+            keep[worst] = True
+            stack.append((first, worst))
+            stack.append((worst, last))
+
+    return [p for p, k in zip(points, keep) if k]
+
+
+def active_mission_id(timestamp):
+    """
+    The mission whose time window contains timestamp (the latest started
+    one if windows overlap), or None. Missions without an end_time are
+    still running.
+    """
+    return (db.session.query(Mission.id)
+            .filter(Mission.start_time <= timestamp,
+                    db.or_(Mission.end_time.is_(None), Mission.end_time >= timestamp))
+            .order_by(Mission.start_time.desc(), Mission.id.desc())
+            .limit(1)
+            .scalar())
+
+
+def _route_points(mission_id):
+    # Served by idx_mission_time
+    query = (db.session.query(Detection.latitude, Detection.longitude)
+             .filter(Detection.mission_id == mission_id,
+                     Detection.latitude.isnot(None), Detection.longitude.isnot(None))
+             .order_by(Detection.timestamp, Detection.id))
+    return [(lat, lon) for lat, lon in query.yield_per(5000)]
+
+
+def mission_details(mission_id, tolerance_m=5.0):
+    """
+    Start/end location, object types and the (simplified) route flown for a
+    mission, or None if it does not exist. Only coordinates are read from
+    the detection table. Finished missions never change, so their details
+    are cached once they have settled.
+    """
+    key = (mission_id, tolerance_m)
+    details = completed_details.get(key)
+    if details is not None:
+        return details
+
+    mission = (db.session.query(Mission.start_time, Mission.end_time, Mission.detected_objects)
+               .filter(Mission.id == mission_id)
+               .first())
+    if mission is None:
+        return None
+
+    points = _route_points(mission_id)
+    details = {
+        'startLocation': f"{points[0][0]}, {points[0][1]}" if points else None,
+        'endLocation': f"{points[-1][0]}, {points[-1][1]}" if points else None,
+        'objectTypes': mission.detected_objects,
+        'route': [f"{lat}, {lon}" for lat, lon in simplify_route(points, tolerance_m)],
+        'routePoints': len(points),
+    }
+
+    if mission.end_time is not None and mission.end_time + SETTLE_TIME < datetime.utcnow():
+        completed_details.set(key, details)
+    return details
@@ -6,6 +6,9 @@ class Detection(db.Model):
         db.Index('idx_image_path', 'image_path'),
         db.Index('idx_timestamp', 'timestamp'),
         db.Index('idx_session', 'session_id'),
+        db.Index('idx_session_class', 'session_id', 'class_name'),
+        db.Index('idx_geohash', 'geohash'),
+        db.Index('idx_mission_time', 'mission_id', 'timestamp'),
     )
     id = db.Column(db.Integer, primary_key=True)
     class_name = db.Column(db.String(50), nullable=False)
@@ -20,16 +23,54 @@ class Detection(db.Model):
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     latitude = db.Column(db.Float)
     longitude = db.Column(db.Float)
+    geohash = db.Column(db.String(12), nullable=True)  # Spatial index key, see geo.py
+    mission_id = db.Column(db.Integer, db.ForeignKey('mission.id'), nullable=True)  # Mission active at ingest
+
+
+class ImageBlob(db.Model):
+    """One stored upload per distinct content, with how many detections reference it."""
+    __tablename__ = 'image_blob'
+    hash = db.Column(db.String(64), primary_key=True)  # sha256 of the file
+    path = db.Column(db.String(255), nullable=False)  # Relative to UPLOAD_FOLDER
+    refcount = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 
 class UAVStatus(db.Model):
+    __table_args__ = (
+        db.Index('idx_uav_status_drone_time', 'drone_id', 'timestamp'),
+        db.Index('idx_uav_status_timestamp', 'timestamp'),
+        db.Index('idx_uav_status_pending', 'rolled_up', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
+    drone_id = db.Column(db.Integer, nullable=True)  # Reporting drone, if known
     battery = db.Column(db.Float, nullable=False)
     latitude = db.Column(db.Float, nullable=True)
     longitude = db.Column(db.Float, nullable=True)
     speed = db.Column(db.Float, nullable=True)
     altitude = db.Column(db.Float, nullable=True)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    # Set once the sample has been merged into the rollups; only then may retention delete it
+    rolled_up = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+
+class UAVStatusRollup(db.Model):
+    """Downsampled telemetry: one row per drone per bucket of `resolution` seconds."""
+    __tablename__ = 'uav_status_rollup'
+    __table_args__ = (
+        db.Index('idx_uav_rollup_lookup', 'resolution', 'drone_id', 'bucket_start'),
+        db.Index('idx_uav_rollup_bucket', 'resolution', 'bucket_start'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    resolution = db.Column(db.Integer, nullable=False)  # Bucket size in seconds
+    drone_id = db.Column(db.Integer, nullable=True)
+    bucket_start = db.Column(db.DateTime, nullable=False)
+    sample_count = db.Column(db.Integer, nullable=False)
+    avg_speed = db.Column(db.Float)
+    avg_altitude = db.Column(db.Float)
+    min_battery = db.Column(db.Float)
+    last_latitude = db.Column(db.Float)
+    last_longitude = db.Column(db.Float)
+    last_timestamp = db.Column(db.DateTime)
 
 class Notification(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -69,7 +110,15 @@ class Drone(db.Model):
 class Mission(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     drone_id = db.Column(db.Integer, db.ForeignKey('drone.id'), nullable=False)
-    id = db.Column(db.Integer, primary_key=True)
     start_time = db.Column(db.DateTime)
     end_time = db.Column(db.DateTime)
     status = db.Column(db.String(20))
+    detected_objects = db.Column(db.JSON)  # Added by migration b2e6149455bc
+
+class DetectionCount(db.Model):
+    """Per session/class/day detection counts, kept in step with the detection table."""
+    __tablename__ = 'detection_counts'
+    session_id = db.Column(db.String(50), primary_key=True)  # '' for detections without a session
+    class_name = db.Column(db.String(50), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
@@ -0,0 +1,42 @@
+# pagination.py
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+
+def encode_cursor(timestamp, row_id):
+    raw = f"{timestamp.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor. Raises ValueError on a malformed cursor."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        timestamp, row_id = base64.urlsafe_b64decode(padded).decode().split('|')
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except (TypeError, UnicodeDecodeError, binascii.Error) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def before_cursor(timestamp_col, id_col, cursor):
+    """Rows strictly after cursor in (timestamp DESC, id DESC) order."""
+    timestamp, row_id = cursor
+    return or_(timestamp_col < timestamp,
+               and_(timestamp_col == timestamp, id_col < row_id))
+
+
+def stream_json_array(rows, serialize):
+    """Yield a JSON array one element at a time so large results never sit in memory."""
+    yield '['
+    first = True
+    for row in rows:
+        if first:
+            first = False
+        else:
+            yield ','
+        yield json.dumps(serialize(row))
+    yield ']'
@@ -0,0 +1,113 @@
+# persistence.py
+from datetime import datetime
+
+import rollups
+import storage
+from events import event_bus
+from extensions import db
+from geo import geohash_encode
+from missions import active_mission_id, forget_missions
+from models import Detection, Notification
+
+
+def notification_rows(detection_rows):
+    """One "Object detected" notification per stored detection, as detect() always did."""
+    return [{
+        "message": f"Object detected: {row['class_name']}",
+        "severity": "info",
+    } for row in detection_rows]
+
+
+def _insert_many(table, rows):
+    """executemany INSERT; fills in each row's id where the database can return them in order."""
+    dialect = db.session.get_bind().dialect
+    if dialect.insert_executemany_returning_sort_by_parameter_order:
+        stmt = table.insert().returning(table.c.id, sort_by_parameter_order=True)
+        ids = db.session.execute(stmt, rows).scalars().all()
+        for row, row_id in zip(rows, ids):
+            row["id"] = row_id
+    else:
+        db.session.execute(table.insert(), rows)
+
+
+def detection_event(row):
+    """A stored detection row in the same shape GET /detections returns."""
+    return {
+        "id": row.get("id"),
+        "class_name": row["class_name"],
+        "confidence": row["confidence"],
+        "x_min": row["x_min"],
+        "y_min": row["y_min"],
+        "x_max": row["x_max"],
+        "y_max": row["y_max"],
+        "image_path": row.get("image_path"),
+        "detection_type": row.get("detection_type", "uploaded"),
+        "session_id": row.get("session_id"),
+        "timestamp": row["timestamp"].isoformat(),
+        "latitude": row.get("latitude"),
+        "longitude": row.get("longitude"),
+    }
+
+
+def notification_event(row):
+    return {
+        "id": row.get("id"),
+        "message": row["message"],
+        "severity": row["severity"],
+        "timestamp": row["timestamp"].isoformat(),
+        "seen": row.get("seen", False),
+    }
+
+
+def publish_saved(detection_rows, notes):
+    if detection_rows:
+        event_bus.publish('detections', [detection_event(r) for r in detection_rows])
+    for note in notes:
+        event_bus.publish('notification', notification_event(note))
+
+
+def save_detections(detection_rows, notify=True, commit=True):
+    """
+    Insert Detection rows (plain dicts keyed by column name) and their
+    notifications with one executemany statement per table instead of one
+    ORM object and INSERT per box. Rows are attached to the mission running
+    at their timestamp unless they name one. The detection_counts and
+    mission rollups and the image reference counts are updated in the same
+    transaction, and once committed the new rows are pushed to /events
+    subscribers.
+
+    Rows share a single timestamp unless they carry their own. Returns the
+    number of detections written.
+    """
+    if not detection_rows:
+        if commit:
+            db.session.commit()
+        return 0
+
+    now = datetime.utcnow()
+    missions = {}
+    for row in detection_rows:
+        row.setdefault("timestamp", now)
+        row.setdefault("geohash", geohash_encode(row.get("latitude"), row.get("longitude")))
+        if row.get("mission_id") is None:
+            # Rows from one save share a timestamp, so this is usually one lookup
+            if row["timestamp"] not in missions:
+                missions[row["timestamp"]] = active_mission_id(row["timestamp"])
+            row["mission_id"] = missions[row["timestamp"]]
+    _insert_many(Detection.__table__, detection_rows)
+    rollups.add_detections(detection_rows)
+    storage.add_references(detection_rows)
+
+    notes = []
+    if notify:
+        notes = notification_rows(detection_rows)
+        for note in notes:
+            note["timestamp"] = now
+        _insert_many(Notification.__table__, notes)
+
+    if commit:
+        db.session.commit()
+        publish_saved(detection_rows, notes)
+    # Late detections change a finished mission's route and object types
+    forget_missions({row["mission_id"] for row in detection_rows} - {None})
+    return len(detection_rows)
@@ -0,0 +1,140 @@
+# postprocess.py
+import numpy as np
+
+# Compact per-box record shared by the DB writer, the JSON serializer and the
+# frame annotator. Boxes stay float32 here and are rounded when serialized.
+DETECTION_DTYPE = np.dtype([
+    ('cls', np.int32),
+    ('conf', np.float32),
+    ('box', np.float32, (4,)),  # xmin, ymin, xmax, ymax
+])
+
+# Colors used to draw each waste class on the live feed (BGR)
+CLASS_COLORS = {
+    "glass": (0, 255, 255),
+    "metal": (255, 0, 0),
+    "trash": (0, 128, 128),
+    "bottle": (0, 0, 255),
+    "float": (180, 105, 255),
+    "plastic": (255, 255, 0),
+    "rope": (192, 192, 192),
+    "container": (0, 255, 0),
+    "foam": (255, 0, 255)
+}
+DEFAULT_COLOR = (0, 255, 0)
+
+
+def get_class_name(model, cls_id):
+    try:
+        return model.names[cls_id]
+    except (IndexError, KeyError):
+        return f"class_{cls_id}"
+
+
+def extract_detections(result, conf_threshold=0.0):
+    """
+    Copy a YOLO result's boxes to the host once and return the boxes with
+    confidence >= conf_threshold as a DETECTION_DTYPE structured array.
+    Arrays already in that form (from ProcessInferencePool) are only filtered.
+    """
+    if isinstance(result, np.ndarray) and result.dtype == DETECTION_DTYPE:
+        return result[result['conf'] >= conf_threshold]
+
+    boxes = getattr(result, 'boxes', None)
+    if boxes is None or len(boxes) == 0:
+        return np.empty(0, dtype=DETECTION_DTYPE)
+
+    # boxes.data is (N, 6): xmin, ymin, xmax, ymax, conf, cls -- a single
+    # device-to-host copy instead of one per scalar per box
+    data = boxes.data
+    if hasattr(data, 'cpu'):
+        data = data.cpu().numpy()
+    data = np.asarray(data, dtype=np.float32)
+    data = data[data[:, 4] >= conf_threshold]
+
+    dets = np.empty(len(data), dtype=DETECTION_DTYPE)
+    dets['box'] = data[:, :4]
+    dets['conf'] = data[:, 4]
+    dets['cls'] = data[:, 5].astype(np.int32)
+    return dets
+
+
+def class_names(dets, model):
+    """Map the cls column to class names, resolving each distinct id once."""
+    if len(dets) == 0:
+        return np.empty(0, dtype=object)
+    ids, inverse = np.unique(dets['cls'], return_inverse=True)
+    table = np.array([get_class_name(model, int(i)) for i in ids], dtype=object)
+    return table[inverse]
+
+
+def rounded(dets, decimals=2):
+    """Rounded (confidences, boxes) as Python lists, ready for JSON or the DB."""
+    conf = np.round(dets['conf'].astype(np.float64), decimals).tolist()
+    boxes = np.round(dets['box'].astype(np.float64), decimals).tolist()
+    return conf, boxes
+
+
+def to_rows(dets, model, **columns):
+    """Detection row dicts for persistence.save_detections; columns are shared by every row."""
+    names = class_names(dets, model)
+    conf, boxes = rounded(dets)
+    return [dict(columns,
+                 class_name=name,
+                 confidence=c,
+                 x_min=box[0],
+                 y_min=box[1],
+                 x_max=box[2],
+                 y_max=box[3])
+            for name, c, box in zip(names.tolist(), conf, boxes)]
+
+
+def to_json(dets, model, image_path=None):
+    """The per-detection payload returned by /detect."""
+    names = class_names(dets, model)
+    conf, boxes = rounded(dets)
+    return [{
+        "className": name,
+        "confidence": c,
+        "boundingBox": {
+            "xmin": box[0],
+            "ymin": box[1],
+            "xmax": box[2],
+            "ymax": box[3]
+        },
+        "image_path": image_path
+    } for name, c, box in zip(names.tolist(), conf, boxes)]
+
+
+def annotate(frame, dets, model):
+    """Draw boxes with class/confidence labels onto frame in place."""
+    if len(dets) == 0:
+        return frame
+    import cv2  # imported on first use to keep app startup fast
+    names = class_names(dets, model).tolist()
+    corners = dets['box'].astype(np.int32).tolist()
+    confs = dets['conf'].tolist()
+
+    for name, (xmin, ymin, xmax, ymax), conf in zip(names, corners, confs):
+        color = CLASS_COLORS.get(name.lower(), DEFAULT_COLOR)
+
+        # Draw detection box
+        cv2.rectangle(frame, (xmin, ymin), (xmax, ymax), color, 2)
+
+        # Draw label with confidence
+        label = f"{name}: {conf:.2f}"
+        (label_width, label_height), _ = cv2.getTextSize(
+            label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 2)
+
+        # Draw label background
+        cv2.rectangle(frame,
+                      (xmin, ymin - label_height - 5),
+                      (xmin + label_width, ymin),
+                      color, -1)
+
+        # Draw label text
+        cv2.putText(frame, label,
+                    (xmin, ymin - 5),
+                    cv2.FONT_HERSHEY_SIMPLEX,
+                    0.5, (255, 255, 255), 2)
+    return frame
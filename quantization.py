@@ -0,0 +1,132 @@
+# quantization.py
+import os
+import random
+import time
+from itertools import islice
+
+import cv2
+import numpy as np
+import yaml
+from ultralytics.data.utils import check_det_dataset
+
+import storage
+from engines import BACKENDS, backend_available, export, export_path
+
+
+def list_images(source):
+    """Image paths from a dataset split: a directory, a .txt list of paths, or a list of either."""
+    if isinstance(source, (list, tuple)):
+        return [p for s in source for p in list_images(s)]
+    if os.path.isfile(source) and source.endswith('.txt'):
+        base = os.path.dirname(source)
+        with open(source) as f:
+            lines = [line.strip() for line in f if line.strip()]
+        return [line if os.path.isabs(line) else os.path.normpath(os.path.join(base, line))
+                for line in lines]
+    paths = []
+    for directory, _, files in os.walk(source):
+        paths.extend(os.path.join(directory, name) for name in files
+                     if os.path.splitext(name)[1].lower() in storage.IMAGE_EXTENSIONS)
+    return sorted(paths)
+
+
+def calibration_dataset(data, output_dir, size=300, seed=0):
+    """
+    Write a dataset yaml whose splits are `size` images sampled from the
+    training split of data. Calibrating on training images keeps the
+    validation split unseen, so the mAP in the report is not flattered.
+    Returns (yaml path, number of images).
+    """
+    dataset = check_det_dataset(data)
+    images = list_images(dataset['train'])
+    random.Random(seed).shuffle(images)
+    images = sorted(images[:size])
+
+    os.makedirs(output_dir, exist_ok=True)
+    list_path = os.path.abspath(os.path.join(output_dir, 'calibration.txt'))
+    with open(list_path, 'w') as f:
+        f.write('\n'.join(images) + '\n')
+    yaml_path = os.path.join(output_dir, 'calibration.yaml')
+    with open(yaml_path, 'w') as f:
+        yaml.safe_dump({'train': list_path, 'val': list_path, 'nc': dataset['nc'],
+                        'names': dataset['names']}, f, sort_keys=False)
+    return yaml_path, len(images)
+
+
+def quantize(weights, data, output_dir, imgsz=512, calibration_size=300):
+    """Export an OpenVINO INT8 model for weights calibrated on a subset of data."""
+    calibration, count = calibration_dataset(data, output_dir, calibration_size)
+    path = export(weights, 'openvino-int8', imgsz=imgsz, data=calibration)
+    return path, count
+
+
+def evaluate(engine, data, split='val', batch=8):
+    """mAP / precision / recall of engine on a dataset split, as in `yolo val`."""
+    metrics = engine.model.val(data=data, split=split, imgsz=engine.imgsz, batch=batch,
+                               plots=False, verbose=False)
+    return {
+        "map50": round(float(metrics.box.map50), 5),
+        "map50_95": round(float(metrics.box.map), 5),
+        "precision": round(float(metrics.box.mp), 5),
+        "recall": round(float(metrics.box.mr), 5),
+    }
+
+
+def latency(engine, frames, warmup=10, runs=200):
+    """Single-frame CPU latency percentiles in ms, cycling through frames."""
+    for i in range(warmup):
+        engine(frames[i % len(frames)])
+    samples = []
+    for i in range(runs):
+        started = time.perf_counter()
+        engine(frames[i % len(frames)])
+        samples.append((time.perf_counter() - started) * 1000)
+    samples = np.array(samples)
+    return {
+        "runs": runs,
+        "meanMs": round(float(samples.mean()), 3),
+        "p50Ms": round(float(np.percentile(samples, 50)), 3),
+        "p99Ms": round(float(np.percentile(samples, 99)), 3),
+    }
+
+
+def model_size_mb(path):
+    if os.path.isdir(path):
+        size = sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(path) for f in files)
+    else:
+        size = os.path.getsize(path)
+    return round(size / 1e6, 2)
+
+
+def variant_report(engines, data, frames, baseline='torch', runs=200):
+    """
+    Accuracy on the validation split and latency for each engine, with the
+    change against the baseline engine (the FP32 .pt weights, i.e. what
+    `yolo val` reported in Rubbish/runs/detect/val3).
+    """
+    variants = {}
+    for name, engine in engines.items():
+        print(f"Evaluating {name} ({engine.path})")
+        variants[name] = {"path": engine.path, "sizeMb": model_size_mb(engine.path),
+                          **evaluate(engine, data), **latency(engine, frames, runs=runs)}
+    reference = variants.get(baseline)
+    if reference:
+        for name, result in variants.items():
+            result["map50Delta"] = round(result["map50"] - reference["map50"], 5)
+            result["map50_95Delta"] = round(result["map50_95"] - reference["map50_95"], 5)
+            result["speedup"] = round(reference["p50Ms"] / result["p50Ms"], 2)
+    return {"baseline": baseline, "variants": variants}
+
+
+def sample_frames(data, count=50, seed=0):
+    """Decoded validation images to time inference on."""
+    images = list_images(check_det_dataset(data)['val'])
+    random.Random(seed).shuffle(images)
+    frames = (cv2.imread(path) for path in images)
+    return list(islice((frame for frame in frames if frame is not None), count))
+
+
+def available_variants(weights):
+    """Backends that can run here and have a model on disk for weights."""
+    return [b for b in BACKENDS
+            if backend_available(b) and os.path.exists(export_path(weights, b))]
@@ -0,0 +1,150 @@
+# rollups.py
+from collections import Counter
+
+from sqlalchemy import func, literal
+
+from extensions import db
+from missions import completed_details
+from models import Detection, DetectionCount, Mission
+
+counts_table = DetectionCount.__table__
+
+
+def rollup_key(session_id, class_name, timestamp):
+    return (session_id or '', class_name, timestamp.date())
+
+
+def _upsert(deltas):
+    rows = [{"session_id": s, "class_name": c, "day": d, "count": n}
+            for (s, c, d), n in deltas.items() if n]
+    if not rows:
+        return
+
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(counts_table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['session_id', 'class_name', 'day'],
+            set_={'count': counts_table.c.count + stmt.excluded['count']})
+        db.session.execute(stmt, rows)
+    else:
+        for row in rows:
+            updated = db.session.execute(
+                counts_table.update()
+                .where(counts_table.c.session_id == row['session_id'],
+                       counts_table.c.class_name == row['class_name'],
+                       counts_table.c.day == row['day'])
+                .values(count=counts_table.c.count + row['count']))
+            if updated.rowcount == 0:
+                db.session.execute(counts_table.insert(), [row])
+
+    if any(n < 0 for n in deltas.values()):
+        db.session.execute(counts_table.delete().where(counts_table.c.count <= 0))
+
+
+def _update_missions(deltas):
+    """Apply {mission_id: Counter(class_name: delta)} to Mission.detected_objects."""
+    for mission_id in sorted(deltas):
+        # Lock the row (where supported) so concurrent ingests don't lose updates
+        current = db.session.execute(
+            db.select(Mission.detected_objects)
+            .where(Mission.id == mission_id)
+            .with_for_update()).scalar_one_or_none()
+        counts = Counter(current or {})
+        counts.update(deltas[mission_id])
+        db.session.execute(
+            db.update(Mission)
+            .where(Mission.id == mission_id)
+            .values(detected_objects={name: n for name, n in sorted(counts.items()) if n > 0}))
+
+
+def add_detections(detection_rows):
+    """Count newly inserted detection rows (dicts with session_id, class_name, timestamp)."""
+    _upsert(Counter(rollup_key(r.get('session_id'), r['class_name'], r['timestamp'])
+                    for r in detection_rows))
+
+    missions = {}
+    for r in detection_rows:
+        if r.get('mission_id') is not None:
+            missions.setdefault(r['mission_id'], Counter())[r['class_name']] += 1
+    _update_missions(missions)
+
+
+def remove_detections(detections):
+    """Uncount Detection objects that are being deleted in the current transaction."""
+    deltas = Counter()
+    missions = {}
+    for d in detections:
+        deltas[rollup_key(d.session_id, d.class_name, d.timestamp)] -= 1
+        if d.mission_id is not None:
+            missions.setdefault(d.mission_id, Counter())[d.class_name] -= 1
+    _upsert(deltas)
+    _update_missions(missions)
+
+
+def clear():
+    db.session.execute(counts_table.delete())
+
+
+def rebuild():
+    """Recompute every rollup row from the detection table. Returns the number of rows written."""
+    clear()
+    day = func.date(Detection.timestamp)
+    session = func.coalesce(Detection.session_id, literal(''))
+    select = (db.select(session, Detection.class_name, day, func.count(Detection.id))
+              .where(Detection.timestamp.isnot(None))
+              .group_by(session, Detection.class_name, day))
+    result = db.session.execute(
+        counts_table.insert().from_select(['session_id', 'class_name', 'day', 'count'], select))
+    db.session.commit()
+    return result.rowcount
+
+
+def rebuild_missions(chunk_size=50, log=print):
+    """
+    Attach unassigned detections to the mission whose time window contains
+    them and recompute every mission's detected_objects, chunk_size
+    missions per transaction. Returns the number of missions processed.
+    """
+    last_id, done = 0, 0
+    while True:
+        missions = (db.session.query(Mission.id, Mission.start_time, Mission.end_time)
+                    .filter(Mission.id > last_id)
+                    .order_by(Mission.id)
+                    .limit(chunk_size)
+                    .all())
+        if not missions:
+            break
+
+        attached = 0
+        for mission_id, start_time, end_time in missions:
+            if start_time is None:
+                continue
+            window = [Detection.mission_id.is_(None), Detection.timestamp >= start_time]
+            if end_time is not None:
+                window.append(Detection.timestamp <= end_time)
+            attached += db.session.execute(
+                db.update(Detection).where(*window).values(mission_id=mission_id)
+                .execution_options(synchronize_session=False)).rowcount
+
+        ids = [m.id for m in missions]
+        counts = {mission_id: {} for mission_id in ids}
+        rows = (db.session.query(Detection.mission_id, Detection.class_name, func.count(Detection.id))
+                .filter(Detection.mission_id.in_(ids))
+                .group_by(Detection.mission_id, Detection.class_name))
+        for mission_id, class_name, count in rows:
+            counts[mission_id][class_name] = count
+        for mission_id in ids:
+            db.session.execute(db.update(Mission).where(Mission.id == mission_id)
+                               .values(detected_objects=dict(sorted(counts[mission_id].items()))))
+        db.session.commit()
+
+        done += len(missions)
+        last_id = ids[-1]
+        log(f"Missions up to id {last_id}: {attached} detections attached")
+    completed_details.clear()
+    return done
@@ -2,12 +2,15 @@ export const API_BASE_URL = 'http://localhost:5000';
 
 export const ENDPOINTS = {
   DETECTIONS: `${API_BASE_URL}/detections`,
+  DETECTION_CLUSTERS: `${API_BASE_URL}/detections/clusters`,
+  DETECTIONS_NEARBY: `${API_BASE_URL}/detections/nearby`,
   STATS: `${API_BASE_URL}/stats`,
   MISSIONS: `${API_BASE_URL}/missions`,
   MISSION_DETAILS: (id: number) => `${API_BASE_URL}/missions/${id}/details`,
   NOTIFICATIONS: `${API_BASE_URL}/notifications`,
   NOTIFICATION_UPDATE: (id: number) => `${API_BASE_URL}/notifications/${id}`,
   UAV_STATUS: `${API_BASE_URL}/uavstatus`,
+  EVENTS: `${API_BASE_URL}/events`,
   LOGIN: `${API_BASE_URL}/api/login`,
   REGISTER: `${API_BASE_URL}/api/register`,
   STREAM: (index: number) => `${API_BASE_URL}/stream?index=${index}`,
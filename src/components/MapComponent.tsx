@@ -1,7 +1,11 @@
-import { MapContainer, TileLayer, Marker, Popup } from 'react-leaflet';
+import { useCallback, useEffect, useRef, useState } from 'react';
+import axios from 'axios';
+import { MapContainer, TileLayer, Marker, Popup, useMapEvents } from 'react-leaflet';
 import 'leaflet/dist/leaflet.css';
 import L from 'leaflet';
-import { Detection } from '../types';
+import { DetectionCluster } from '../types';
+import { ENDPOINTS } from '../api/endpoints';
+import { useEventStream } from '../hooks/useEventStream';
 
 // Add type definition for waste types
 type WasteType = 'plastic' | 'metal' | 'glass' | 'paper' | 'bottle';
@@ -29,7 +33,84 @@ const createMarkerIcon = (type: string) => {
   });
 };
 
-const MapComponent = ({ detections }: { detections: Detection[] }) => {
+const createClusterIcon = (count: number) => {
+  const size = count < 10 ? 30 : count < 100 ? 38 : 46;
+  return L.divIcon({
+    html: `<div style="width:${size}px;height:${size}px;line-height:${size}px;border-radius:50%;background:rgba(232,199,77,0.85);color:#1a1a1a;font-weight:bold;text-align:center;">${count}</div>`,
+    className: '',
+    iconSize: [size, size],
+    iconAnchor: [size / 2, size / 2]
+  });
+};
+
+interface Viewport {
+  bbox: string;
+  zoom: number;
+}
+
+// Reports the visible bbox and zoom whenever the user stops panning/zooming
+const ViewportWatcher = ({ onChange }: { onChange: (viewport: Viewport) => void }) => {
+  const report = (map: L.Map) => {
+    const bounds = map.getBounds();
+    onChange({
+      bbox: [bounds.getWest(), bounds.getSouth(), bounds.getEast(), bounds.getNorth()]
+        .map(v => v.toFixed(5)).join(','),
+      zoom: map.getZoom()
+    });
+  };
+  const map = useMapEvents({
+    moveend: () => report(map),
+  });
+  useEffect(() => report(map), [map]);
+  return null;
+};
+
+const dominantClass = (classes: Record<string, number>) =>
+  Object.entries(classes).sort((a, b) => b[1] - a[1])[0]?.[0] ?? 'plastic';
+
+// Plots server-side clusters for the visible area instead of every detection
+const MapComponent = () => {
+  const [clusters, setClusters] = useState<DetectionCluster[]>([]);
+  const viewportRef = useRef<Viewport | null>(null);
+  const refreshTimer = useRef<number | null>(null);
+
+  const fetchClusters = useCallback(async () => {
+    const viewport = viewportRef.current;
+    if (!viewport) return;
+    try {
+      const response = await axios.get<{ clusters: DetectionCluster[] }>(ENDPOINTS.DETECTION_CLUSTERS, {
+        params: { bbox: viewport.bbox, zoom: viewport.zoom }
+      });
+      setClusters(response.data.clusters || []);
+    } catch (err) {
+      console.error('Error fetching detection clusters:', err);
+    }
+  }, []);
+
+  const handleViewport = useCallback((viewport: Viewport) => {
+    viewportRef.current = viewport;
+    fetchClusters();
+  }, [fetchClusters]);
+
+  // New or deleted detections change the counts; refetch at most every 2 seconds
+  const scheduleRefresh = () => {
+    if (refreshTimer.current !== null) return;
+    refreshTimer.current = window.setTimeout(() => {
+      refreshTimer.current = null;
+      fetchClusters();
+    }, 2000);
+  };
+
+  useEffect(() => () => {
+    if (refreshTimer.current !== null) window.clearTimeout(refreshTimer.current);
+  }, []);
+
+  useEventStream({
+    detections: scheduleRefresh,
+    detections_deleted: scheduleRefresh,
+    reset: scheduleRefresh,
+  });
+
   return (
     <div className="map-container" style={{ height: '400px', borderRadius: '12px', overflow: 'hidden' }}>
       <MapContainer 
@@ -41,51 +122,66 @@ const MapComponent = ({ detections }: { detections: Detection[] }) => {
           url="https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png"
           attribution='&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> contributors'
         />
-        {detections.map((detection, index) => (
-          detection.latitude && detection.longitude ? (
-            <Marker
-              key={index}
-              position={[detection.latitude, detection.longitude]}
-              icon={createMarkerIcon(detection.class_name)}
-            >
-              <Popup>
-                <div style={{ 
-                  color: '#1a1a1a',
-                  padding: '10px',
-                  maxWidth: '200px'
+        <ViewportWatcher onChange={handleViewport} />
+        {clusters.map(cluster => (
+          <Marker
+            key={cluster.cell}
+            position={[cluster.latitude, cluster.longitude]}
+            icon={cluster.count === 1
+              ? createMarkerIcon(dominantClass(cluster.classes))
+              : createClusterIcon(cluster.count)}
+          >
+            <Popup>
+              <div style={{ 
+                color: '#1a1a1a',
+                padding: '10px',
+                maxWidth: '200px'
+              }}>
+                <strong style={{ 
+                  color: '#E8C74D',
+                  display: 'block',
+                  marginBottom: '5px'
                 }}>
-                  <strong style={{ 
-                    color: '#E8C74D',
-                    display: 'block',
-                    marginBottom: '5px'
-                  }}>
-                    {detection.class_name.toUpperCase()}
-                  </strong>
-                  <div style={{ marginBottom: '10px' }}>
-                    Confidence: {(detection.confidence * 100).toFixed(1)}%
-                  </div>
-                  {detection.image_path && (
-                    <img 
-                      src={`http://localhost:5000/${detection.image_path}`}
-                      alt={detection.class_name}
-                      style={{
-                        width: '100%',
-                        height: 'auto',
-                        borderRadius: '4px',
-                        marginBottom: '5px'
-                      }}
-                    />
-                  )}
-                  <div style={{ 
-                    fontSize: '0.8em',
-                    color: '#666'
-                  }}>
-                    Detected: {new Date(detection.timestamp).toLocaleString()}
+                  {cluster.count === 1
+                    ? dominantClass(cluster.classes).toUpperCase()
+                    : `${cluster.count} detections`}
+                </strong>
+                {cluster.count === 1 ? (
+                  <>
+                    {cluster.confidence !== null && (
+                      <div style={{ marginBottom: '10px' }}>
+                        Confidence: {(cluster.confidence * 100).toFixed(1)}%
+                      </div>
+                    )}
+                    {cluster.image_path && (
+                      <img 
+                        src={`http://localhost:5000/${cluster.image_path}`}
+                        alt={dominantClass(cluster.classes)}
+                        style={{
+                          width: '100%',
+                          height: 'auto',
+                          borderRadius: '4px',
+                          marginBottom: '5px'
+                        }}
+                      />
+                    )}
+                    {cluster.timestamp && (
+                      <div style={{ 
+                        fontSize: '0.8em',
+                        color: '#666'
+                      }}>
+                        Detected: {new Date(cluster.timestamp).toLocaleString()}
+                      </div>
+                    )}
+                  </>
+                ) : Object.entries(cluster.classes).map(([name, count]) => (
+                  <div key={name} style={{ fontSize: '0.9em' }}>
+                    {name}: {count}
                   </div>
-                </div>
-              </Popup>
-            </Marker>
-          ) : null
+                ))}
+              </div>
+            </Popup>
+          </Marker>
         ))}
       </MapContainer>
     </div>
@@ -3,6 +3,7 @@ import axios from 'axios';
 import './NotificationsPanel.css';
 import { FaBell, FaCheck, FaExclamationCircle } from 'react-icons/fa';
 import { ENDPOINTS } from '../api/endpoints';
+import { useEventStream } from '../hooks/useEventStream';
 
 interface Notification {
   id: number;
@@ -16,25 +17,32 @@ const NotificationsPanel: React.FC = () => {
   const [notifications, setNotifications] = useState<Notification[]>([]);
   const [isExpanded, setIsExpanded] = useState(true);
 
-  useEffect(() => {
-    const fetchNotifications = async () => {
-      try {
-        const response = await axios.get<Notification[]>(ENDPOINTS.NOTIFICATIONS);
-        setNotifications(response.data);
-      } catch (err) {
-        console.error("Error fetching notifications:", err);
-      }
-    };
+  const fetchNotifications = async () => {
+    try {
+      const response = await axios.get<Notification[]>(ENDPOINTS.NOTIFICATIONS);
+      setNotifications(response.data);
+    } catch (err) {
+      console.error("Error fetching notifications:", err);
+    }
+  };
 
+  useEffect(() => {
     fetchNotifications();
-    const interval = setInterval(fetchNotifications, 10000);
-    return () => clearInterval(interval);
   }, []);
 
+  // New and updated notifications are pushed by the server instead of polled
+  useEventStream({
+    notification: (note: Notification) =>
+      setNotifications(prev => [note, ...prev.filter(n => n.id !== note.id)]),
+    notification_updated: (note: Notification) =>
+      setNotifications(prev => prev.map(n => n.id === note.id ? note : n)),
+    reset: fetchNotifications,
+  });
+
   const markAsSeen = async (id: number) => {
     try {
       await axios.patch(ENDPOINTS.NOTIFICATION_UPDATE(id), { seen: true });
-      setNotifications(notifications.map(n => n.id === id ? { ...n, seen: true } : n));
+      setNotifications(prev => prev.map(n => n.id === id ? { ...n, seen: true } : n));
     } catch (err) {
       console.error("Error updating notification:", err);
     }
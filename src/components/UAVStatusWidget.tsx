@@ -2,6 +2,7 @@ import React, { useEffect, useState } from 'react';
 import axios from 'axios';
 import './UAVStatusWidget.css';
 import { ENDPOINTS } from '../api/endpoints';
+import { useEventStream } from '../hooks/useEventStream';
 
 interface UAVStatus {
   id: number;
@@ -27,13 +28,13 @@ const UAVStatusWidget: React.FC = () => {
     };
 
     fetchStatus(); // Initial fetch
-
-    const intervalId = setInterval(fetchStatus, 5000); 
-    // Poll every 5 seconds, or however often you want
-
-    return () => clearInterval(intervalId);
   }, []);
 
+  // Later updates are pushed by the server as telemetry arrives
+  useEventStream({
+    uav_status: (update: UAVStatus) => setStatus(update),
+  });
+
   if (!status) {
     return (
       <div className="loading-status">
@@ -0,0 +1,52 @@
+import { useEffect, useRef } from 'react';
+import { ENDPOINTS } from '../api/endpoints';
+
+type EventHandler = (data: any) => void;
+type EventHandlers = Record<string, EventHandler>;
+
+// One EventSource per browser tab, shared by every component using the hook.
+let source: EventSource | null = null;
+const listeners = new Map<string, Set<EventHandler>>();
+
+const dispatch = (type: string) => (event: Event) => {
+  const data = JSON.parse((event as MessageEvent).data);
+  listeners.get(type)?.forEach(handler => handler(data));
+};
+
+const subscribe = (type: string, handler: EventHandler) => {
+  if (!source) {
+    source = new EventSource(ENDPOINTS.EVENTS);
+  }
+  if (!listeners.has(type)) {
+    listeners.set(type, new Set());
+    source.addEventListener(type, dispatch(type));
+  }
+  listeners.get(type)!.add(handler);
+};
+
+const unsubscribe = (type: string, handler: EventHandler) => {
+  listeners.get(type)?.delete(handler);
+  const active = Array.from(listeners.values()).some(set => set.size > 0);
+  if (!active && source) {
+    source.close();
+    source = null;
+    listeners.clear();
+  }
+};
+
+// Subscribes to the server's /events SSE stream for the handled event types.
+// EventSource reconnects on its own and resumes with Last-Event-ID; a "reset"
+// event means some events were missed and the caller should refetch.
+export const useEventStream = (handlers: EventHandlers) => {
+  const handlersRef = useRef(handlers);
+  handlersRef.current = handlers;
+
+  useEffect(() => {
+    const bound = Object.keys(handlersRef.current).map(type => {
+      const handler: EventHandler = data => handlersRef.current[type]?.(data);
+      subscribe(type, handler);
+      return [type, handler] as const;
+    });
+    return () => bound.forEach(([type, handler]) => unsubscribe(type, handler));
+  }, []);
+};
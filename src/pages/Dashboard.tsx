@@ -8,6 +8,7 @@ import MapComponent from '../components/MapComponent';
 import { FaBatteryFull, FaTrashAlt, FaChartLine, FaExclamationCircle, FaExclamationTriangle, FaInfoCircle } from 'react-icons/fa';
 import { Detection, Notification } from '../types';
 import { ENDPOINTS } from '../api/endpoints';
+import { useEventStream } from '../hooks/useEventStream';
 
 Chart.register(...registerables);
 
@@ -24,36 +25,55 @@ const Dashboard: React.FC = () => {
   const [isLoading, setIsLoading] = useState<boolean>(false);
   const [error, setError] = useState<string>('');
 
-  useEffect(() => {
-    const fetchData = async () => {
-      setIsLoading(true);
-      setError('');
-      try {
-        const [detectionsRes, statsRes, notificationsRes] = await Promise.all([
-          axios.get<Detection[]>(ENDPOINTS.DETECTIONS),
-          axios.get<DetectionStats>(ENDPOINTS.STATS),
-          axios.get<Notification[]>(ENDPOINTS.NOTIFICATIONS)
-        ]);
-
-        console.log('Detections data:', detectionsRes.data);
-        setDetections(detectionsRes.data || []);
-        setStats(statsRes.data || { plastic: 0, metal: 0, glass: 0 });
-        setRecentNotifications(notificationsRes.data || []);
-      } catch (err) {
-        console.error('Error fetching dashboard data:', err);
-        setError('Failed to fetch dashboard data. Please try again later.');
-      } finally {
-        setIsLoading(false);
-      }
-    };
+  const fetchData = async () => {
+    setIsLoading(true);
+    setError('');
+    try {
+      const [detectionsRes, statsRes, notificationsRes] = await Promise.all([
+        axios.get<Detection[]>(ENDPOINTS.DETECTIONS),
+        axios.get<DetectionStats>(ENDPOINTS.STATS),
+        axios.get<Notification[]>(ENDPOINTS.NOTIFICATIONS)
+      ]);
+
+      console.log('Detections data:', detectionsRes.data);
+      setDetections(detectionsRes.data || []);
+      setStats(statsRes.data || { plastic: 0, metal: 0, glass: 0 });
+      setRecentNotifications(notificationsRes.data || []);
+    } catch (err) {
+      console.error('Error fetching dashboard data:', err);
+      setError('Failed to fetch dashboard data. Please try again later.');
+    } finally {
+      setIsLoading(false);
+    }
+  };
 
+  useEffect(() => {
     fetchData();
-    
-    // Refresh data every 30 seconds
-    const interval = setInterval(fetchData, 30000);
-    return () => clearInterval(interval);
   }, []);
 
+  // Apply pushed changes instead of re-polling everything every 30 seconds
+  useEventStream({
+    detections: (added: Detection[]) => {
+      setDetections(prev => [...added, ...prev]);
+      setStats(prev => {
+        const next: DetectionStats = { ...prev };
+        added.forEach(det => {
+          const key = det.class_name.toLowerCase() as keyof DetectionStats;
+          if (key in next) {
+            next[key] += 1;
+          }
+        });
+        return next;
+      });
+    },
+    detections_deleted: fetchData,
+    notification: (note: Notification) =>
+      setRecentNotifications(prev => [note, ...prev.filter(n => n.id !== note.id)]),
+    notification_updated: (note: Notification) =>
+      setRecentNotifications(prev => prev.map(n => n.id === note.id ? note : n)),
+    reset: fetchData,
+  });
+
   const chartData = {
     labels: Object.keys(stats),
     datasets: [{
@@ -138,7 +158,7 @@ const Dashboard: React.FC = () => {
       {/* Map Section */}
       <div className="map-section">
         <h3 className="section-title">Detection Locations</h3>
-        <MapComponent detections={detections} />
+        <MapComponent />
       </div>
 
       {/* Recent Notifications */}
@@ -21,6 +21,7 @@ interface MissionDetails {
   endLocation: string;
   objectTypes: { [key: string]: number };
   route: string[];
+  routePoints: number;  // Points before simplification
 }
 
 const Missions: React.FC = () => {
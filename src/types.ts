@@ -14,6 +14,19 @@ export interface Detection {
   longitude: number | null;
 }
 
+export interface DetectionCluster {
+  cell: string;
+  latitude: number;
+  longitude: number;
+  count: number;
+  classes: Record<string, number>;
+  // Only set when count is 1
+  id: number | null;
+  image_path: string | null;
+  confidence: number | null;
+  timestamp: string | null;
+}
+
 export interface Notification {
   id: number;
   message: string;
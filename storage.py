@@ -0,0 +1,235 @@
+# storage.py
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from extensions import db
+from models import Detection, ImageBlob
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.webp', '.tif', '.tiff'}
+
+# "ab/cd/<sha256>.jpg" - anything else is a pre-dedup upload path
+STORED_PATH = re.compile(r'^[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})\.\w+$')
+
+blobs = ImageBlob.__table__
+
+# Images per statement when many are updated at once
+CHUNK_SIZE = 500
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_hash(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def path_hash(image_path):
+    """The content hash in a stored image path, or None for legacy paths."""
+    match = STORED_PATH.match(image_path or '')
+    return match.group(1) if match else None
+
+
+class ImageStore:
+    """
+    Uploads stored once per distinct content under root/ab/cd/<sha256>.ext.
+    The image_blob table counts how many Detection rows point at each file
+    (see add_references/release below), so a file is removed only when the
+    last detection using it is deleted.
+    """
+
+    def __init__(self, root, writer_threads=0, on_write=None):
+        self.root = root
+        # With writer threads, put() returns before the bytes hit the disk
+        self._writer = (ThreadPoolExecutor(writer_threads, thread_name_prefix='upload-writer')
+                        if writer_threads else None)
+        self._writing = set()
+        self._lock = threading.Lock()
+        self.on_write = on_write
+
+    def relative_path(self, digest, filename):
+        ext = os.path.splitext(filename or '')[1].lower()
+        if ext not in IMAGE_EXTENSIONS:
+            ext = '.jpg'
+        return f"{digest[:2]}/{digest[2:4]}/{digest}{ext}"
+
+    def full_path(self, image_path):
+        return os.path.join(self.root, image_path)
+
+    @property
+    def pending_writes(self):
+        with self._lock:
+            return len(self._writing)
+
+    def put(self, data, filename, digest=None):
+        """
+        Store data unless identical content is already on disk. Returns its
+        image_path. The content's image_blob row stays locked until the
+        caller commits, so the deletion queue cannot remove a file this
+        upload is about to reference. Callers that put several images in one
+        transaction should lock_blobs() them first.
+        """
+        digest = digest or content_hash(data)
+        existing = db.session.execute(
+            db.select(blobs.c.path).where(blobs.c.hash == digest).with_for_update()).scalar_one_or_none()
+        image_path = existing or self.relative_path(digest, filename)
+
+        full_path = self.full_path(image_path)
+        with self._lock:
+            # Without a row the file, if any, may be on its way out: write it again
+            if image_path in self._writing or (existing and os.path.exists(full_path)):
+                return image_path
+            self._writing.add(image_path)
+        if self._writer is not None:
+            self._writer.submit(self._write, image_path, data)
+        else:
+            self._write(image_path, data)
+        return image_path
+
+    def _write(self, image_path, data):
+        started = time.perf_counter()
+        full_path = self.full_path(image_path)
+        directory = os.path.dirname(full_path)
+        tmp_path = None
+        try:
+            while True:
+                os.makedirs(directory, exist_ok=True)
+                # Write under a temporary name so readers never see a partial file
+                try:
+                    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.part')
+                    break
+                except FileNotFoundError:
+                    continue  # The deletion queue removed the emptied shard directory meanwhile
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, full_path)
+            if self.on_write is not None:
+                self.on_write((time.perf_counter() - started) * 1000)
+        except Exception as e:
+            print(f"Failed to store upload {image_path}: {e}")
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            if self._writer is None:
+                raise
+        finally:
+            with self._lock:
+                self._writing.discard(image_path)
+
+    def flush(self):
+        """Wait for queued writes to finish (for shutdown and tests)."""
+        while self.pending_writes:
+            time.sleep(0.01)
+
+
+def lock_blobs(digests):
+    """
+    Lock the image_blob rows of digests until commit, in hash order, so
+    transactions that store several images can't deadlock each other by
+    taking the same locks in different orders in put().
+    """
+    digests = sorted(set(digests))
+    for i in range(0, len(digests), CHUNK_SIZE):
+        db.session.execute(db.select(blobs.c.hash)
+                           .where(blobs.c.hash.in_(digests[i:i + CHUNK_SIZE]))
+                           .order_by(blobs.c.hash)
+                           .with_for_update()).all()
+
+
+def add_references(detection_rows):
+    """Count new Detection rows against their images, in the caller's transaction."""
+    counts = Counter(r.get('image_path') for r in detection_rows)
+    rows = []
+    # In hash order, like lock_blobs()
+    for image_path, n in sorted(counts.items(), key=lambda item: path_hash(item[0]) or ''):
+        digest = path_hash(image_path)
+        if digest:
+            rows.append({"hash": digest, "path": image_path, "refcount": n,
+                         "created_at": datetime.utcnow()})
+    if not rows:
+        return
+
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(blobs)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['hash'],
+            set_={'refcount': blobs.c.refcount + stmt.excluded['refcount']})
+        db.session.execute(stmt, rows)
+    else:
+        for row in rows:
+            updated = db.session.execute(
+                blobs.update()
+                .where(blobs.c.hash == row['hash'])
+                .values(refcount=blobs.c.refcount + row['refcount']))
+            if updated.rowcount == 0:
+                db.session.execute(blobs.insert(), [row])
+
+
+def release(detections):
+    """
+    Uncount Detection objects about to be deleted in the caller's
+    transaction (call before deleting them). Returns the image paths no
+    longer referenced by any detection; hand them to the deletion queue
+    after commit. Blob rows that reach zero are left for the queue to
+    remove together with the file.
+    """
+    counts = Counter(d.image_path for d in detections if d.image_path)
+    unreferenced = []
+
+    # Uploads from before dedup have no blob row; count their other detections instead
+    legacy = [p for p in counts if path_hash(p) is None]
+    if legacy:
+        ids = [d.id for d in detections]
+        still_used = {p for (p,) in (db.session.query(Detection.image_path)
+                                     .filter(Detection.image_path.in_(legacy),
+                                             Detection.id.notin_(ids))
+                                     .distinct())}
+        unreferenced.extend(p for p in legacy if p not in still_used)
+
+    # One UPDATE and one SELECT per chunk of images rather than per image
+    by_hash = {path_hash(p): (p, n) for p, n in counts.items() if path_hash(p)}
+    digests = sorted(by_hash)
+    for i in range(0, len(digests), CHUNK_SIZE):
+        chunk = digests[i:i + CHUNK_SIZE]
+        decrement = db.case({digest: by_hash[digest][1] for digest in chunk}, value=blobs.c.hash)
+        db.session.execute(blobs.update()
+                           .where(blobs.c.hash.in_(chunk))
+                           .values(refcount=blobs.c.refcount - decrement))
+        left = db.session.execute(db.select(blobs.c.hash)
+                                  .where(blobs.c.hash.in_(chunk), blobs.c.refcount <= 0))
+        unreferenced.extend(by_hash[digest][0] for (digest,) in left)
+    return unreferenced
+
+
+def claim_unreferenced(image_paths):
+    """
+    Lock the blob rows of image_paths and delete those still at refcount
+    zero, in the caller's transaction; remove their files before commit.
+    Returns the paths that were referenced again meanwhile and must stay.
+    """
+    digests = {path_hash(p): p for p in image_paths if path_hash(p)}
+    if not digests:
+        return set()
+    rows = db.session.execute(
+        db.select(blobs.c.hash, blobs.c.path, blobs.c.refcount)
+        .where(blobs.c.hash.in_(list(digests)))
+        .with_for_update()).all()
+    reused = {path for digest, path, refcount in rows
+              if refcount > 0 and digests[digest] == path}
+    db.session.execute(blobs.delete().where(blobs.c.hash.in_(list(digests)), blobs.c.refcount <= 0))
+    return reused
@@ -0,0 +1,484 @@
+# streaming.py
+import multiprocessing
+import threading
+import time
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from postprocess import annotate, extract_detections
+
+# Sent before every JPEG in the multipart/x-mixed-replace stream
+PART_HEADER = b'--frame\r\nContent-Type: image/jpeg\r\n\r\n'
+
+
+class FrameRing:
+    """
+    A fixed ring of `slots` preallocated frames of `shape` (uint8) in one
+    shared memory block. The writer fills a slot in place and publishes it
+    under the next sequence number; readers get NumPy views of the newest
+    frame, so nothing is copied between capture, inference and encoding,
+    whether they run in this process or another one.
+
+    All ring state (newest slot, per-slot sequence numbers, hold counts and
+    the closed flag) lives in the block's header behind a multiprocessing
+    lock. A reader hold()s a frame, which keeps the writer off that slot
+    until release(), so keep slots >= readers + 2. Another process gets the
+    same ring with FrameRing.attach(ring.handle), where the handle is passed
+    as a Process argument; waiters there notice changes by polling.
+    """
+
+    # Header: seq, newest slot, closed flag, then per-slot seqs and hold counts
+    _SEQ, _LATEST, _CLOSED, _SLOTS = 0, 1, 2, 3
+
+    # How often waiters re-check for changes made by other processes, in seconds
+    POLL_INTERVAL = 0.005
+
+    def __init__(self, shape, slots=4, name=None, lock=None):
+        self.shape = tuple(shape)
+        self.slots = slots
+        frame_bytes = int(np.prod(self.shape))
+        header_bytes = 64 * ((8 * (self._SLOTS + 2 * slots) + 63) // 64)
+        self._owner = name is None
+        if self._owner:
+            self._shm = shared_memory.SharedMemory(create=True, size=header_bytes + slots * frame_bytes)
+            self._lock = multiprocessing.get_context('spawn').Lock()
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+            self._lock = lock
+        header = np.ndarray((self._SLOTS + 2 * slots,), dtype=np.int64, buffer=self._shm.buf)
+        self._header = header
+        self._slot_seqs = header[self._SLOTS:self._SLOTS + slots]
+        self._held = header[self._SLOTS + slots:]
+        self.frames = np.ndarray((slots,) + self.shape, dtype=np.uint8,
+                                 buffer=self._shm.buf, offset=header_bytes)
+        if self._owner:
+            header[:] = 0
+            header[self._LATEST] = -1
+
+        # Wakes waiters in this process at once; others see changes on their next poll
+        self._cond = threading.Condition()
+
+    @property
+    def handle(self):
+        """Picklable (name, shape, slots, lock) for attach() in a child process."""
+        return self._shm.name, self.shape, self.slots, self._lock
+
+    @classmethod
+    def attach(cls, handle):
+        name, shape, slots, lock = handle
+        return cls(shape, slots, name=name, lock=lock)
+
+    @property
+    def seq(self):
+        return int(self._header[self._SEQ])
+
+    @property
+    def closed(self):
+        return bool(self._header[self._CLOSED])
+
+    def _notify(self):
+        with self._cond:
+            self._cond.notify_all()
+
+    def _wait(self, ready, timeout):
+        """Wait until ready() or closed, checked under the lock. Returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                if self._header[self._CLOSED] or ready():
+                    return True
+            wait = self.POLL_INTERVAL
+            if deadline is not None:
+                wait = min(wait, deadline - time.monotonic())
+                if wait <= 0:
+                    return False
+            with self._cond:
+                self._cond.wait(wait)
+
+    def _free(self):
+        latest = self._header[self._LATEST]
+        return [i for i in range(self.slots) if not self._held[i] and i != latest]
+
+    def next_slot(self, timeout=None):
+        """A slot to write the next frame into: (slot, view), or (None, None) if closed."""
+        self._wait(self._free, timeout)
+        with self._lock:
+            candidates = self._free()
+            if self._header[self._CLOSED] or not candidates:
+                return None, None
+            # Reuse the slot holding the oldest frame
+            slot = min(candidates, key=lambda i: self._slot_seqs[i])
+            self._slot_seqs[slot] = 0
+            return slot, self.frames[slot]
+
+    def publish(self, slot):
+        """Make the frame written into slot the newest one. Returns its sequence number."""
+        with self._lock:
+            seq = int(self._header[self._SEQ]) + 1
+            self._slot_seqs[slot] = seq
+            self._header[self._LATEST] = slot
+            self._header[self._SEQ] = seq
+        self._notify()
+        return seq
+
+    def hold(self, after_seq=0, timeout=None):
+        """
+        Wait for a frame newer than after_seq and pin it. Returns
+        (seq, slot, view); slot is None on timeout or close. Call
+        release(slot) when done with the view.
+        """
+        self._wait(lambda: self._header[self._SEQ] > after_seq, timeout)
+        with self._lock:
+            seq = int(self._header[self._SEQ])
+            if self._header[self._CLOSED] or seq <= after_seq:
+                return after_seq, None, None
+            slot = int(self._header[self._LATEST])
+            self._held[slot] += 1
+            return seq, slot, self.frames[slot]
+
+    def release(self, slot):
+        with self._lock:
+            self._held[slot] -= 1
+        self._notify()
+
+    def close(self):
+        """Wake everyone waiting, in every process; the ring can't be used afterwards."""
+        if self._header is None:
+            return  # Already detached
+        with self._lock:
+            self._header[self._CLOSED] = 1
+        self._notify()
+
+    def detach(self):
+        """Unmap the block in this process. Views into the ring must no longer be in use."""
+        self.frames = self._header = self._slot_seqs = self._held = None
+        try:
+            self._shm.close()
+        except BufferError:
+            # A reader thread that didn't stop in time still has a view; the
+            # mapping goes away with it
+            print("Frame ring still in use, leaving it mapped")
+
+    def unlink(self):
+        """Close the ring and, in the creating process, free the shared memory."""
+        self.close()
+        self.detach()
+        if self._owner:
+            self._shm.unlink()
+
+
+class InferenceScheduler:
+    """
+    Decides when to run the detector based on measured inference latency
+    instead of a fixed "every N frames" interval.
+
+    max_duty is the fraction of wall time the detector may be busy: 1.0 runs
+    it back to back, 0.5 leaves an idle gap as long as the last inference.
+    """
+
+    def __init__(self, max_duty=1.0, smoothing=0.2):
+        self.max_duty = max(0.05, min(1.0, max_duty))
+        self.smoothing = smoothing
+        self.latency = None
+        self._last_end = 0.0
+
+    def record(self, started, finished):
+        elapsed = finished - started
+        if self.latency is None:
+            self.latency = elapsed
+        else:
+            self.latency += self.smoothing * (elapsed - self.latency)
+        self._last_end = finished
+
+    def delay(self, now):
+        """Seconds to wait from now before the next inference may start."""
+        if self.latency is None:
+            return 0.0
+        gap = self.latency * (1.0 - self.max_duty) / self.max_duty
+        return max(0.0, self._last_end + gap - now)
+
+
+class CameraWorker:
+    """
+    Owns one cv2.VideoCapture and runs capture -> inference -> encode once
+    per frame. Subscribers only ever read the latest multipart chunk.
+
+    Capture reads and resizes straight into a FrameRing slot, and the
+    detector and encoder work on views of it. In pipelined mode capture,
+    inference and encoding run on separate threads that each take the
+    newest frame in the ring, so a slow model never stalls capture and the
+    stream shows the freshest frame with the most recent detections.
+
+    Frames go through `inference` (the app's BatchInferenceServer or
+    ProcessInferencePool) so stream and /detect forward passes never run
+    on the model at the same time; the model itself is only called
+    directly when no server is given.
+    """
+
+    def __init__(self, index, model, frame_width=640, frame_height=480,
+                 jpeg_quality=80, pipelined=True, inference_duty=None,
+                 conf_threshold=0.75, ring_slots=4, inference=None):
+        self.index = index
+        self.model = model
+        self.inference = inference
+        self.conf_threshold = conf_threshold
+        self.frame_width = frame_width
+        self.frame_height = frame_height
+        self.jpeg_quality = jpeg_quality
+        self.pipelined = pipelined
+        self.ring_slots = ring_slots
+        self.ring = None
+        # Inline mode shares one thread with capture, so leave it some headroom
+        if inference_duty is None:
+            inference_duty = 1.0 if pipelined else 0.5
+        self.scheduler = InferenceScheduler(max_duty=inference_duty)
+
+        self._cond = threading.Condition()
+        self._chunk = None
+        self._seq = 0
+        self._running = False
+        self._stop = threading.Event()
+        self._thread = None
+
+        self._detections_lock = threading.Lock()
+        self._last_detections = None
+
+        # Reused buffers: camera frames that need resizing, and frames being drawn on
+        self._raw = None
+        self._canvas = None
+
+    @property
+    def running(self):
+        return self._running
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(
+            target=self._run, name=f"camera-{self.index}", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2.0):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def wait_for_frame(self, last_seq, timeout=1.0):
+        """Block until a frame newer than last_seq is available.
+
+        Returns (seq, chunk) where chunk is the complete multipart part for
+        the frame, shared by every subscriber; None on timeout or shutdown.
+        """
+        with self._cond:
+            self._cond.wait_for(
+                lambda: self._seq != last_seq or not self._running, timeout)
+            if self._seq == last_seq:
+                return last_seq, None
+            return self._seq, self._chunk
+
+    def _publish(self, jpeg):
+        # One copy out of the encoder's buffer per frame, however many subscribers
+        chunk = b''.join((PART_HEADER, jpeg, b'\r\n'))
+        with self._cond:
+            self._chunk = chunk
+            self._seq += 1
+            self._cond.notify_all()
+
+    def _infer(self, frame):
+        started = time.perf_counter()
+        try:
+            if self.inference is not None:
+                result = self.inference.infer(frame)
+            else:
+                result = self.model(frame, verbose=False)[0]
+        except Exception as e:
+            print(f"Detection error: {e}")
+            return
+        finally:
+            self.scheduler.record(started, time.perf_counter())
+        detections = extract_detections(result, self.conf_threshold)
+        with self._detections_lock:
+            self._last_detections = detections
+
+    def _annotate_and_encode(self, frame, encode_params):
+        with self._detections_lock:
+            detections = self._last_detections
+
+        # Draw cached detections on a copy, the ring slot may still be read by the detector
+        if detections is not None and len(detections) > 0:
+            if self._canvas is None or self._canvas.shape != frame.shape:
+                self._canvas = np.empty_like(frame)
+            np.copyto(self._canvas, frame)
+            frame = self._canvas
+            try:
+                annotate(frame, detections, self.model)
+            except Exception as e:
+                print(f"Drawing error: {e}")
+                return
+
+        # Encode frame with lower quality for faster transmission
+        ret, buffer = cv2.imencode('.jpg', frame, encode_params)
+        if ret:
+            self._publish(buffer)
+
+    def _run(self):
+        cap = cv2.VideoCapture(self.index)
+        if not cap.isOpened():
+            print(f"Error: Could not open video device at index {self.index}.")
+            self._shutdown()
+            return
+        # Cameras that honour this deliver frames we can read straight into the ring
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.frame_width)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.frame_height)
+        self.ring = FrameRing((self.frame_height, self.frame_width, 3), self.ring_slots)
+
+        try:
+            if self.pipelined:
+                self._run_pipelined(cap)
+            else:
+                self._run_inline(cap)
+        finally:
+            cap.release()
+            self.ring.unlink()
+            self._shutdown()
+
+    def _capture(self, cap):
+        """Read the next frame into a ring slot and publish it. Returns the slot or None."""
+        slot, frame = self.ring.next_slot(timeout=1.0)
+        if slot is None:
+            return None
+        success, raw = cap.read(frame if self._raw is None else self._raw)
+        if not success:
+            return None
+        if not np.shares_memory(raw, frame):
+            # Camera size differs: keep its buffer for the next reads and
+            # resize into the slot for faster processing
+            self._raw = raw
+            cv2.resize(raw, (self.frame_width, self.frame_height), dst=frame)
+        self.ring.publish(slot)
+        return slot
+
+    def _run_inline(self, cap):
+        encode_params = [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality]
+        seq = 0
+        while not self._stop.is_set():
+            if self._capture(cap) is None:
+                break
+            seq, slot, frame = self.ring.hold(seq, timeout=1.0)
+            if slot is None:
+                break
+            try:
+                if self.scheduler.delay(time.perf_counter()) == 0.0:
+                    self._infer(frame)
+                self._annotate_and_encode(frame, encode_params)
+            finally:
+                self.ring.release(slot)
+
+    def _run_pipelined(self, cap):
+        stages = [
+            threading.Thread(target=self._inference_loop,
+                             name=f"camera-{self.index}-infer", daemon=True),
+            threading.Thread(target=self._encode_loop,
+                             name=f"camera-{self.index}-encode", daemon=True),
+        ]
+        for stage in stages:
+            stage.start()
+
+        try:
+            while not self._stop.is_set():
+                if self._capture(cap) is None:
+                    break
+        finally:
+            self._stop.set()
+            self.ring.close()
+            for stage in stages:
+                stage.join(2.0)
+
+    def _inference_loop(self):
+        seq = 0
+        while not self._stop.is_set():
+            wait = self.scheduler.delay(time.perf_counter())
+            if wait > 0 and self._stop.wait(wait):
+                break
+            # Skips straight to the newest frame, however many arrived meanwhile
+            seq, slot, frame = self.ring.hold(seq, timeout=0.5)
+            if slot is not None:
+                try:
+                    self._infer(frame)
+                finally:
+                    self.ring.release(slot)
+
+    def _encode_loop(self):
+        encode_params = [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality]
+        seq = 0
+        while not self._stop.is_set():
+            seq, slot, frame = self.ring.hold(seq, timeout=0.5)
+            if slot is not None:
+                try:
+                    self._annotate_and_encode(frame, encode_params)
+                finally:
+                    self.ring.release(slot)
+
+    def _shutdown(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+
+
+class CameraHub:
+    """
+    Keeps at most one CameraWorker per camera index. The worker is started by
+    the first subscriber and stopped when the last subscriber disconnects.
+    """
+
+    def __init__(self, model, **worker_options):
+        self.model = model
+        self.worker_options = worker_options
+        self._lock = threading.Lock()
+        self._workers = {}
+        self._subscribers = {}
+
+    def _acquire(self, index):
+        with self._lock:
+            worker = self._workers.get(index)
+            if worker is None or not worker.running:
+                if worker is not None:
+                    # Previous worker died (e.g. camera unplugged); make sure
+                    # it released the device before opening it again
+                    worker.stop()
+                worker = CameraWorker(index, self.model, **self.worker_options)
+                worker.start()
+                self._workers[index] = worker
+                self._subscribers[index] = 0
+            self._subscribers[index] += 1
+            return worker
+
+    def _release(self, index, worker):
+        with self._lock:
+            if self._workers.get(index) is not worker:
+                return
+            self._subscribers[index] -= 1
+            if self._subscribers[index] <= 0:
+                del self._workers[index]
+                del self._subscribers[index]
+                worker.stop()
+
+    def subscriber_count(self, index):
+        with self._lock:
+            return self._subscribers.get(index, 0)
+
+    def frames(self, index=0):
+        """Multipart MJPEG generator fed by the shared worker for index."""
+        worker = self._acquire(index)
+        try:
+            seq = 0
+            while True:
+                seq, chunk = worker.wait_for_frame(seq)
+                if chunk is None:
+                    if not worker.running:
+                        break
+                    continue
+                yield chunk
+        finally:
+            self._release(index, worker)
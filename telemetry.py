@@ -0,0 +1,279 @@
+# telemetry.py
+import json
+import threading
+import time
+from datetime import datetime, timezone
+
+from events import event_bus
+from extensions import db
+from models import UAVStatus
+
+SAMPLE_FIELDS = ('battery', 'latitude', 'longitude', 'speed', 'altitude')
+
+
+class TelemetryBufferFull(Exception):
+    """Raised when the write-behind buffer cannot take more samples right now."""
+
+
+def parse_timestamp(value):
+    """Naive UTC datetime from epoch seconds or ISO 8601; no offset means UTC."""
+    if value is None:
+        return datetime.utcnow()
+    if isinstance(value, (int, float)):
+        return datetime.utcfromtimestamp(value)
+    parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def parse_sample(data):
+    """Validate one telemetry sample into a uav_status row. Raises ValueError."""
+    if not isinstance(data, dict):
+        raise ValueError("Sample must be an object")
+    row = {field: (float(data[field]) if data.get(field) is not None else None)
+           for field in SAMPLE_FIELDS}
+    if row['battery'] is None:
+        row['battery'] = 100.0
+    drone_id = data.get('drone_id', data.get('droneId'))
+    row['drone_id'] = int(drone_id) if drone_id is not None else None
+    row['timestamp'] = parse_timestamp(data.get('timestamp'))
+    return row
+
+
+def parse_batch(body, content_type):
+    """
+    Parse a batch upload: NDJSON (one sample per line), a JSON array, or an
+    object with a "samples" array. Raises ValueError on malformed input.
+    """
+    try:
+        if 'ndjson' in (content_type or '') or 'jsonl' in (content_type or ''):
+            items = [json.loads(line) for line in body.splitlines() if line.strip()]
+        else:
+            items = json.loads(body)
+            if isinstance(items, dict):
+                items = items.get('samples', [items])
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Malformed JSON: {e}") from e
+    if not isinstance(items, list):
+        raise ValueError("Expected a list of samples")
+    try:
+        return [parse_sample(item) for item in items]
+    except (TypeError, ValueError, OverflowError) as e:
+        raise ValueError(f"Invalid sample: {e}") from e
+
+
+def status_payload(row, now=None):
+    payload = {
+        "id": row.get('id'),
+        "drone_id": row.get('drone_id'),
+        "battery": row['battery'],
+        "latitude": row['latitude'],
+        "longitude": row['longitude'],
+        "speed": row['speed'],
+        "altitude": row['altitude'],
+        "timestamp": row['timestamp'].isoformat(),
+    }
+    if now is not None:
+        # How old the sample is, so clients can flag drones that went quiet
+        payload["age_seconds"] = round((now - row['timestamp']).total_seconds(), 3)
+    return payload
+
+
+class LatestTelemetryStore:
+    """
+    Newest known sample per drone, updated as telemetry is ingested so that
+    GET /uavstatus never has to query uav_status. Seeded from the database
+    on first use after a restart.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._latest = {}
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    def update(self, rows):
+        with self._lock:
+            for row in rows:
+                current = self._latest.get(row['drone_id'])
+                if current is None or row['timestamp'] >= current['timestamp']:
+                    self._latest[row['drone_id']] = row
+
+    def get(self, drone_id):
+        self._ensure_loaded()
+        with self._lock:
+            return self._latest.get(drone_id)
+
+    def get_many(self, drone_ids):
+        self._ensure_loaded()
+        with self._lock:
+            return {d: self._latest.get(d) for d in drone_ids}
+
+    def most_recent(self):
+        """The newest sample across all drones, or None."""
+        self._ensure_loaded()
+        with self._lock:
+            if not self._latest:
+                return None
+            return max(self._latest.values(), key=lambda row: row['timestamp'])
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self.app.app_context():
+            rows = self._load_latest()
+        with self._lock:
+            if not self._loaded:
+                for row in rows:
+                    current = self._latest.get(row['drone_id'])
+                    if current is None or row['timestamp'] > current['timestamp']:
+                        self._latest[row['drone_id']] = row
+                self._loaded = True
+
+    def _load_latest(self):
+        # One query for every drone's newest sample (uses idx_uav_status_drone_time)
+        newest = (db.select(UAVStatus.drone_id, db.func.max(UAVStatus.timestamp).label('ts'))
+                  .group_by(UAVStatus.drone_id)
+                  .subquery())
+        query = (db.select(UAVStatus)
+                 .join(newest, db.and_(
+                     UAVStatus.timestamp == newest.c.ts,
+                     db.or_(UAVStatus.drone_id == newest.c.drone_id,
+                            db.and_(UAVStatus.drone_id.is_(None), newest.c.drone_id.is_(None))))))
+        rows = []
+        for status in db.session.execute(query).scalars():
+            rows.append({
+                "id": status.id,
+                "drone_id": status.drone_id,
+                "battery": status.battery,
+                "latitude": status.latitude,
+                "longitude": status.longitude,
+                "speed": status.speed,
+                "altitude": status.altitude,
+                "timestamp": status.timestamp,
+            })
+        return rows
+
+
+class TelemetryBuffer:
+    """
+    Write-behind buffer for UAV telemetry. Samples are accepted into memory
+    and a background thread writes them with one bulk INSERT whenever
+    flush_size samples are waiting or flush_interval seconds have passed.
+
+    When max_pending samples are already waiting, add() raises
+    TelemetryBufferFull so the endpoint can push back on the sender instead
+    of growing without bound.
+    """
+
+    def __init__(self, app, max_pending=50000, flush_size=2000, flush_interval=0.5,
+                 on_flush=None):
+        self.app = app
+        self.max_pending = max_pending
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.on_flush = on_flush
+
+        self._pending = []
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+
+        self.accepted = 0
+        self.rejected = 0
+        self.written = 0
+        self.failed_flushes = 0
+
+    def start(self):
+        with self._cond:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping = False
+                self._thread = threading.Thread(
+                    target=self._run, name="telemetry-writer", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout=5.0):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    @property
+    def pending(self):
+        with self._cond:
+            return len(self._pending)
+
+    def add(self, rows):
+        self.start()
+        with self._cond:
+            if len(self._pending) + len(rows) > self.max_pending:
+                self.rejected += len(rows)
+                raise TelemetryBufferFull()
+            self._pending.extend(rows)
+            self.accepted += len(rows)
+            if len(self._pending) >= self.flush_size:
+                self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "pending": len(self._pending),
+                "accepted": self.accepted,
+                "rejected": self.rejected,
+                "written": self.written,
+                "failedFlushes": self.failed_flushes,
+            }
+
+    def _take(self):
+        with self._cond:
+            deadline = time.monotonic() + self.flush_interval
+            while not self._stopping and len(self._pending) < self.flush_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch, self._pending = self._pending, []
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._take()
+            if batch:
+                self._write(batch)
+            elif self._stopping:
+                break
+
+    def _write(self, batch):
+        with self.app.app_context():
+            try:
+                db.session.execute(UAVStatus.__table__.insert(), batch)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                self.failed_flushes += 1
+                print(f"Telemetry flush of {len(batch)} samples failed: {e}")
+                # Put the samples back if there is room; otherwise they are lost
+                with self._cond:
+                    if len(self._pending) + len(batch) <= self.max_pending:
+                        self._pending[:0] = batch
+                time.sleep(self.flush_interval)
+                return
+            finally:
+                db.session.remove()
+
+        self.written += len(batch)
+        if self.on_flush is not None:
+            self.on_flush(batch)
+
+
+def publish_latest(batch):
+    """Push only the newest sample per drone from a flushed batch to /events."""
+    latest = {}
+    for row in batch:
+        current = latest.get(row['drone_id'])
+        if current is None or row['timestamp'] >= current['timestamp']:
+            latest[row['drone_id']] = row
+    for row in latest.values():
+        event_bus.publish('uav_status', status_payload(row))
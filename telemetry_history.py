@@ -0,0 +1,276 @@
+# telemetry_history.py
+import math
+from datetime import datetime, timedelta
+
+from extensions import db
+from models import UAVStatus, UAVStatusRollup
+
+EPOCH = datetime(1970, 1, 1)
+
+# Rollup resolutions in seconds; every level is built straight from raw samples
+RESOLUTIONS = (1, 10, 60)
+
+# How long each resolution is kept, in seconds (0 = raw samples)
+DEFAULT_RETENTION = {
+    0: 2 * 24 * 3600,
+    1: 7 * 24 * 3600,
+    10: 30 * 24 * 3600,
+    60: 365 * 24 * 3600,
+}
+
+# Samples may arrive a little late; leave the newest ones for the next run so
+# a bucket is not rewritten on every pass while it is still filling up
+LATENESS = timedelta(seconds=30)
+
+# Raw samples rolled up per transaction
+BATCH_SIZE = 10000
+
+
+def resolution_label(resolution):
+    return 'raw' if resolution == 0 else (f"{resolution // 60}min" if resolution >= 60 else f"{resolution}s")
+
+
+def floor_time(ts, resolution):
+    seconds = int((ts - EPOCH).total_seconds())
+    return EPOCH + timedelta(seconds=seconds - seconds % resolution)
+
+
+def _raw_point(row):
+    return {
+        "drone_id": row.drone_id,
+        "timestamp": row.timestamp,
+        "count": 1,
+        "speed": row.speed,
+        "altitude": row.altitude,
+        "battery": row.battery,
+        "latitude": row.latitude,
+        "longitude": row.longitude,
+        "last_timestamp": row.timestamp,
+    }
+
+
+def _rollup_point(r):
+    return {
+        "drone_id": r.drone_id,
+        "timestamp": r.bucket_start,
+        "count": r.sample_count,
+        "speed": r.avg_speed,
+        "altitude": r.avg_altitude,
+        "battery": r.min_battery,
+        "latitude": r.last_latitude,
+        "longitude": r.last_longitude,
+        "last_timestamp": r.last_timestamp,
+    }
+
+
+def _raw_points(start, end, drone_id=None, pending_only=False):
+    query = (db.select(UAVStatus.drone_id, UAVStatus.timestamp, UAVStatus.battery,
+                       UAVStatus.latitude, UAVStatus.longitude, UAVStatus.speed,
+                       UAVStatus.altitude)
+             .where(UAVStatus.timestamp >= start, UAVStatus.timestamp < end)
+             .order_by(UAVStatus.timestamp)
+             .execution_options(yield_per=5000))
+    if drone_id is not None:
+        query = query.where(UAVStatus.drone_id == drone_id)
+    if pending_only:
+        query = query.where(UAVStatus.rolled_up.is_(False))
+    for row in db.session.execute(query):
+        yield _raw_point(row)
+
+
+def _rollup_points(resolution, start, end, drone_id=None):
+    query = (db.select(UAVStatusRollup)
+             .where(UAVStatusRollup.resolution == resolution,
+                    UAVStatusRollup.bucket_start >= start,
+                    UAVStatusRollup.bucket_start < end)
+             .order_by(UAVStatusRollup.bucket_start)
+             .execution_options(yield_per=5000))
+    if drone_id is not None:
+        query = query.where(UAVStatusRollup.drone_id == drone_id)
+    for r in db.session.execute(query).scalars():
+        yield _rollup_point(r)
+
+
+def _by_last_sample(points):
+    """Points in the order aggregate() needs to keep the latest position."""
+    return sorted(points, key=lambda p: p["last_timestamp"] or p["timestamp"])
+
+
+def aggregate(points, resolution):
+    """
+    Fold points (raw samples or finer buckets, in time order) into buckets
+    of `resolution` seconds per drone: sample-weighted average speed and
+    altitude, minimum battery and the last known position.
+    """
+    buckets = {}
+    for p in points:
+        key = (p["drone_id"], floor_time(p["timestamp"], resolution))
+        b = buckets.get(key)
+        if b is None:
+            b = buckets[key] = {
+                "count": 0, "speed_sum": 0.0, "speed_n": 0,
+                "altitude_sum": 0.0, "altitude_n": 0, "battery": None,
+                "latitude": None, "longitude": None, "last_timestamp": None,
+            }
+        b["count"] += p["count"]
+        if p["speed"] is not None:
+            b["speed_sum"] += p["speed"] * p["count"]
+            b["speed_n"] += p["count"]
+        if p["altitude"] is not None:
+            b["altitude_sum"] += p["altitude"] * p["count"]
+            b["altitude_n"] += p["count"]
+        if p["battery"] is not None and (b["battery"] is None or p["battery"] < b["battery"]):
+            b["battery"] = p["battery"]
+        if p["latitude"] is not None and p["longitude"] is not None:
+            b["latitude"], b["longitude"] = p["latitude"], p["longitude"]
+        b["last_timestamp"] = p["last_timestamp"]
+
+    return [{
+        "resolution": resolution,
+        "drone_id": drone_id,
+        "bucket_start": bucket_start,
+        "sample_count": b["count"],
+        "avg_speed": b["speed_sum"] / b["speed_n"] if b["speed_n"] else None,
+        "avg_altitude": b["altitude_sum"] / b["altitude_n"] if b["altitude_n"] else None,
+        "min_battery": b["battery"],
+        "last_latitude": b["latitude"],
+        "last_longitude": b["longitude"],
+        "last_timestamp": b["last_timestamp"],
+    } for (drone_id, bucket_start), b in buckets.items()]
+
+
+def _merge(resolution, points):
+    """
+    Fold raw points into the stored buckets of `resolution` they fall in:
+    existing buckets are re-aggregated together with the new samples and
+    replaced, missing ones are inserted. Returns the number of rows written.
+    """
+    touched = {(p["drone_id"], floor_time(p["timestamp"], resolution)) for p in points}
+    starts = sorted({bucket_start for _, bucket_start in touched})
+    existing = []
+    for i in range(0, len(starts), 500):
+        query = (db.select(UAVStatusRollup)
+                 .where(UAVStatusRollup.resolution == resolution,
+                        UAVStatusRollup.bucket_start.in_(starts[i:i + 500]))
+                 .with_for_update())
+        existing.extend(r for r in db.session.execute(query).scalars()
+                        if (r.drone_id, r.bucket_start) in touched)
+
+    rows = aggregate(_by_last_sample([_rollup_point(r) for r in existing] + points), resolution)
+    if existing:
+        (UAVStatusRollup.query
+         .filter(UAVStatusRollup.id.in_([r.id for r in existing]))
+         .delete(synchronize_session=False))
+    db.session.execute(UAVStatusRollup.__table__.insert(), rows)
+    return len(rows)
+
+
+def downsample(now=None, batch_size=BATCH_SIZE):
+    """
+    Merge raw samples that have not been rolled up yet into the 1s, 10s and
+    1min buckets they belong to, however late they arrived, and mark them as
+    rolled up. Safe to run as often as wanted, also from more than one
+    process. Returns {resolution: rows written}.
+    """
+    now = now or datetime.utcnow()
+    written = dict.fromkeys(RESOLUTIONS, 0)
+    query = (db.select(UAVStatus.id, UAVStatus.drone_id, UAVStatus.timestamp, UAVStatus.battery,
+                       UAVStatus.latitude, UAVStatus.longitude, UAVStatus.speed,
+                       UAVStatus.altitude)
+             .where(UAVStatus.rolled_up.is_(False), UAVStatus.timestamp < now - LATENESS)
+             .order_by(UAVStatus.id)
+             .limit(batch_size)
+             .with_for_update(skip_locked=True))
+
+    while True:
+        batch = db.session.execute(query).all()
+        if not batch:
+            break
+        points = _by_last_sample([_raw_point(row) for row in batch])
+        for resolution in RESOLUTIONS:
+            written[resolution] += _merge(resolution, points)
+        (UAVStatus.query
+         .filter(UAVStatus.id.in_([row.id for row in batch]))
+         .update({UAVStatus.rolled_up: True}, synchronize_session=False))
+        db.session.commit()
+
+    return written
+
+
+def apply_retention(retention=None, now=None):
+    """Delete data older than each resolution's retention. Returns {resolution: rows deleted}."""
+    retention = retention or DEFAULT_RETENTION
+    now = now or datetime.utcnow()
+
+    # Raw samples that have not been rolled up yet are kept whatever their age
+    deleted = {0: (UAVStatus.query
+                   .filter(UAVStatus.timestamp < now - timedelta(seconds=retention[0]),
+                           UAVStatus.rolled_up.is_(True))
+                   .delete(synchronize_session=False))}
+
+    for resolution in RESOLUTIONS:
+        cutoff = now - timedelta(seconds=retention[resolution])
+        deleted[resolution] = (UAVStatusRollup.query
+                               .filter(UAVStatusRollup.resolution == resolution,
+                                       UAVStatusRollup.bucket_start < cutoff)
+                               .delete(synchronize_session=False))
+    db.session.commit()
+    return deleted
+
+
+def pick_resolution(start, end, max_points, now=None, retention=None):
+    """
+    The finest resolution whose bucket count over [start, end) fits in
+    max_points and whose retention still covers start. Raw samples are
+    assumed to arrive at up to 10 Hz. When no stored resolution fits, a
+    coarser one in whole minutes is returned, built from the 1min rollups.
+    """
+    retention = retention or DEFAULT_RETENTION
+    now = now or datetime.utcnow()
+    window = max((end - start).total_seconds(), 1)
+    for resolution in (0,) + RESOLUTIONS:
+        per_point = resolution or 0.1
+        covers = start >= now - timedelta(seconds=retention[resolution])
+        # A window that doesn't start on a bucket boundary touches one extra bucket
+        if math.ceil(window / per_point) + 1 <= max_points and covers:
+            return resolution
+    coarsest = RESOLUTIONS[-1]
+    return coarsest * max(math.ceil(window / max(max_points - 1, 1) / coarsest), 1)
+
+
+def history(drone_id, start, end, max_points=2000):
+    """Track history for one drone, at a resolution picked from the window size."""
+    resolution = pick_resolution(start, end, max_points)
+
+    if resolution == 0:
+        query = (db.select(UAVStatus.timestamp, UAVStatus.battery, UAVStatus.latitude,
+                           UAVStatus.longitude, UAVStatus.speed, UAVStatus.altitude)
+                 .where(UAVStatus.drone_id == drone_id,
+                        UAVStatus.timestamp >= start, UAVStatus.timestamp < end)
+                 .order_by(UAVStatus.timestamp))
+        points = [{
+            "timestamp": r.timestamp.isoformat(),
+            "battery": r.battery,
+            "latitude": r.latitude,
+            "longitude": r.longitude,
+            "speed": r.speed,
+            "altitude": r.altitude,
+            "samples": 1,
+        } for r in db.session.execute(query)]
+        return resolution, points
+
+    # Samples the downsampler has not merged yet are added to their buckets here
+    stored = _rollup_points(resolution if resolution in RESOLUTIONS else RESOLUTIONS[-1],
+                            start, end, drone_id)
+    pending = _raw_points(start, end, drone_id, pending_only=True)
+    buckets = aggregate(_by_last_sample([*stored, *pending]), resolution)
+    points = [{
+        "timestamp": r["bucket_start"].isoformat(),
+        "battery": r["min_battery"],
+        "latitude": r["last_latitude"],
+        "longitude": r["last_longitude"],
+        "speed": r["avg_speed"],
+        "altitude": r["avg_altitude"],
+        "samples": r["sample_count"],
+    } for r in sorted(buckets, key=lambda r: r["bucket_start"])]
+    return resolution, points
@@ -0,0 +1,40 @@
+# tests/conftest.py
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# app.py reads these at import time: a throwaway SQLite database, uploads
+# under a temporary directory, and no model warm-up (tests never load YOLO)
+WORKDIR = tempfile.mkdtemp(prefix='garbage-detector-tests-')
+os.environ.setdefault('DATABASE_URI', 'sqlite:///' + os.path.join(WORKDIR, 'test.db'))
+os.environ.setdefault('MODEL_WARMUP', '0')
+os.chdir(WORKDIR)
+
+
+@pytest.fixture(scope='session')
+def flask_app():
+    import app as app_module
+    return app_module.app
+
+
+@pytest.fixture
+def db(flask_app):
+    """Fresh tables for each test, inside an app context."""
+    from caching import response_cache
+    from extensions import db
+    with flask_app.app_context():
+        db.drop_all()
+        db.create_all()
+        response_cache.clear()
+        yield db
+        db.session.remove()
+
+
+@pytest.fixture
+def client(flask_app, db):
+    return flask_app.test_client()
@@ -0,0 +1,45 @@
+# tests/test_caching.py
+import caching
+from models import Notification
+
+
+def get_notifications(client, etag=None):
+    headers = {'If-None-Match': etag} if etag else {}
+    return client.get('/notifications', headers=headers)
+
+
+def test_matching_etag_gets_304(client):
+    first = get_notifications(client)
+    assert first.status_code == 200
+    assert first.headers['ETag']
+
+    again = get_notifications(client, first.headers['ETag'])
+    assert again.status_code == 304
+
+
+def test_write_through_the_app_changes_the_etag(client):
+    first = get_notifications(client)
+    client.post('/notifications', json={'message': 'Low battery', 'severity': 'warning'})
+
+    after = get_notifications(client, first.headers['ETag'])
+    assert after.status_code == 200
+    assert after.headers['ETag'] != first.headers['ETag']
+    assert [n['message'] for n in after.get_json()] == ['Low battery']
+
+
+def test_etag_expires_after_ttl_for_writes_this_process_did_not_see(client, db, monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(caching.time, 'time', lambda: now[0])
+    first = get_notifications(client)
+
+    # Another worker or a CLI command writing: no version bump here
+    db.session.execute(Notification.__table__.insert(), [{'message': 'From elsewhere', 'severity': 'info'}])
+    db.session.info.pop('written_tables', None)
+    db.session.commit()
+    assert get_notifications(client, first.headers['ETag']).status_code == 304
+
+    now[0] += caching.response_cache.ttl
+    caching.response_cache.clear()
+    later = get_notifications(client, first.headers['ETag'])
+    assert later.status_code == 200
+    assert [n['message'] for n in later.get_json()] == ['From elsewhere']
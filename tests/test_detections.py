@@ -0,0 +1,92 @@
+# tests/test_detections.py
+from datetime import datetime, timedelta
+
+from persistence import save_detections
+
+START = datetime(2026, 5, 1, 12, 0)
+
+
+def detection(minutes=0, class_name='bottle', latitude=52.0, longitude=4.0, **fields):
+    fields.setdefault('confidence', 0.9)
+    fields.setdefault('image_path', None)
+    return dict(class_name=class_name, x_min=0, y_min=0, x_max=1, y_max=1,
+                timestamp=START + timedelta(minutes=minutes),
+                latitude=latitude, longitude=longitude, **fields)
+
+
+def test_single_detection_cluster_carries_popup_details(client):
+    save_detections([
+        detection(class_name='can', confidence=0.73, image_path='uploads/ab/cd/abcd.jpg'),
+        detection(1, latitude=52.05, longitude=4.05),
+        detection(2, latitude=52.05, longitude=4.05),
+    ], notify=False)
+    clusters = client.get('/detections/clusters?zoom=13&bbox=3.9,51.9,4.1,52.1').get_json()['clusters']
+    single, = [c for c in clusters if c['count'] == 1]
+    group, = [c for c in clusters if c['count'] == 2]
+
+    assert single['classes'] == {'can': 1}
+    assert single['image_path'] == 'uploads/ab/cd/abcd.jpg'
+    assert single['confidence'] == 0.73
+    assert single['timestamp'] == START.isoformat()
+    assert single['id'] is not None
+    assert group['id'] is group['image_path'] is group['confidence'] is group['timestamp'] is None
+
+
+def fetch_pages(client, query, limit):
+    """Follow X-Next-Cursor through /detections; returns the pages' ids."""
+    pages, cursor = [], None
+    while True:
+        url = f'/detections?limit={limit}{query}' + (f'&cursor={cursor}' if cursor else '')
+        response = client.get(url)
+        assert response.status_code == 200
+        pages.append([d['id'] for d in response.get_json()])
+        cursor = response.headers.get('X-Next-Cursor')
+        if cursor is None:
+            return pages
+
+
+def test_pages_split_detections_sharing_a_timestamp(client):
+    # Five detections in the same second: the cursor must break ties on id
+    save_detections([detection(0) for _ in range(5)] + [detection(-1), detection(1)], notify=False)
+    streamed = [d['id'] for d in client.get('/detections').get_json()]
+    assert len(streamed) == 7
+
+    pages = fetch_pages(client, '', limit=2)
+    assert [len(page) for page in pages] == [2, 2, 2, 1]
+    assert sum(pages, []) == streamed
+
+
+def test_exactly_full_last_page_has_no_cursor(client):
+    save_detections([detection(i) for i in range(4)], notify=False)
+    assert [len(page) for page in fetch_pages(client, '', limit=2)] == [2, 2]
+    assert [len(page) for page in fetch_pages(client, '', limit=4)] == [4]
+
+
+def test_cursor_pages_respect_filters(client):
+    save_detections([detection(i, 'bottle' if i % 3 else 'can') for i in range(12)]
+                    + [detection(i, 'rope') for i in range(12)], notify=False)
+    query = '&class_name=can,bottle&start=' + (START + timedelta(minutes=2)).isoformat()
+    streamed = client.get('/detections?' + query[1:]).get_json()
+    assert len(streamed) == 10
+    assert {d['class_name'] for d in streamed} == {'bottle', 'can'}
+    assert sum(fetch_pages(client, query, limit=3), []) == [d['id'] for d in streamed]
+
+
+def test_streamed_result_is_valid_json_when_empty_or_filtered_out(client):
+    assert client.get('/detections').get_json() == []
+    save_detections([detection()], notify=False)
+    assert client.get('/detections?class_name=rope').get_json() == []
+    assert client.get('/detections?limit=5&class_name=rope').get_json() == []
+
+
+def test_limit_is_clamped(client):
+    save_detections([detection(i) for i in range(3)], notify=False)
+    response = client.get('/detections?limit=0')
+    assert len(response.get_json()) == 1
+    assert 'X-Next-Cursor' in response.headers
+
+
+def test_bad_cursor_or_filter_is_a_400(client):
+    for query in ('cursor=not-a-cursor', 'cursor=%FF%FE', 'cursor=' + 'x' * 3,
+                  'start=yesterday', 'bbox=1,2,3', 'bbox=4.1,51.9,3.9,52.1'):
+        assert client.get('/detections?limit=10&' + query).status_code == 400, query
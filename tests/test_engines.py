@@ -0,0 +1,54 @@
+# tests/test_engines.py
+import numpy as np
+
+from engines import compare_detections, parity_check
+from postprocess import DETECTION_DTYPE
+
+
+def boxes(*rows):
+    """DETECTION_DTYPE array from (cls, conf, x) rows; every box is 10x10 at x."""
+    dets = np.zeros(len(rows), dtype=DETECTION_DTYPE)
+    for i, (cls, conf, x) in enumerate(rows):
+        dets[i] = (cls, conf, (x, 0, x + 10, 10))
+    return dets
+
+
+class FixedEngine:
+    """Returns the same detections for every frame."""
+
+    def __init__(self, dets):
+        self.dets = dets
+
+    def detect(self, frames, conf_threshold):
+        return [self.dets for _ in frames]
+
+
+def test_compare_detections_returns_unmatched_indices():
+    ref = boxes((0, 0.9, 0), (1, 0.8, 100), (0, 0.5, 200))
+    cand = boxes((0, 0.9, 0), (2, 0.8, 100))
+    matched, missing, extra, _, _ = compare_detections(ref, cand)
+    assert matched == 1
+    assert list(missing) == [1, 2]
+    assert list(extra) == [1]
+
+
+def test_mismatch_next_to_matched_borderline_boxes_fails():
+    # Several matched boxes just above the threshold and one confident box
+    # the candidate misses: only unmatched boxes may count as borderline
+    near = [(0, 0.27, x) for x in range(0, 200, 20)]
+    ref = boxes(*near, (1, 0.9, 500))
+    cand = boxes(*near)
+    report = parity_check(FixedEngine(ref), FixedEngine(cand), [('crowded.jpg', None)],
+                          conf_threshold=0.25)
+    assert not report["passed"]
+    assert report["failures"] == [{"image": 'crowded.jpg', "missing": 1, "extra": 0}]
+    assert report["matched"] == len(near)
+
+
+def test_unmatched_box_at_the_threshold_is_tolerated():
+    ref = boxes((0, 0.9, 0), (1, 0.26, 100))
+    cand = boxes((0, 0.9, 0))
+    report = parity_check(FixedEngine(ref), FixedEngine(cand), [('edge.jpg', None)],
+                          conf_threshold=0.25)
+    assert report["passed"]
+    assert report["borderline"] == 1
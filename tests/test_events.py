@@ -0,0 +1,66 @@
+# tests/test_events.py
+from events import EventBus, event_bus
+
+
+def take(subscription, n):
+    return [next(subscription) for _ in range(n)]
+
+
+def test_every_subscriber_gets_each_event():
+    bus = EventBus()
+    everything = bus.subscribe(last_id=0, keepalive=0.05)
+    detections = bus.subscribe(last_id=0, types={'detections'}, keepalive=0.05)
+    bus.publish('notifications', {'id': 1})
+    bus.publish('detections', {'count': 2})
+
+    assert [e[1] for e in take(everything, 2)] == ['notifications', 'detections']
+    assert next(detections) == (2, 'detections', {'count': 2})
+    assert next(everything) is None and next(detections) is None
+
+
+def test_subscriber_that_falls_behind_the_history_gets_a_reset():
+    bus = EventBus(history=3)
+    subscription = bus.subscribe(last_id=0, keepalive=0.05)
+    bus.publish('detections', {'n': 1})
+    assert next(subscription)[0] == 1
+
+    # A slow client misses more events than the history holds
+    for n in range(2, 10):
+        bus.publish('detections', {'n': n})
+    assert next(subscription) == (9, 'reset', {})
+    # It then carries on with new events only
+    bus.publish('detections', {'n': 10})
+    assert next(subscription) == (10, 'detections', {'n': 10})
+
+
+def test_reconnect_resumes_after_last_event_id():
+    bus = EventBus(history=10)
+    for n in range(1, 6):
+        bus.publish('detections', {'n': n})
+    resumed = bus.subscribe(last_id=3, keepalive=0.05)
+    assert [e[0] for e in take(resumed, 2)] == [4, 5]
+    assert next(resumed) is None  # Caught up: keepalive
+
+    # An id from before a server restart is ahead of this bus: start from now
+    fresh = bus.subscribe(last_id=1000, keepalive=0.05)
+    assert next(fresh) is None
+    bus.publish('detections', {'n': 6})
+    assert next(fresh)[0] == 6
+
+
+def test_endpoint_resumes_from_last_event_id_header(flask_app):
+    start = event_bus.publish('notifications', {'message': 'before'})
+    event_bus.publish('detections', {'count': 1})
+    event_bus.publish('notifications', {'message': 'after'})
+
+    client = flask_app.test_client()
+    response = client.get('/events?types=notifications', headers={'Last-Event-ID': str(start)},
+                          buffered=False)
+    chunks = iter(response.response)
+    try:
+        assert next(chunks) == b'retry: 3000\n\n'
+        event = next(chunks).decode()
+    finally:
+        response.close()
+    assert event.startswith(f'id: {start + 2}\nevent: notifications\n')
+    assert '"after"' in event
@@ -0,0 +1,140 @@
+# tests/test_inference_pool.py
+import os
+import signal
+import time
+
+import numpy as np
+import pytest
+
+from inference import ProcessInferencePool
+from postprocess import DETECTION_DTYPE
+
+# Frames starting with this pixel value keep a worker busy for a while
+SLOW = 7
+
+
+class FakeEngine:
+    """Stands in for a model in the worker processes: one box over the whole frame."""
+    backend = 'fake'
+    names = {0: 'bottle'}
+
+    def __call__(self, frame):
+        if frame[0, 0, 0] == SLOW:
+            time.sleep(5)
+        det = np.zeros(1, dtype=DETECTION_DTYPE)
+        det['conf'] = 0.9
+        det['box'] = [0, 0, frame.shape[1], frame.shape[0]]
+        return [det]
+
+
+def load_fake_engine(weights, backend, imgsz):
+    if os.environ.get('FAKE_ENGINE_FAIL'):
+        raise RuntimeError('weights unreadable')
+    if os.environ.get('FAKE_ENGINE_HANG'):
+        time.sleep(30)
+    return FakeEngine()
+
+
+def frame(value=0):
+    return np.full((48, 64, 3), value, dtype=np.uint8)
+
+
+@pytest.fixture
+def make_pool():
+    pools = []
+
+    def make(warm=True, **kwargs):
+        kwargs.setdefault('workers', 2)
+        pool = ProcessInferencePool('weights.pt', imgsz=64, pin_cores=False,
+                                    loader=load_fake_engine, **kwargs)
+        pools.append(pool)
+        if warm:
+            assert pool.warm_up(60)
+        return pool
+
+    yield make
+    for pool in pools:
+        pool.stop(timeout=1)
+
+
+def wait_for(condition, timeout=30):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+
+
+def test_worker_killed_mid_frame_is_replaced(make_pool):
+    pool = make_pool(timeout=20)
+    assert list(pool.infer(frame())['box'][0]) == [0, 0, 64, 48]
+
+    slow = pool.submit(frame(SLOW))
+    time.sleep(1)  # Let the worker pick it up
+    (_, slot, _), = pool._pending.values()
+    index = slot // pool.SLOTS_PER_WORKER
+    os.kill(pool._processes[index].pid, signal.SIGKILL)
+
+    with pytest.raises(RuntimeError, match='died'):
+        slow.result(timeout=10)
+    # The pool keeps serving, including on the replacement worker
+    results = pool([frame() for _ in range(8)])
+    assert all(len(dets) == 1 for dets in results)
+    wait_for(lambda: pool.status()['state'] == 'ready' and len(pool.status()['processes']) == 2)
+    assert pool.restarts == 1
+    assert pool.status()['pending'] == 0
+    assert pool._free_slots.qsize() == 2 * pool.SLOTS_PER_WORKER
+
+
+def test_worker_killed_while_busy_with_other_callers(make_pool):
+    pool = make_pool(timeout=20)
+    futures = [pool.submit(frame()) for _ in range(3)]
+    pid = pool.status()['processes'][0]['pid']
+    os.kill(pid, signal.SIGKILL)
+    # Every frame either finished or failed; none is left hanging
+    for future in futures:
+        future.exception(timeout=10)
+    assert len(pool.infer(frame())) == 1
+    wait_for(lambda: pool.restarts == 1)
+
+
+def test_slot_wait_and_result_are_bounded(make_pool):
+    pool = make_pool(workers=1, timeout=0.5)
+    for _ in range(pool.SLOTS_PER_WORKER):
+        pool.submit(frame(SLOW))
+
+    started = time.monotonic()
+    with pytest.raises(TimeoutError, match='No free inference slot'):
+        pool.infer(frame())
+    assert time.monotonic() - started < 5
+
+    wait_for(lambda: pool._free_slots.qsize() == 1, timeout=15)
+    with pytest.raises(TimeoutError, match='did not finish'):
+        pool.infer(frame(SLOW))
+
+
+def test_failed_restart_takes_only_that_worker_down(make_pool, monkeypatch):
+    pool = make_pool(timeout=20)
+    pool.RESTART_BACKOFF = 0.2
+    monkeypatch.setenv('FAKE_ENGINE_FAIL', '1')
+    os.kill(pool.status()['processes'][0]['pid'], signal.SIGKILL)
+    wait_for(lambda: pool._restart_failures[0] >= 2)
+
+    status = pool.status()
+    assert status['state'] == 'ready' and status['error'] is None
+    assert status['down'] == [0]
+    # Frames only go to the worker that is up
+    assert all(len(dets) == 1 for dets in pool([frame() for _ in range(6)]))
+
+    monkeypatch.delenv('FAKE_ENGINE_FAIL')
+    wait_for(lambda: pool.status()['down'] == [] and len(pool.status()['processes']) == 2)
+    assert pool._restart_failures[0] == 0
+    assert len(pool.infer(frame())) == 1
+
+
+def test_names_wait_is_bounded(make_pool, monkeypatch):
+    monkeypatch.setenv('FAKE_ENGINE_HANG', '1')
+    pool = make_pool(warm=False, workers=1, timeout=0.5)
+    started = time.monotonic()
+    with pytest.raises(TimeoutError, match='not ready'):
+        pool.names
+    assert time.monotonic() - started < 5
@@ -0,0 +1,57 @@
+# tests/test_missions.py
+from datetime import datetime, timedelta
+
+import pytest
+
+import rollups
+from missions import completed_details, mission_details
+from models import Detection, Drone, Mission
+from persistence import save_detections
+
+
+@pytest.fixture
+def finished_mission(db):
+    """A mission that ended an hour ago, long past the settle time."""
+    completed_details.clear()
+    end = datetime.utcnow() - timedelta(hours=1)
+    drone = Drone(name='Drone 1', status='idle')
+    db.session.add(drone)
+    db.session.flush()
+    mission = Mission(drone_id=drone.id, start_time=end - timedelta(hours=1), end_time=end,
+                      status='completed', detected_objects={})
+    db.session.add(mission)
+    db.session.commit()
+    return mission
+
+
+def detection(mission, minutes, class_name='bottle', latitude=52.0, **fields):
+    return dict(class_name=class_name, confidence=0.9, x_min=0, y_min=0, x_max=1, y_max=1,
+                timestamp=mission.start_time + timedelta(minutes=minutes),
+                latitude=latitude, longitude=4.0, **fields)
+
+
+def test_late_detection_evicts_cached_details(db, finished_mission):
+    save_detections([detection(finished_mission, 5, mission_id=finished_mission.id)], notify=False)
+    first = mission_details(finished_mission.id)
+    assert first['routePoints'] == 1
+    assert mission_details(finished_mission.id) is first
+
+    save_detections([detection(finished_mission, 10, 'can', 52.01, mission_id=finished_mission.id)],
+                    notify=False)
+    details = mission_details(finished_mission.id)
+    assert details['routePoints'] == 2
+    assert details['objectTypes'] == {'bottle': 1, 'can': 1}
+
+
+def test_rebuild_missions_clears_cached_details(db, finished_mission):
+    save_detections([detection(finished_mission, 5, mission_id=finished_mission.id)], notify=False)
+    assert mission_details(finished_mission.id)['routePoints'] == 1
+
+    # Written outside save_detections and not yet attached to the mission
+    db.session.execute(Detection.__table__.insert(), [detection(finished_mission, 20)])
+    db.session.commit()
+    rollups.rebuild_missions(log=lambda message: None)
+
+    details = mission_details(finished_mission.id)
+    assert details['routePoints'] == 2
+    assert details['objectTypes'] == {'bottle': 2}
@@ -0,0 +1,74 @@
+# tests/test_rollups.py
+from datetime import datetime, timedelta
+
+import rollups
+from aggregates import class_counts, detection_class_counts
+from models import Detection, DetectionCount
+from persistence import save_detections
+
+DAY = datetime(2026, 5, 1, 23, 30)
+
+
+def detection(class_name='bottle', session_id=None, hours=0):
+    return dict(class_name=class_name, confidence=0.9, x_min=0, y_min=0, x_max=1, y_max=1,
+                session_id=session_id, timestamp=DAY + timedelta(hours=hours))
+
+
+def rollup_rows():
+    return {(r.session_id, r.class_name, r.day.isoformat()): r.count
+            for r in DetectionCount.query.all()}
+
+
+def test_counts_follow_inserts(db):
+    save_detections([detection(), detection(), detection('can', 's1'),
+                     detection('bottle', 's1', hours=1)], notify=False)
+    save_detections([detection('can', 's1')], notify=False)
+
+    # Grouped per session and per day; the last bottle falls on the next day
+    assert rollup_rows() == {
+        ('', 'bottle', '2026-05-01'): 2,
+        ('s1', 'can', '2026-05-01'): 2,
+        ('s1', 'bottle', '2026-05-02'): 1,
+    }
+    assert class_counts() == detection_class_counts() == {'bottle': 3, 'can': 2}
+    assert class_counts('s1') == detection_class_counts('s1') == {'bottle': 1, 'can': 2}
+
+
+def test_deleting_through_the_api_uncounts_and_drops_empty_rows(client, db):
+    save_detections([detection(), detection('metal'), detection('metal')], notify=False)
+    assert client.get('/stats').get_json()['metal'] == 2
+
+    metal_ids = [d.id for d in Detection.query.filter_by(class_name='metal')]
+    assert client.delete(f'/detections/{metal_ids[0]}').status_code == 200
+    assert class_counts() == {'bottle': 1, 'metal': 1}
+    assert client.get('/stats').get_json()['metal'] == 1
+
+    client.delete(f'/detections/{metal_ids[1]}')
+    assert ('', 'metal', '2026-05-01') not in rollup_rows()
+    assert class_counts() == detection_class_counts() == {'bottle': 1}
+    assert client.get('/stats').get_json()['metal'] == 0
+
+
+def test_delete_all_empties_the_rollup(client, db):
+    import app as app_module
+    save_detections([detection(name, session) for name in ('bottle', 'can', 'rope')
+                     for session in (None, 's1', 's2')], notify=False)
+    assert client.delete('/detections').status_code == 202
+    app_module.delete_all_job.join(30)
+
+    assert rollup_rows() == {}
+    assert class_counts() == {}
+    assert client.get('/stats').get_json()['bottle'] == 0
+
+
+def test_rebuild_matches_incremental_counts(db):
+    save_detections([detection(), detection('can', 's1'), detection('can', 's1', hours=2)],
+                    notify=False)
+    bottle = Detection.query.filter_by(class_name='bottle').one()
+    rollups.remove_detections([bottle])
+    db.session.delete(bottle)
+    incremental = rollup_rows()
+    db.session.commit()
+
+    rollups.rebuild()
+    assert rollup_rows() == incremental
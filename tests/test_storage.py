@@ -0,0 +1,171 @@
+# tests/test_storage.py
+import os
+
+import pytest
+
+import storage
+from cleanup import FileDeletionQueue
+from models import Detection, ImageBlob
+from persistence import save_detections
+
+
+@pytest.fixture
+def uploads(tmp_path):
+    return str(tmp_path / 'uploads')
+
+
+@pytest.fixture
+def store(uploads):
+    return storage.ImageStore(uploads)
+
+
+@pytest.fixture
+def queue(flask_app, uploads):
+    return FileDeletionQueue(flask_app, uploads)
+
+
+def save(db, image_path, count=1):
+    save_detections([dict(class_name='bottle', confidence=0.9, x_min=0, y_min=0, x_max=1, y_max=1,
+                          image_path=image_path) for _ in range(count)], notify=False)
+    return Detection.query.filter_by(image_path=image_path).order_by(Detection.id).all()
+
+
+def delete(db, detections):
+    unreferenced = storage.release(detections)
+    for detection in detections:
+        db.session.delete(detection)
+    db.session.commit()
+    return unreferenced
+
+
+def refcount(db, image_path):
+    blob = db.session.get(ImageBlob, storage.path_hash(image_path))
+    return blob.refcount if blob else None
+
+
+def test_file_is_removed_with_its_last_reference(db, store, queue, uploads):
+    image_path = store.put(b'image one', 'one.jpg')
+    first, second = save(db, image_path, count=2)
+    assert refcount(db, image_path) == 2
+
+    assert delete(db, [first]) == []
+    assert refcount(db, image_path) == 1
+
+    unreferenced = delete(db, [second])
+    assert unreferenced == [image_path]
+    queue.add(unreferenced)
+    assert queue.flush(5)
+
+    assert not os.path.exists(store.full_path(image_path))
+    assert refcount(db, image_path) is None
+    # The ab/cd shard directories went with the file
+    assert os.listdir(uploads) == []
+    assert queue.stats()['deleted'] == 1
+
+
+def test_content_uploaded_again_before_deletion_is_kept(db, store, queue):
+    image_path = store.put(b'image two', 'two.jpg')
+    unreferenced = delete(db, save(db, image_path))
+    assert refcount(db, image_path) == 0
+
+    # Same content arrives while the file is still queued for deletion
+    assert store.put(b'image two', 'again.jpg') == image_path
+    save(db, image_path)
+    queue.add(unreferenced)
+    assert queue.flush(5)
+
+    assert os.path.exists(store.full_path(image_path))
+    assert refcount(db, image_path) == 1
+    assert queue.stats()['kept'] == 1
+
+
+def test_upload_after_deletion_writes_the_file_again(db, store, queue):
+    image_path = store.put(b'image three', 'three.jpg')
+    queue.add(delete(db, save(db, image_path)))
+    assert queue.flush(5)
+    assert not os.path.exists(store.full_path(image_path))
+
+    assert store.put(b'image three', 'three.jpg') == image_path
+    save(db, image_path)
+    assert os.path.exists(store.full_path(image_path))
+    assert refcount(db, image_path) == 1
+
+
+def test_shared_shard_directory_is_kept(db, store, queue):
+    paths = [store.put(data, 'x.jpg') for data in (b'a', b'b', b'c')]
+    for image_path in paths:
+        save(db, image_path)
+    gone = paths[0]
+    queue.add(delete(db, Detection.query.filter_by(image_path=gone).all()))
+    assert queue.flush(5)
+
+    for image_path in paths[1:]:
+        assert os.path.exists(store.full_path(image_path))
+    assert not os.path.exists(store.full_path(gone))
+
+
+@pytest.fixture
+def statements(db):
+    """Records the SQL statements run on the database."""
+    from sqlalchemy import event
+    seen = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        seen.append(statement)
+    engine = db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    yield seen
+    event.remove(engine, 'before_cursor_execute', record)
+
+
+def test_release_updates_refcounts_in_batches(db, store, monkeypatch, statements):
+    monkeypatch.setattr(storage, 'CHUNK_SIZE', 4)
+    paths = [store.put(b'image %d' % i, 'x.jpg') for i in range(10)]
+    detections = []
+    for i, image_path in enumerate(paths):
+        detections.extend(save(db, image_path, count=1 + i % 2))
+    # Keep one of the two references to each odd-numbered image
+    doomed = [d for d in detections if d.image_path in paths[::2]]
+    doomed += [d for d in detections if d.image_path in paths[1::2]][::2]
+
+    statements.clear()
+    unreferenced = storage.release(doomed)
+    updates = [s for s in statements if s.startswith('UPDATE')]
+    selects = [s for s in statements if s.startswith('SELECT')]
+    assert len(updates) == len(selects) == 3
+    db.session.commit()
+
+    assert sorted(unreferenced) == sorted(paths[::2])
+    assert [refcount(db, p) for p in paths] == [0, 1] * 5
+
+
+def test_lock_blobs_locks_in_hash_order(db, store, statements):
+    paths = [store.put(data, 'x.jpg') for data in (b'c', b'a', b'b')]
+    for image_path in paths:
+        save(db, image_path)
+    statements.clear()
+    storage.lock_blobs(storage.path_hash(p) for p in paths)
+    select, = statements
+    assert 'ORDER BY image_blob.hash' in select
+
+
+def test_delete_all_releases_each_chunk_in_bulk(db, store, queue, monkeypatch, statements):
+    from cleanup import DeleteAllDetections
+    monkeypatch.setattr(storage, 'CHUNK_SIZE', 100)
+    paths = [store.put(b'bulk %d' % i, 'x.jpg') for i in range(30)]
+    for image_path in paths:
+        save(db, image_path, count=2)
+    db.session.remove()
+
+    job = DeleteAllDetections(queue.app, queue, chunk_size=25)
+    statements.clear()
+    assert job.start()
+    job.join(30)
+    assert job.status()['state'] == 'done'
+    # One refcount UPDATE per chunk of 25 detections, whatever the number of images
+    assert len([s for s in statements if s.startswith('UPDATE image_blob')]) == 3
+    assert job.files_queued == len(paths)
+    assert queue.flush(5)
+    assert all(not os.path.exists(store.full_path(p)) for p in paths)
+    assert Detection.query.count() == 0
+    assert ImageBlob.query.count() == 0
@@ -0,0 +1,149 @@
+# tests/test_streaming.py
+import multiprocessing
+import threading
+import time
+
+import numpy as np
+
+from inference import BatchInferenceServer
+from postprocess import DETECTION_DTYPE
+from streaming import CameraWorker, FrameRing
+
+
+def write(ring, value):
+    slot, view = ring.next_slot(timeout=1)
+    view[...] = value
+    return ring.publish(slot)
+
+
+def test_held_frame_is_not_overwritten():
+    ring = FrameRing((2, 2, 3), slots=3)
+    first = write(ring, 1)
+    seq, slot, view = ring.hold(0, timeout=1)
+    assert seq == first and view[0, 0, 0] == 1
+
+    for value in range(2, 10):
+        write(ring, value)
+    assert view[0, 0, 0] == 1
+    assert ring.seq == 9
+
+    ring.release(slot)
+    seq, _, newest = ring.hold(seq, timeout=1)
+    assert seq == 9 and newest[0, 0, 0] == 9
+
+
+def test_writer_never_takes_a_held_or_latest_slot():
+    ring = FrameRing((1, 1, 1), slots=2)
+    write(ring, 1)
+    _, slot, _ = ring.hold(0, timeout=1)
+    write(ring, 2)
+    # One slot is held and the other has the latest frame, so there is nowhere to write
+    assert ring.next_slot(timeout=0.05) == (None, None)
+    ring.release(slot)
+
+
+def test_close_wakes_readers():
+    ring = FrameRing((1, 1, 1), slots=2)
+    result = []
+    reader = threading.Thread(target=lambda: result.append(ring.hold(0, timeout=10)))
+    reader.start()
+    ring.close()
+    reader.join(2)
+    assert result == [(0, None, None)]
+
+
+class OneAtATimeModel:
+    """Fake model that records how many forward passes ran at once."""
+    names = {0: 'bottle'}
+
+    def __init__(self):
+        self.active = 0
+        self.most_active = 0
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, images, **kwargs):
+        with self._lock:
+            self.active += 1
+            self.calls += 1
+            self.most_active = max(self.most_active, self.active)
+        time.sleep(0.005)
+        with self._lock:
+            self.active -= 1
+        images = images if isinstance(images, list) else [images]
+        return [np.zeros(0, dtype=DETECTION_DTYPE) for _ in images]
+
+
+def test_stream_and_detect_inference_do_not_overlap():
+    model = OneAtATimeModel()
+    server = BatchInferenceServer(model, max_batch_size=4, max_wait_ms=1)
+    worker = CameraWorker(0, model, inference=server)
+    frame = np.zeros((48, 64, 3), dtype=np.uint8)
+
+    def stream():
+        for _ in range(20):
+            worker._infer(frame)
+
+    def detect():
+        for _ in range(20):
+            server.infer(frame, timeout=5)
+
+    threads = [threading.Thread(target=target) for target in (stream, stream, detect, detect)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(30)
+    server.stop()
+
+    assert model.calls > 0
+    assert model.most_active == 1
+    assert worker._last_detections is not None
+
+
+def test_app_streams_through_the_inference_server(flask_app):
+    import app as app_module
+    hub = app_module.get_camera_hub()
+    assert hub.worker_options['inference'] is app_module.inference_server
+
+
+def remote_reader(handle, events, results):
+    """Child process: hold the newest frame, report it, wait, then check it didn't change."""
+    ring = FrameRing.attach(handle)
+    seq, slot, view = ring.hold(0, timeout=10)
+    results.put((seq, int(view[0, 0, 0])))
+    events.get(timeout=10)  # The parent has written more frames meanwhile
+    results.put(int(view[0, 0, 0]))
+    del view
+    ring.release(slot)
+    # No frame is that new, so this only returns when the parent closes the ring
+    results.put(ring.hold(10 ** 9, timeout=10)[1])
+    ring.detach()
+
+
+def test_ring_is_shared_with_another_process():
+    ctx = multiprocessing.get_context('spawn')
+    ring = FrameRing((4, 4, 3), slots=3)
+    events, results = ctx.Queue(), ctx.Queue()
+    write(ring, 42)
+    child = ctx.Process(target=remote_reader, args=(ring.handle, events, results))
+    child.start()
+    try:
+        assert results.get(timeout=30) == (1, 42)
+        # The child's hold keeps its slot out of rotation across processes
+        for value in range(43, 50):
+            write(ring, value)
+        events.put('go')
+        assert results.get(timeout=10) == 42
+
+        # A release in the child frees the slot for the writer here
+        write(ring, 50)
+        write(ring, 51)
+        assert 42 not in [int(frame[0, 0, 0]) for frame in ring.frames]
+        ring.close()
+        assert results.get(timeout=10) is None
+        child.join(10)
+        assert child.exitcode == 0
+    finally:
+        if child.is_alive():
+            child.terminate()
+        ring.unlink()
@@ -0,0 +1,61 @@
+# tests/test_telemetry.py
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from models import UAVStatus
+from telemetry import parse_sample, parse_timestamp
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('2025-01-01T12:00:00+05:00', datetime(2025, 1, 1, 7, 0)),
+    ('2025-01-01T12:00:00-03:30', datetime(2025, 1, 1, 15, 30)),
+    ('2025-01-01T02:00:00+05:00', datetime(2024, 12, 31, 21, 0)),
+    ('2025-01-01T12:00:00Z', datetime(2025, 1, 1, 12, 0)),
+    ('2025-01-01T12:00:00', datetime(2025, 1, 1, 12, 0)),
+    (1735732800, datetime(2025, 1, 1, 12, 0)),
+])
+def test_parse_timestamp_converts_to_naive_utc(value, expected):
+    parsed = parse_timestamp(value)
+    assert parsed == expected
+    assert parsed.tzinfo is None
+
+
+def test_parse_sample_keeps_the_instant():
+    row = parse_sample({'drone_id': 3, 'battery': 80, 'timestamp': '2025-06-01T08:15:00+02:00'})
+    assert row['timestamp'] == datetime(2025, 6, 1, 6, 15)
+
+
+def test_batch_ingest_stores_utc(client, db, flask_app):
+    import app as app_module
+    written = app_module.telemetry_buffer.written
+    body = '\n'.join([
+        '{"drone_id": 1, "battery": 90, "timestamp": "2025-01-01T12:00:00+05:00"}',
+        '{"drone_id": 1, "battery": 89, "timestamp": "2025-01-01T07:00:01Z"}',
+    ])
+    response = client.post('/uavstatus/batch', data=body, content_type='application/x-ndjson')
+    assert response.status_code == 202
+
+    deadline = time.monotonic() + 5
+    while app_module.telemetry_buffer.written < written + 2 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    db.session.remove()
+    stamps = [r.timestamp for r in UAVStatus.query.order_by(UAVStatus.timestamp)]
+    assert stamps == [datetime(2025, 1, 1, 7, 0), datetime(2025, 1, 1, 7, 0, 1)]
+
+
+def test_history_window_with_offset(client, db):
+    base = datetime.utcnow().replace(microsecond=0) - timedelta(hours=1)
+    db.session.execute(UAVStatus.__table__.insert(), [
+        {'drone_id': 1, 'battery': 90.0, 'timestamp': base + timedelta(seconds=10)},
+        {'drone_id': 1, 'battery': 80.0, 'timestamp': base + timedelta(hours=5, seconds=10)},
+    ])
+    db.session.commit()
+    # The same minute written at +05:00
+    local = timezone(timedelta(hours=5))
+    start = base.replace(tzinfo=timezone.utc).astimezone(local)
+    response = client.get('/uavstatus/history', query_string={
+        'drone_id': 1, 'start': start.isoformat(), 'end': (start + timedelta(minutes=1)).isoformat()})
+    assert response.status_code == 200
+    assert [p['battery'] for p in response.get_json()['points']] == [90.0]
@@ -0,0 +1,105 @@
+# tests/test_telemetry_history.py
+from datetime import datetime, timedelta
+
+import pytest
+
+import telemetry_history
+from models import UAVStatus, UAVStatusRollup
+
+
+@pytest.fixture
+def base():
+    """Start of a minute an hour ago, well inside every retention."""
+    return datetime.utcnow().replace(second=0, microsecond=0) - timedelta(hours=1)
+
+
+def add_samples(db, *samples):
+    db.session.execute(UAVStatus.__table__.insert(), [
+        {'drone_id': 1, 'battery': battery, 'speed': speed, 'timestamp': ts}
+        for ts, battery, speed in samples
+    ])
+    db.session.commit()
+
+
+def buckets(resolution):
+    return {(r.drone_id, r.bucket_start): r for r in
+            UAVStatusRollup.query.filter_by(resolution=resolution)}
+
+
+def test_late_sample_is_merged_into_existing_buckets(db, base):
+    add_samples(db, (base, 90.0, 10.0), (base + timedelta(seconds=20), 89.0, 20.0))
+    telemetry_history.downsample(now=base + timedelta(minutes=5))
+    assert buckets(60)[(1, base)].sample_count == 2
+
+    # Arrives after its minute has already been rolled up
+    add_samples(db, (base + timedelta(milliseconds=500), 70.0, 30.0))
+    written = telemetry_history.downsample(now=base + timedelta(minutes=10))
+    assert written == {1: 1, 10: 1, 60: 1}
+
+    second = buckets(1)[(1, base)]
+    assert second.sample_count == 2
+    assert second.avg_speed == pytest.approx(20.0)
+    assert second.min_battery == 70.0
+    minute = buckets(60)
+    assert len(minute) == 1
+    assert minute[(1, base)].sample_count == 3
+    assert minute[(1, base)].avg_speed == pytest.approx(20.0)
+    assert minute[(1, base)].last_timestamp == base + timedelta(seconds=20)
+    assert UAVStatus.query.filter_by(rolled_up=False).count() == 0
+
+
+def test_retention_keeps_samples_until_they_are_rolled_up(db):
+    now = datetime.utcnow().replace(microsecond=0)
+    old = now - timedelta(days=3)
+    add_samples(db, (old, 50.0, 5.0))
+
+    assert telemetry_history.apply_retention(now=now)[0] == 0
+    assert UAVStatus.query.count() == 1
+
+    telemetry_history.downsample(now=now)
+    assert telemetry_history.apply_retention(now=now)[0] == 1
+    assert UAVStatus.query.count() == 0
+    assert buckets(60)[(1, telemetry_history.floor_time(old, 60))].sample_count == 1
+
+
+def test_first_run_with_a_stray_old_sample(db, base):
+    stray = datetime(2001, 1, 1, 0, 0, 5)
+    add_samples(db, (stray, 60.0, 1.0), (base, 90.0, 10.0))
+    written = telemetry_history.downsample(now=base + timedelta(minutes=5))
+    assert written == {1: 2, 10: 2, 60: 2}
+    assert set(buckets(60)) == {(1, datetime(2001, 1, 1)), (1, base)}
+
+
+def test_history_includes_samples_not_rolled_up_yet(db, base):
+    add_samples(db, (base, 90.0, 10.0))
+    telemetry_history.downsample(now=base + timedelta(minutes=5))
+    add_samples(db, (base + timedelta(seconds=30), 80.0, 30.0))
+
+    resolution, points = telemetry_history.history(1, base, base + timedelta(hours=3))
+    assert resolution == 10
+    assert [(p['timestamp'], p['samples']) for p in points] == [
+        (base.isoformat(), 1), ((base + timedelta(seconds=30)).isoformat(), 1)]
+
+    resolution, points = telemetry_history.history(1, base, base + timedelta(hours=3), max_points=200)
+    assert resolution == 60
+    assert len(points) == 1
+    assert points[0]['samples'] == 2
+    assert points[0]['speed'] == pytest.approx(20.0)
+    assert points[0]['battery'] == 80.0
+
+
+def test_long_windows_are_thinned_to_max_points(db):
+    now = datetime.utcnow()
+    resolution = telemetry_history.pick_resolution(now - timedelta(days=60), now, 2000, now=now)
+    assert resolution % 60 == 0
+    assert 60 * 24 * 3600 / resolution + 1 <= 2000
+
+    start = now.replace(second=0, microsecond=0) - timedelta(hours=7)
+    add_samples(db, *[(start + timedelta(minutes=i), 80.0, 10.0) for i in range(360)])
+    telemetry_history.downsample(now=now)
+
+    resolution, points = telemetry_history.history(1, start, start + timedelta(hours=6), max_points=10)
+    assert resolution == 2400
+    assert telemetry_history.resolution_label(resolution) == '40min'
+    assert len(points) <= 10
+    assert sum(p['samples'] for p in points) == 360